@@ -1,4 +1,4 @@
 # api包初始化文件
-from . import devices, agent
+from . import devices, agent, scenes, automations, homes
 
-__all__ = ["devices", "agent"]
+__all__ = ["devices", "agent", "scenes", "automations", "homes"]
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+import json
 
 from models.agent import (
     AgentSuggestion, UserInteraction, AgentResponse, 
@@ -8,21 +11,21 @@ from models.agent import (
 from models.devices import HomeState, DeviceStatus
 from services.agent_service import AgentService
 from services.home_simulator import HomeSimulator
+from services.home_registry import Home
+from api.homes import get_home
 
 router = APIRouter()
 
 
 # 依赖注入
-async def get_agent_service() -> AgentService:
-    """获取智能体服务实例"""
-    from app import agent_service
-    return agent_service
+async def get_agent_service(home: Home = Depends(get_home)) -> AgentService:
+    """获取当前家庭的智能体服务实例"""
+    return home.agent_service
 
 
-async def get_home_simulator() -> HomeSimulator:
-    """获取家居模拟器实例"""
-    from app import home_simulator
-    return home_simulator
+async def get_home_simulator(home: Home = Depends(get_home)) -> HomeSimulator:
+    """获取当前家庭的家居模拟器实例"""
+    return home.home_simulator
 
 
 async def execute_agent_actions(actions: List[dict], home_sim: HomeSimulator):
@@ -84,6 +87,45 @@ async def interact_with_agent(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"智能体交互失败: {str(e)}")
 
+@router.post("/interact/stream")
+async def interact_with_agent_stream(
+    home: Home = Depends(get_home),
+    interaction: UserInteraction = None,
+    message: str = Query(None, description="消息内容（可选，用于查询参数方式）")
+):
+    """流式处理人对AI的回复（Server-Sent Events）
+    
+    每个事件为一行 `data: {json}`，type 依次为 token（回复文本片段）、
+    action（操作执行结果）和 done（完整的 AgentResponse）。
+    
+    Args:
+        interaction: 用户交互对象（JSON请求体）
+        message: 消息内容（查询参数方式）
+        
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    if interaction is None:
+        if message is None:
+            raise HTTPException(status_code=422, detail="需要提供message参数或UserInteraction对象")
+        interaction = UserInteraction(message=message)
+    
+    async def event_stream():
+        # 流式回复期间占用家庭，避免被卸载
+        async with home.lease():
+            try:
+                async for event in home.agent_service.stream_user_interaction(interaction):
+                    yield f"data: {json.dumps(jsonable_encoder(event), ensure_ascii=False)}\n\n"
+            except Exception as e:
+                error = {"type": "error", "detail": f"智能体交互失败: {str(e)}"}
+                yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/analyze")
 async def analyze_current_state_with_llm(
     agent: AgentService = Depends(get_agent_service),
@@ -100,7 +142,7 @@ async def analyze_current_state_with_llm(
         
         # 强制分析（忽略时间限制）
         agent.last_suggestion_time = None
-        suggestion = await agent.analyze_home_state(current_state)
+        suggestion = await agent.analyze_home_state(current_state, requested=True)
         
         return {
             "current_state": current_state.dict(),
@@ -121,11 +163,11 @@ async def test_llm_integration(
         dict: LLM可用性测试结果
     """
     try:
-        # 检查LLM客户端是否可用
-        if not agent.llm_client:
+        # 检查LLM提供方是否可用
+        if not agent.llm_provider:
             return {
                 "llm_available": False,
-                "error": "LLM客户端不可用",
+                "error": "LLM提供方不可用",
                 "client_type": None,
                 "model": None
             }
@@ -143,7 +185,7 @@ async def test_llm_integration(
             "llm_available": True,
             "model": agent.config.model,
             "test_response": response,
-            "client_type": "OpenAI"
+            "client_type": agent.llm_provider.name
         }
     
     except Exception as e:
@@ -160,10 +202,13 @@ async def get_agent_status(agent: AgentService = Depends(get_agent_service)):
         context = agent.get_context()
         return {
             "active": agent.is_active,
-            "llm_available": agent.llm_client is not None,
-            "model": agent.config.model if agent.llm_client else None,
+            "llm_available": agent.llm_provider is not None,
+            "model": agent.config.model if agent.llm_provider else None,
+            "llm_provider": agent.llm_provider.stats() if agent.llm_provider else None,
             "last_interaction": context.last_interaction,
             "message_count": len(context.messages),
+            "suggestion_cache": agent.suggestion_cache.stats(),
+            "rule_engine": agent.rule_engine.stats() if agent.rule_engine else None,
             "config": agent.config.dict()
         }
     except Exception as e:
@@ -202,6 +247,7 @@ async def reset_agent_context(agent: AgentService = Depends(get_agent_service)):
         agent.context.messages = []
         agent.context.current_state = {}
         agent.last_suggestion_time = None
+        agent.suggestion_cache.clear()
         
         return {"message": "智能体上下文已重置"}
     except Exception as e:
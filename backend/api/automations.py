@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+import uuid
+
+from models.automation import Automation, AutomationRequest
+from services.automation_engine import AutomationEngine
+from services.home_registry import Home
+from api.homes import get_home
+
+router = APIRouter()
+
+
+# 依赖注入：获取自动化规则引擎实例
+async def get_automation_engine(home: Home = Depends(get_home)) -> AutomationEngine:
+    """获取当前家庭的自动化规则引擎实例"""
+    return home.automation_engine
+
+
+@router.get("/", response_model=List[Automation])
+async def get_all_automations(engine: AutomationEngine = Depends(get_automation_engine)):
+    """获取所有自动化规则
+
+    Returns:
+        List[Automation]: 规则列表（包含执行次数和最后执行时间）
+    """
+    return engine.list_automations()
+
+
+@router.get("/stats")
+async def get_automation_stats(engine: AutomationEngine = Depends(get_automation_engine)):
+    """获取自动化规则引擎统计
+
+    Returns:
+        dict: 规则数量、被监听的设备数、定时时刻数和触发评估次数
+    """
+    return engine.stats()
+
+
+@router.post("/", response_model=Automation)
+async def create_automation(request: AutomationRequest, engine: AutomationEngine = Depends(get_automation_engine)):
+    """创建自动化规则
+
+    Args:
+        request: 规则名称、启用状态、触发条件和动作
+
+    Returns:
+        Automation: 创建的规则
+    """
+    automation = Automation(id=str(uuid.uuid4()), **request.dict())
+    return await _save_automation(automation, engine)
+
+
+@router.get("/{automation_id}", response_model=Automation)
+async def get_automation(automation_id: str, engine: AutomationEngine = Depends(get_automation_engine)):
+    """获取单个自动化规则"""
+    automation = engine.get_automation(automation_id)
+    if automation is None:
+        raise HTTPException(status_code=404, detail="自动化规则不存在")
+    return automation
+
+
+@router.put("/{automation_id}", response_model=Automation)
+async def update_automation(
+    automation_id: str,
+    request: AutomationRequest,
+    engine: AutomationEngine = Depends(get_automation_engine)
+):
+    """修改自动化规则（保留执行统计）
+
+    Args:
+        automation_id: 规则ID
+        request: 新的规则定义
+
+    Returns:
+        Automation: 修改后的规则
+    """
+    existing = engine.get_automation(automation_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="自动化规则不存在")
+
+    automation = Automation(
+        id=automation_id,
+        last_executed=existing.last_executed,
+        execution_count=existing.execution_count,
+        **request.dict()
+    )
+    return await _save_automation(automation, engine)
+
+
+@router.delete("/{automation_id}")
+async def delete_automation(automation_id: str, engine: AutomationEngine = Depends(get_automation_engine)):
+    """删除自动化规则"""
+    if not await engine.delete(automation_id):
+        raise HTTPException(status_code=404, detail="自动化规则不存在")
+    return {"success": True, "message": "自动化规则已删除"}
+
+
+@router.post("/{automation_id}/run")
+async def run_automation(automation_id: str, engine: AutomationEngine = Depends(get_automation_engine)):
+    """立即执行自动化规则的动作
+
+    Returns:
+        dict: 每个设备的执行结果
+    """
+    if engine.get_automation(automation_id) is None:
+        raise HTTPException(status_code=404, detail="自动化规则不存在")
+
+    results = await engine.run(automation_id)
+    return {
+        "success": all(result["success"] for result in results),
+        "results": results
+    }
+
+
+async def _save_automation(automation: Automation, engine: AutomationEngine) -> Automation:
+    """校验并保存规则"""
+    if not automation.actions:
+        raise HTTPException(status_code=422, detail="自动化规则至少需要一个动作")
+    try:
+        await engine.save(automation)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"保存自动化规则失败: {str(e)}")
+    return automation
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
 
-from models.devices import Device, DeviceUpdateRequest, DeviceResponse, DeviceStatus, Room
+from models.devices import (
+    Device, DeviceUpdateRequest, DeviceResponse, DeviceStatus, DeviceType, Room, HomeState,
+    BulkDeviceUpdateRequest, BulkDeviceUpdateResponse, USER_EVENT_SOURCE, ROOM_NAMES
+)
 from services.home_simulator import HomeSimulator
+from services.sensor_history import HISTORY_STEPS
+from services.device_stream import DeviceStream
+from services.home_registry import Home
+from api.homes import get_home
 
 router = APIRouter()
 
 
 # 依赖注入：获取家居模拟器实例
-async def get_home_simulator() -> HomeSimulator:
-    """获取家居模拟器实例"""
-    from app import home_simulator
-    return home_simulator
+async def get_home_simulator(home: Home = Depends(get_home)) -> HomeSimulator:
+    """获取当前家庭的家居模拟器实例"""
+    return home.home_simulator
+
+
+def get_change_source(x_change_source: Optional[str] = Header(None)) -> str:
+    """设备变更的发起方，默认为用户；智能体远程执行操作时通过 X-Change-Source 请求头标明"""
+    return x_change_source or USER_EVENT_SOURCE
 
 
 def get_room_name(room: Room) -> str:
@@ -23,14 +39,7 @@ def get_room_name(room: Room) -> str:
     Returns:
         str: 房间的中文名称
     """
-    room_names = {
-        Room.LIVING_ROOM: "客厅",
-        Room.BEDROOM: "卧室", 
-        Room.KITCHEN: "厨房",
-        Room.BATHROOM: "卫生间",
-        Room.BALCONY: "阳台"
-    }
-    return room_names.get(room, room.value)
+    return ROOM_NAMES.get(room, room.value)
 
 @router.get("/rooms")
 async def get_all_rooms():
@@ -50,45 +59,103 @@ async def get_all_rooms():
         raise HTTPException(status_code=500, detail=f"获取房间列表失败: {str(e)}")
 
 @router.get("/status/summary")
-async def get_devices_summary(home_sim: HomeSimulator = Depends(get_home_simulator)):
+async def get_devices_summary(
+    request: Request,
+    response: Response,
+    home_sim: HomeSimulator = Depends(get_home_simulator)
+):
     """获取设备状态摘要
     
+    响应带有 ETag（摘要内容的哈希，多进程部署时各工作进程一致），客户端携带
+    If-None-Match 轮询时，统计未变化则返回 304 Not Modified。
+    
     Returns:
         dict: 包含设备总数、开关状态统计、按类型和房间分组的统计信息
     """
     try:
-        devices = home_sim.get_all_devices()
-        
-        summary = {
-            "total_devices": len(devices),
-            "devices_on": len([d for d in devices if d.status == DeviceStatus.ON]),
-            "devices_off": len([d for d in devices if d.status == DeviceStatus.OFF]),
-            "by_type": {},
-            "by_room": {}
-        }
+        etag = f'"{home_sim.get_devices_summary_etag()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
         
-        # 统计函数：减少重复代码
-        def update_stats(category_dict: dict, key: str, is_on: bool):
-            """更新统计信息"""
-            if key not in category_dict:
-                category_dict[key] = {"total": 0, "on": 0, "off": 0}
-            
-            category_dict[key]["total"] += 1
-            if is_on:
-                category_dict[key]["on"] += 1
-            else:
-                category_dict[key]["off"] += 1
-        
-        # 按类型和房间统计
-        for device in devices:
-            is_on = device.status == DeviceStatus.ON
-            update_stats(summary["by_type"], device.type.value, is_on)
-            update_stats(summary["by_room"], device.room.value, is_on)
-        
-        return summary
+        response.headers.update(headers)
+        return home_sim.get_devices_summary()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取设备摘要失败: {str(e)}")
 
+@router.get("/history/state", response_model=HomeState)
+async def get_home_state_at(
+    at: Optional[datetime] = Query(None, description="查询时刻（ISO格式），默认当前时间"),
+    home_sim: HomeSimulator = Depends(get_home_simulator)
+):
+    """获取任意时刻的家居状态
+    
+    由该时刻之前最近的完整快照加上其后的设备变更重建。
+    
+    Args:
+        at: 查询时刻
+        
+    Returns:
+        HomeState: 该时刻的家居状态
+    """
+    state = await home_sim.history.get_state_at(at or datetime.now())
+    if state is None:
+        raise HTTPException(status_code=404, detail="该时刻没有历史状态记录")
+    return state
+
+@router.get("/events")
+async def stream_device_events(
+    room: Optional[List[Room]] = Query(None, description="只推送这些房间的设备，可重复传入，默认全部"),
+    home: Home = Depends(get_home)
+):
+    """设备状态实时推送（Server-Sent Events）
+
+    连接后先推送一次 snapshot（订阅范围内所有设备），之后推送 changes
+    （同一设备在一批内的多次变化已合并）；客户端消费过慢导致事件丢失时
+    推送 resync 为 true 的 snapshot；空闲时定期推送 ping。
+
+    Args:
+        room: 房间过滤
+
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    async def event_stream():
+        # 推送期间占用家庭，避免被卸载
+        async with home.lease(), DeviceStream(home.home_simulator, rooms=room) as stream:
+            async for message in stream.messages():
+                yield f"data: {json.dumps(jsonable_encoder(message), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def device_events_websocket(
+    websocket: WebSocket,
+    room: Optional[List[Room]] = Query(None),
+    home_sim: HomeSimulator = Depends(get_home_simulator)
+):
+    """设备状态实时推送（WebSocket），消息格式与 /events 相同"""
+    await websocket.accept()
+
+    async def forward(stream: DeviceStream):
+        async for message in stream.messages():
+            await websocket.send_json(jsonable_encoder(message))
+
+    async with DeviceStream(home_sim, rooms=room) as stream:
+        sender = asyncio.create_task(forward(stream))
+        try:
+            # 客户端不发送消息，接收只用于及时发现断开
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+
 @router.get("/", response_model=List[Device])
 async def get_all_devices(home_sim: HomeSimulator = Depends(get_home_simulator)):
     """获取所有设备
@@ -140,11 +207,51 @@ async def get_device(device_id: str, home_sim: HomeSimulator = Depends(get_home_
         properties=device.properties
     )
 
+@router.get("/{device_id}/history")
+async def get_sensor_history(
+    device_id: str,
+    start: Optional[datetime] = Query(None, alias="from", description="开始时间，默认结束时间前24小时"),
+    end: Optional[datetime] = Query(None, alias="to", description="结束时间，默认当前时间"),
+    step: Optional[str] = Query(None, description=f"粒度：{' / '.join(HISTORY_STEPS)}，默认按区间自动选择"),
+    home_sim: HomeSimulator = Depends(get_home_simulator)
+):
+    """获取传感器读数历史
+    
+    1m / 1h / 1d 粒度直接读取预聚合的汇总（min / max / avg / count），raw 返回原始读数。
+    
+    Args:
+        device_id: 传感器ID
+        start: 开始时间
+        end: 结束时间
+        step: 粒度
+        
+    Returns:
+        dict: 包含粒度和数据点的历史数据
+    """
+    device = home_sim.get_device(device_id)
+    if not device:
+        raise HTTPException(status_code=404, detail="设备不存在")
+    if device.type != DeviceType.SENSOR:
+        raise HTTPException(status_code=400, detail="只有传感器设备有读数历史")
+    if step is not None and step not in HISTORY_STEPS:
+        raise HTTPException(status_code=422, detail=f"step 必须是 {' / '.join(HISTORY_STEPS)} 之一")
+    
+    end = end or datetime.now()
+    start = start or end - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=422, detail="开始时间不能晚于结束时间")
+    
+    try:
+        return await home_sim.sensor_history.query(device_id, start, end, step)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取传感器历史失败: {str(e)}")
+
 async def _update_device_helper(
     device_id: str, 
     status: Optional[DeviceStatus] = None,
     properties: Optional[dict] = None,
-    home_sim: HomeSimulator = None
+    home_sim: HomeSimulator = None,
+    source: Optional[str] = None
 ) -> DeviceResponse:
     """设备更新辅助函数，减少重复代码
     
@@ -153,6 +260,7 @@ async def _update_device_helper(
         status: 新的设备状态
         properties: 设备属性
         home_sim: 家居模拟器实例
+        source: 变更的发起方
         
     Returns:
         DeviceResponse: 更新结果
@@ -165,7 +273,8 @@ async def _update_device_helper(
         success = await home_sim.update_device(
             device_id=device_id,
             status=status,
-            properties=properties
+            properties=properties,
+            source=source
         )
         # print(f"更新设备: {device_id}, 状态: {status}, 属性: {properties}, 成功: {success}")
         if success:
@@ -195,7 +304,8 @@ async def _update_device_helper(
 async def update_device(
     device_id: str, 
     update_request: DeviceUpdateRequest,
-    home_sim: HomeSimulator = Depends(get_home_simulator)
+    home_sim: HomeSimulator = Depends(get_home_simulator),
+    source: str = Depends(get_change_source)
 ):
     """更新设备状态
     
@@ -211,12 +321,17 @@ async def update_device(
         device_id=device_id,
         status=update_request.status,
         properties=update_request.properties,
-        home_sim=home_sim
+        home_sim=home_sim,
+        source=source
     )
 
 
 @router.post("/{device_id}/toggle", response_model=DeviceResponse)
-async def toggle_device(device_id: str, home_sim: HomeSimulator = Depends(get_home_simulator)):
+async def toggle_device(
+    device_id: str,
+    home_sim: HomeSimulator = Depends(get_home_simulator),
+    source: str = Depends(get_change_source)
+):
     """切换设备开关状态
     
     Args:
@@ -235,5 +350,42 @@ async def toggle_device(device_id: str, home_sim: HomeSimulator = Depends(get_ho
     return await _update_device_helper(
         device_id=device_id,
         status=new_status,
-        home_sim=home_sim
-    )
\ No newline at end of file
+        home_sim=home_sim,
+        source=source
+    )
+
+
+@router.post("/bulk", response_model=BulkDeviceUpdateResponse)
+async def bulk_update_devices(
+    bulk_request: BulkDeviceUpdateRequest,
+    home_sim: HomeSimulator = Depends(get_home_simulator),
+    source: str = Depends(get_change_source)
+):
+    """批量更新设备
+    
+    每条指令按 device_id，或按 room 和/或 type 选择设备；同一设备被多条指令选中时
+    后面的指令覆盖前面的。所有更新一次性应用并在一个事务中落盘。
+    atomic 为 true（默认）时任一设备的更新无效则不执行任何更新。
+    
+    Args:
+        bulk_request: 批量更新请求
+        
+    Returns:
+        BulkDeviceUpdateResponse: 每个设备的执行结果
+    """
+    for command in bulk_request.commands:
+        if command.device_id is None and command.room is None and command.type is None:
+            raise HTTPException(status_code=422, detail="每条指令需要指定 device_id、room 或 type")
+    
+    try:
+        plan = home_sim.compile_commands(bulk_request.commands)
+        results = await home_sim.update_devices(plan, atomic=bulk_request.atomic, source=source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量更新设备失败: {str(e)}")
+    
+    succeeded = sum(1 for result in results if result["success"])
+    return BulkDeviceUpdateResponse(
+        success=succeeded == len(results),
+        message=f"已更新 {succeeded}/{len(results)} 个设备",
+        results=results
+    )
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Depends
+from starlette.requests import HTTPConnection
+
+from services.home_registry import Home, HomeRegistry
+
+router = APIRouter()
+
+
+# 依赖注入：获取家庭注册表实例
+async def get_home_registry() -> HomeRegistry:
+    """获取家庭注册表实例"""
+    from app import home_registry
+    return home_registry
+
+
+async def get_home(connection: HTTPConnection, registry: HomeRegistry = Depends(get_home_registry)):
+    """按路径中的 home_id 获取家庭（不带家庭ID的旧接口使用默认家庭）
+
+    请求处理期间占用家庭，避免被卸载；流式响应需要在生成器中另外占用。
+    """
+    home_id = connection.path_params.get("home_id", registry.default_home_id)
+    try:
+        home = await registry.get(home_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with home.lease():
+        yield home
+
+
+@router.get("/")
+async def get_loaded_homes(registry: HomeRegistry = Depends(get_home_registry)):
+    """获取已加载的家庭
+
+    Returns:
+        dict: 注册表统计和每个已加载家庭的设备数、使用中的连接数、空闲时间
+    """
+    return {
+        **registry.stats(),
+        "homes": registry.list_homes()
+    }
+
+
+@router.delete("/{home_id}")
+async def unload_home(home_id: str, registry: HomeRegistry = Depends(get_home_registry)):
+    """立即卸载家庭（状态落盘，下次请求时重新加载）
+
+    默认家庭和正在使用的家庭不会被卸载。
+    """
+    if not await registry.evict(home_id):
+        raise HTTPException(status_code=409, detail="家庭未加载、正在使用或为默认家庭")
+    return {"success": True, "message": f"家庭 {home_id} 已卸载"}
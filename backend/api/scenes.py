@@ -0,0 +1,117 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List
+
+from models.devices import Scene, BulkDeviceUpdateResponse
+from services.home_simulator import HomeSimulator
+from services.home_registry import Home
+from api.homes import get_home
+from api.devices import get_change_source
+
+router = APIRouter()
+
+
+# 依赖注入：获取家居模拟器实例
+async def get_home_simulator(home: Home = Depends(get_home)) -> HomeSimulator:
+    """获取当前家庭的家居模拟器实例"""
+    return home.home_simulator
+
+
+@router.get("/", response_model=List[Scene])
+async def get_all_scenes(home_sim: HomeSimulator = Depends(get_home_simulator)):
+    """获取所有场景
+
+    Returns:
+        List[Scene]: 场景列表
+    """
+    return home_sim.scenes.list_scenes()
+
+
+@router.get("/{name}", response_model=Scene)
+async def get_scene(name: str, home_sim: HomeSimulator = Depends(get_home_simulator)):
+    """获取单个场景
+
+    Args:
+        name: 场景名称
+
+    Returns:
+        Scene: 场景定义
+    """
+    scene = home_sim.scenes.get_scene(name)
+    if scene is None:
+        raise HTTPException(status_code=404, detail="场景不存在")
+    return scene
+
+
+@router.put("/{name}", response_model=Scene)
+async def save_scene(name: str, scene: Scene, home_sim: HomeSimulator = Depends(get_home_simulator)):
+    """创建或替换场景
+
+    Args:
+        name: 场景名称（以路径为准）
+        scene: 场景定义，指令格式与批量更新设备相同
+
+    Returns:
+        Scene: 保存后的场景
+    """
+    if not scene.commands:
+        raise HTTPException(status_code=422, detail="场景至少需要一条指令")
+    for command in scene.commands:
+        if command.device_id is None and command.room is None and command.type is None:
+            raise HTTPException(status_code=422, detail="每条指令需要指定 device_id、room 或 type")
+
+    scene.name = name
+    try:
+        await home_sim.scenes.save(scene)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"保存场景失败: {str(e)}")
+    return scene
+
+
+@router.delete("/{name}")
+async def delete_scene(name: str, home_sim: HomeSimulator = Depends(get_home_simulator)):
+    """删除场景
+
+    Args:
+        name: 场景名称
+
+    Returns:
+        dict: 删除结果
+    """
+    if not await home_sim.scenes.delete(name):
+        raise HTTPException(status_code=404, detail="场景不存在")
+    return {"success": True, "message": f"场景 {name} 已删除"}
+
+
+@router.post("/{name}/activate", response_model=BulkDeviceUpdateResponse)
+async def activate_scene(
+    name: str,
+    atomic: bool = Query(True, description="任一设备更新无效时不执行任何更新"),
+    home_sim: HomeSimulator = Depends(get_home_simulator),
+    source: str = Depends(get_change_source)
+):
+    """激活场景
+
+    使用预编译的更新计划，作为一次批量更新执行并在一个事务中落盘。
+
+    Args:
+        name: 场景名称
+        atomic: 是否整体执行
+
+    Returns:
+        BulkDeviceUpdateResponse: 每个设备的执行结果
+    """
+    if home_sim.scenes.get_scene(name) is None:
+        raise HTTPException(status_code=404, detail="场景不存在")
+
+    try:
+        results = await home_sim.scenes.activate(name, atomic=atomic, source=source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"激活场景失败: {str(e)}")
+
+    succeeded = sum(1 for result in results if result["success"])
+    print(f"激活场景 {name}: {succeeded}/{len(results)} 成功")
+    return BulkDeviceUpdateResponse(
+        success=succeeded == len(results),
+        message=f"场景 {name} 已激活，更新 {succeeded}/{len(results)} 个设备",
+        results=results
+    )
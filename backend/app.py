@@ -11,9 +11,11 @@ load_dotenv()
 # 延迟导入，避免循环依赖
 from api.devices import router as devices_router
 from api.agent import router as agent_router
-from database.database import init_database
-from services.home_simulator import HomeSimulator
-from services.agent_service import AgentService
+from api.scenes import router as scenes_router
+from api.automations import router as automations_router
+from api.homes import router as homes_router
+from database.database import init_database, close_database
+from services.home_registry import HomeRegistry
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -31,13 +33,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 全局服务实例
-home_simulator = HomeSimulator()
-agent_service = AgentService()
+# 全局服务实例：按家庭ID分片的模拟器、智能体等
+home_registry = HomeRegistry()
 
-# 包含路由
-app.include_router(devices_router, prefix="/api/devices", tags=["设备管理"])
-app.include_router(agent_router, prefix="/api/agent", tags=["智能体"])
+# 包含路由：/api/... 使用默认家庭，/api/{home_id}/... 使用指定家庭
+app.include_router(homes_router, prefix="/api/homes", tags=["家庭"])
+for prefix in ("/api", "/api/{home_id}"):
+    app.include_router(devices_router, prefix=f"{prefix}/devices", tags=["设备管理"])
+    app.include_router(agent_router, prefix=f"{prefix}/agent", tags=["智能体"])
+    app.include_router(scenes_router, prefix=f"{prefix}/scenes", tags=["场景"])
+    app.include_router(automations_router, prefix=f"{prefix}/automations", tags=["自动化"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -47,15 +52,18 @@ async def startup_event():
     # 初始化数据库
     await init_database()
     
-    # 初始化家居模拟器
-    await home_simulator.initialize()
-    
-    # 初始化智能体服务
-    await agent_service.initialize()
+    # 加载默认家庭（保留策略、家居模拟器、自动化规则引擎、智能体服务），其他家庭按需加载
+    await home_registry.start()
     
     print("✅ 服务启动成功!")
     print(f"📖 API文档: http://localhost:{os.getenv('PORT', 8000)}/docs")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放资源"""
+    await home_registry.close()
+    await close_database()
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -73,11 +81,16 @@ async def get_status():
         dict: 系统运行状态信息
     """
     try:
+        home_simulator = home_registry.default_home.home_simulator
+        agent_service = home_registry.default_home.agent_service
         return {
             "status": "running",
-            "devices_count": len(home_simulator.get_all_devices()),
+            "devices_count": home_simulator.device_count,
             "agent_active": agent_service.is_active,
-            "llm_available": agent_service.llm_client is not None,
+            "llm_available": agent_service.llm_provider is not None,
+            "homes_loaded": home_registry.stats()["loaded"],
+            "state_backend": home_simulator.state_backend.stats(),
+            "simulation": home_simulator.simulation.stats() if home_simulator.simulation_task else None,
             "timestamp": home_simulator.get_current_time().isoformat()
         }
     except Exception as e:
@@ -98,9 +111,14 @@ async def global_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
+    # 多个工作进程需要共享的状态后端（STATE_BACKEND=sqlite 或 redis），且不能使用自动重载
+    workers = int(os.getenv("WORKERS", 1))
+    if workers > 1 and os.getenv("STATE_BACKEND", "memory") == "memory":
+        print("⚠️ WORKERS > 1 时 STATE_BACKEND=memory 会导致各工作进程的设备状态不一致")
     uvicorn.run(
         "app:app",
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", 8000)),
-        reload=os.getenv("DEBUG", "True").lower() == "true"
+        reload=os.getenv("DEBUG", "True").lower() == "true" and workers == 1,
+        workers=workers
     )
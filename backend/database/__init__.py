@@ -1,4 +1,8 @@
 # database包初始化文件
-from .database import Database, db, init_database
+from .database import Database, AsyncDatabase, db, async_db, init_database, close_database
+from .write_behind import DeviceWriteBuffer
 
-__all__ = ["Database", "db", "init_database"]
+__all__ = [
+    "Database", "AsyncDatabase", "db", "async_db",
+    "init_database", "close_database", "DeviceWriteBuffer"
+]
@@ -1,30 +1,113 @@
+import asyncio
 import sqlite3
 import json
 import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from functools import partial
+from typing import Callable, List, Optional, Dict, Any
 from models.devices import Device, HomeState
 from models.agent import AgentMessage, AgentContext
 
 DATABASE_PATH = os.getenv("DATABASE_URL", "sqlite:///./smart_home.db").replace("sqlite:///", "")
+DATABASE_BUSY_TIMEOUT = float(os.getenv("DATABASE_BUSY_TIMEOUT", 5.0))  # 秒
+DATABASE_READ_WORKERS = int(os.getenv("DATABASE_READ_WORKERS", 4))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 10000))  # 每个压缩段的行数
+
+# 支持保留策略/归档的表及其时间列
+ARCHIVE_TABLES = {
+    "agent_messages": "timestamp",
+    "home_states": "timestamp",
+    "device_changes": "timestamp",
+    "sensor_readings": "timestamp",
+}
+
+# 每个连接建立时执行的PRAGMA：WAL允许读写并发，NORMAL同步级别在WAL下只在检查点fsync
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -8000,  # 约8MB页缓存
+    "foreign_keys": "ON",
+}
 
 class Database:
-    """数据库管理类"""
+    """数据库管理类
+    
+    每个线程持有一个长连接（线程本地存储），避免每次操作都重新打开文件、
+    加载schema；事件循环线程和线程池中的工作线程各自复用自己的连接。
+    """
     
-    def __init__(self):
-        self.db_path = DATABASE_PATH
+    def __init__(self, db_path: str = DATABASE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
     
-    def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并应用PRAGMA配置"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DATABASE_BUSY_TIMEOUT,
+            check_same_thread=False,
+        )
         conn.row_factory = sqlite3.Row  # 允许按列名访问
+        for pragma, value in SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
         return conn
     
-    def init_tables(self):
-        """初始化数据库表"""
+    def get_connection(self) -> sqlite3.Connection:
+        """获取当前线程的持久数据库连接
+        
+        连接由连接池统一管理，调用方不应关闭它，需要关闭时使用 close()。
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """在当前线程的连接上执行事务，成功提交、异常回滚
+        
+        Yields:
+            sqlite3.Cursor: 游标
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+    
+    def init_tables(self):
+        """初始化数据库表"""
+        with self.transaction() as cursor:
+            self._create_tables(cursor)
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """创建所有表"""
         # 设备表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS devices (
@@ -49,8 +132,9 @@ class Database:
                 metadata TEXT
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_agent_messages_timestamp ON agent_messages (timestamp)')
         
-        # 家居状态历史表
+        # 家居状态历史表（完整快照，作为状态重建的关键帧）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS home_states (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -60,6 +144,58 @@ class Database:
                 summary TEXT
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_home_states_timestamp ON home_states (timestamp)')
+        
+        # 设备变更日志表（两个关键帧之间的增量）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS device_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TIMESTAMP,
+                device_id TEXT NOT NULL,
+                changes TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_device_changes_timestamp ON device_changes (timestamp)')
+        
+        # 传感器原始读数表（只追加）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_readings (
+                device_id TEXT NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                value REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sensor_readings_device_time ON sensor_readings (device_id, timestamp)')
+        # 保留策略按时间顺序分批移出过期读数
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp ON sensor_readings (timestamp)')
+        
+        # 传感器读数汇总表（按 1m / 1h / 1d 时间桶预聚合）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_rollups (
+                device_id TEXT NOT NULL,
+                step TEXT NOT NULL,
+                bucket TIMESTAMP NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                count INTEGER,
+                PRIMARY KEY (device_id, step, bucket)
+            )
+        ''')
+        
+        # 归档表：过期数据按批压缩（zlib + JSON）后存为段
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                start_ts TIMESTAMP,
+                end_ts TIMESTAMP,
+                row_count INTEGER,
+                data BLOB,
+                created_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_segments_table_time ON archive_segments (table_name, end_ts)')
         
         # 用户偏好表
         cursor.execute('''
@@ -70,36 +206,71 @@ class Database:
             )
         ''')
         
-        conn.commit()
-        conn.close()
-    
-    # 设备相关操作
-    def save_device(self, device: Device):
-        """保存设备信息"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        # 自动化规则表（完整定义以JSON保存）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS automations (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                definition TEXT,
+                updated_at TIMESTAMP
+            )
+        ''')
         
+        # 场景表（指令列表以JSON保存）
         cursor.execute('''
-            INSERT OR REPLACE INTO devices 
-            (id, name, type, room, status, properties, last_updated, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+            CREATE TABLE IF NOT EXISTS scenes (
+                name TEXT PRIMARY KEY,
+                description TEXT,
+                commands TEXT,
+                updated_at TIMESTAMP
+            )
+        ''')
+        
+        # 多进程状态同步的变更日志（kind 为 device 时是设备变更，否则是定义重新加载通知）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS state_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                device_id TEXT,
+                changes TEXT,
+                timestamp TIMESTAMP,
+                source TEXT
+            )
+        ''')
+        # 旧版本创建的变更日志没有 source 列
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(state_changes)')}
+        if "source" not in columns:
+            cursor.execute('ALTER TABLE state_changes ADD COLUMN source TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_state_changes_timestamp ON state_changes (timestamp)')
+    
+    # 设备相关操作
+    @staticmethod
+    def _device_row(device: Device) -> tuple:
+        """设备转换为devices表的一行"""
+        return (
             device.id, device.name, device.type.value, device.room.value,
             device.status.value, json.dumps(device.properties),
             device.last_updated, device.created_at
-        ))
-        
-        conn.commit()
-        conn.close()
+        )
+    
+    def save_device(self, device: Device):
+        """保存设备信息"""
+        self.save_devices([device])
+    
+    def save_devices(self, devices: List[Device]):
+        """在单个事务中批量保存设备信息"""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO devices 
+                (id, name, type, room, status, properties, last_updated, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [self._device_row(device) for device in devices])
     
     def get_device(self, device_id: str) -> Optional[Dict]:
         """获取单个设备"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM devices WHERE id = ?', (device_id,))
+        cursor = self.get_connection().execute('SELECT * FROM devices WHERE id = ?', (device_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return dict(row)
@@ -107,105 +278,466 @@ class Database:
     
     def get_all_devices(self) -> List[Dict]:
         """获取所有设备"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM devices ORDER BY room, name')
+        cursor = self.get_connection().execute('SELECT * FROM devices ORDER BY room, name')
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
     
     def delete_device(self, device_id: str):
         """删除设备"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM devices WHERE id = ?', (device_id,))
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM devices WHERE id = ?', (device_id,))
     
     # 智能体消息操作
     def save_message(self, message: AgentMessage):
         """保存智能体消息"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO agent_messages (id, role, content, timestamp, metadata)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            message.id, message.role.value, message.content,
-            message.timestamp, json.dumps(message.metadata)
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO agent_messages (id, role, content, timestamp, metadata)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                message.id, message.role.value, message.content,
+                message.timestamp, json.dumps(message.metadata)
+            ))
     
     def get_recent_messages(self, limit: int = 10) -> List[Dict]:
         """获取最近的消息"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        cursor = self.get_connection().execute('''
             SELECT * FROM agent_messages 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in reversed(rows)]
     
     # 家居状态操作
+    @staticmethod
+    def home_state_row(state: HomeState) -> tuple:
+        """家居状态转换为home_states表的一行（时间统一为ISO格式字符串）"""
+        devices_list = []
+        for device in state.devices:
+            device_dict = device.dict()
+            device_dict['last_updated'] = device_dict['last_updated'].isoformat()
+            device_dict['created_at'] = device_dict['created_at'].isoformat()
+            devices_list.append(device_dict)
+        
+        return (
+            state.timestamp.isoformat(),
+            json.dumps(devices_list),
+            json.dumps({room.value: occupied for room, occupied in state.room_occupancy.items()}),
+            state.summary
+        )
+    
     def save_home_state(self, state: HomeState):
         """保存家居状态"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        self.save_home_state_row(self.home_state_row(state))
+    
+    def save_home_state_row(self, row: tuple):
+        """保存已序列化的家居状态"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO home_states (timestamp, devices_data, room_occupancy, summary)
+                VALUES (?, ?, ?, ?)
+            ''', row)
+    
+    def get_latest_home_state(self, until: str) -> Optional[Dict]:
+        """获取不晚于指定时间（ISO格式）的最近一个完整快照"""
+        cursor = self.get_connection().execute('''
+            SELECT * FROM home_states
+            WHERE timestamp <= ?
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ''', (until,))
+        row = cursor.fetchone()
         
-        devices_data = json.dumps([device.dict() for device in state.devices])
-        room_occupancy = json.dumps({room.value: occupied for room, occupied in state.room_occupancy.items()})
+        if row:
+            return dict(row)
+        return None
+    
+    def save_device_changes(self, rows: List[tuple]):
+        """批量保存设备变更 (timestamp, device_id, changes_json)"""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO device_changes (timestamp, device_id, changes)
+                VALUES (?, ?, ?)
+            ''', rows)
+    
+    def get_device_changes(self, after: str, until: str) -> List[Dict]:
+        """获取时间区间 (after, until] 内的设备变更，按写入顺序"""
+        cursor = self.get_connection().execute('''
+            SELECT timestamp, device_id, changes FROM device_changes
+            WHERE timestamp > ? AND timestamp <= ?
+            ORDER BY timestamp, id
+        ''', (after, until))
         
-        cursor.execute('''
-            INSERT INTO home_states (timestamp, devices_data, room_occupancy, summary)
-            VALUES (?, ?, ?, ?)
-        ''', (state.timestamp, devices_data, room_occupancy, state.summary))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    # 传感器时序数据操作
+    def save_sensor_readings(self, readings: List[tuple], rollups: List[tuple]):
+        """在单个事务中写入原始读数并合并汇总
+        
+        Args:
+            readings: (device_id, timestamp, value) 列表
+            rollups: (device_id, step, bucket, min, max, sum, count) 列表，与已有时间桶合并
+        """
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO sensor_readings (device_id, timestamp, value)
+                VALUES (?, ?, ?)
+            ''', readings)
+            cursor.executemany('''
+                INSERT INTO sensor_rollups
+                (device_id, step, bucket, min_value, max_value, sum_value, count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (device_id, step, bucket) DO UPDATE SET
+                    min_value = MIN(min_value, excluded.min_value),
+                    max_value = MAX(max_value, excluded.max_value),
+                    sum_value = sum_value + excluded.sum_value,
+                    count = count + excluded.count
+            ''', rollups)
+    
+    def get_sensor_readings(self, device_id: str, start: str, end: str) -> List[Dict]:
+        """获取时间区间 [start, end] 内的原始读数"""
+        cursor = self.get_connection().execute('''
+            SELECT timestamp, value FROM sensor_readings
+            WHERE device_id = ? AND timestamp >= ? AND timestamp <= ?
+            ORDER BY timestamp
+        ''', (device_id, start, end))
         
-        conn.commit()
-        conn.close()
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_sensor_rollups(self, device_id: str, step: str, start: str, end: str) -> List[Dict]:
+        """获取时间区间内指定粒度的汇总数据"""
+        cursor = self.get_connection().execute('''
+            SELECT bucket, min_value, max_value, sum_value, count FROM sensor_rollups
+            WHERE device_id = ? AND step = ? AND bucket >= ? AND bucket <= ?
+            ORDER BY bucket
+        ''', (device_id, step, start, end))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
+    # 保留策略与归档
+    def archive_rows(self, table: str, cutoff: str, archive: bool = True, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """将时间早于cutoff的行移出表
+        
+        Args:
+            table: 表名，必须在 ARCHIVE_TABLES 中
+            cutoff: 时间界限，格式需与该表时间列一致
+            archive: 是否写入归档段，否则直接删除
+            batch_size: 每批行数
+            
+        Returns:
+            int: 移出的行数
+        """
+        total = 0
+        while True:
+            moved = self.archive_batch(table, cutoff, archive, batch_size)
+            total += moved
+            if moved < batch_size:
+                return total
+    
+    def archive_batch(self, table: str, cutoff: str, archive: bool = True, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """在一个事务中移出最早的一批过期行，archive为True时压缩为一个归档段
+        
+        Returns:
+            int: 本批移出的行数
+        """
+        column = ARCHIVE_TABLES[table]
+        with self.transaction() as cursor:
+            cursor.execute(f'''
+                SELECT rowid AS _rowid, * FROM {table}
+                WHERE {column} < ?
+                ORDER BY {column}
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            records = [dict(row) for row in cursor.fetchall()]
+            if not records:
+                return 0
+            
+            rowids = [(record.pop("_rowid"),) for record in records]
+            if archive:
+                data = zlib.compress(json.dumps(records, ensure_ascii=False, default=str).encode("utf-8"))
+                cursor.execute('''
+                    INSERT INTO archive_segments (table_name, start_ts, end_ts, row_count, data, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (table, records[0][column], records[-1][column], len(records), data, datetime.now().isoformat()))
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = ?', rowids)
+        
+        return len(records)
+    
+    def read_archive(self, table: str, start: str, end: str) -> List[Dict]:
+        """读取归档段中时间区间 [start, end] 内的行"""
+        column = ARCHIVE_TABLES[table]
+        cursor = self.get_connection().execute('''
+            SELECT data FROM archive_segments
+            WHERE table_name = ? AND end_ts >= ? AND start_ts <= ?
+            ORDER BY start_ts
+        ''', (table, start, end))
+        
+        rows = []
+        for segment in cursor.fetchall():
+            for record in json.loads(zlib.decompress(segment["data"]).decode("utf-8")):
+                if start <= record[column] <= end:
+                    rows.append(record)
+        return rows
+    
+    # 场景操作
+    def save_scene(self, name: str, description: str, commands: List[Dict[str, Any]]):
+        """保存场景（同名覆盖）"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO scenes (name, description, commands, updated_at)
+                VALUES (?, ?, ?, ?)
+            ''', (name, description, json.dumps(commands, ensure_ascii=False), datetime.now().isoformat()))
+    
+    def get_scenes(self) -> List[Dict]:
+        """获取所有场景"""
+        cursor = self.get_connection().execute('SELECT * FROM scenes ORDER BY name')
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_scene(self, name: str) -> bool:
+        """删除场景"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM scenes WHERE name = ?', (name,))
+            return cursor.rowcount > 0
+    
+    # 自动化规则操作
+    def save_automations(self, rows: List[tuple]):
+        """批量保存自动化规则，rows 为 (id, name, definition) """
+        now = datetime.now().isoformat()
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO automations (id, name, definition, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name,
+                    definition = excluded.definition,
+                    updated_at = excluded.updated_at
+            ''', [row + (now,) for row in rows])
+    
+    def get_automations(self) -> List[Dict]:
+        """获取所有自动化规则"""
+        cursor = self.get_connection().execute('SELECT * FROM automations ORDER BY rowid')
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_automation(self, automation_id: str) -> bool:
+        """删除自动化规则"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM automations WHERE id = ?', (automation_id,))
+            return cursor.rowcount > 0
+    
+    # 状态同步日志操作
+    def append_state_changes(self, rows: List[tuple]):
+        """追加变更日志，每行为 (origin, kind, device_id, changes, timestamp, source)"""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO state_changes (origin, kind, device_id, changes, timestamp, source)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+    
+    def get_state_changes(self, after_seq: int, limit: int = 1000) -> List[Dict]:
+        """按顺序获取序号大于 after_seq 的变更日志"""
+        cursor = self.get_connection().execute(
+            'SELECT * FROM state_changes WHERE seq > ? ORDER BY seq LIMIT ?',
+            (after_seq, limit)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def trim_state_changes(self, before: str) -> int:
+        """删除早于指定时间的变更日志"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM state_changes WHERE timestamp < ?', (before,))
+            return cursor.rowcount
     
     # 用户偏好操作
     def set_preference(self, key: str, value: Any):
         """设置用户偏好"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_preferences (key, value, updated_at)
-            VALUES (?, ?, ?)
-        ''', (key, json.dumps(value), datetime.now()))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO user_preferences (key, value, updated_at)
+                VALUES (?, ?, ?)
+            ''', (key, json.dumps(value), datetime.now()))
     
     def get_preference(self, key: str) -> Optional[Any]:
         """获取用户偏好"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT value FROM user_preferences WHERE key = ?', (key,))
+        cursor = self.get_connection().execute('SELECT value FROM user_preferences WHERE key = ?', (key,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return json.loads(row['value'])
         return None
 
+class AsyncDatabase:
+    """Database的异步门面
+    
+    所有写操作提交到单个专用写线程顺序执行（SQLite同一时间只允许一个写者），
+    读操作提交到小型读线程池；事件循环只等待结果，不再被磁盘I/O阻塞。
+    """
+    
+    def __init__(
+        self,
+        database: Database,
+        read_workers: int = DATABASE_READ_WORKERS,
+        readers: Optional[ThreadPoolExecutor] = None
+    ):
+        self.database = database
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        # 多个数据库可以共享一个读线程池（由调用方负责关闭），写线程始终独占以保证写入顺序
+        self._owns_readers = readers is None
+        self._readers = readers or ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-reader")
+    
+    async def run_write(self, func: Callable, *args, **kwargs) -> Any:
+        """在写线程中执行函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, partial(func, *args, **kwargs))
+    
+    async def run_read(self, func: Callable, *args, **kwargs) -> Any:
+        """在读线程池中执行函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, partial(func, *args, **kwargs))
+    
+    # 设备相关操作
+    async def save_device(self, device: Device):
+        """保存设备信息"""
+        await self.run_write(self.database.save_device, device)
+    
+    async def save_devices(self, devices: List[Device]):
+        """在单个事务中批量保存设备信息"""
+        await self.run_write(self.database.save_devices, devices)
+    
+    async def get_device(self, device_id: str) -> Optional[Dict]:
+        """获取单个设备"""
+        return await self.run_read(self.database.get_device, device_id)
+    
+    async def get_all_devices(self) -> List[Dict]:
+        """获取所有设备"""
+        return await self.run_read(self.database.get_all_devices)
+    
+    async def delete_device(self, device_id: str):
+        """删除设备"""
+        await self.run_write(self.database.delete_device, device_id)
+    
+    # 智能体消息操作
+    async def save_message(self, message: AgentMessage):
+        """保存智能体消息"""
+        await self.run_write(self.database.save_message, message)
+    
+    async def get_recent_messages(self, limit: int = 10) -> List[Dict]:
+        """获取最近的消息"""
+        return await self.run_read(self.database.get_recent_messages, limit)
+    
+    # 家居状态操作
+    async def save_home_state(self, state: HomeState):
+        """保存家居状态（在事件循环中序列化，避免与设备修改并发）"""
+        row = Database.home_state_row(state)
+        await self.run_write(self.database.save_home_state_row, row)
+    
+    async def get_latest_home_state(self, until: str) -> Optional[Dict]:
+        """获取不晚于指定时间的最近一个完整快照"""
+        return await self.run_read(self.database.get_latest_home_state, until)
+    
+    async def save_device_changes(self, rows: List[tuple]):
+        """批量保存设备变更"""
+        await self.run_write(self.database.save_device_changes, rows)
+    
+    async def get_device_changes(self, after: str, until: str) -> List[Dict]:
+        """获取时间区间内的设备变更"""
+        return await self.run_read(self.database.get_device_changes, after, until)
+    
+    # 传感器时序数据操作
+    async def save_sensor_readings(self, readings: List[tuple], rollups: List[tuple]):
+        """写入原始读数并合并汇总"""
+        await self.run_write(self.database.save_sensor_readings, readings, rollups)
+    
+    async def get_sensor_readings(self, device_id: str, start: str, end: str) -> List[Dict]:
+        """获取原始读数"""
+        return await self.run_read(self.database.get_sensor_readings, device_id, start, end)
+    
+    async def get_sensor_rollups(self, device_id: str, step: str, start: str, end: str) -> List[Dict]:
+        """获取汇总数据"""
+        return await self.run_read(self.database.get_sensor_rollups, device_id, step, start, end)
+    
+    # 保留策略与归档
+    async def archive_rows(self, table: str, cutoff: str, archive: bool = True) -> int:
+        """将过期行移出表，每批单独提交到写线程，批次之间其他写操作可以插入"""
+        total = 0
+        while True:
+            moved = await self.run_write(self.database.archive_batch, table, cutoff, archive)
+            total += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                return total
+    
+    async def read_archive(self, table: str, start: str, end: str) -> List[Dict]:
+        """读取归档数据"""
+        return await self.run_read(self.database.read_archive, table, start, end)
+    
+    # 场景操作
+    async def save_scene(self, name: str, description: str, commands: List[Dict[str, Any]]):
+        """保存场景"""
+        await self.run_write(self.database.save_scene, name, description, commands)
+    
+    async def get_scenes(self) -> List[Dict]:
+        """获取所有场景"""
+        return await self.run_read(self.database.get_scenes)
+    
+    async def delete_scene(self, name: str) -> bool:
+        """删除场景"""
+        return await self.run_write(self.database.delete_scene, name)
+    
+    # 自动化规则操作
+    async def save_automations(self, rows: List[tuple]):
+        """批量保存自动化规则"""
+        await self.run_write(self.database.save_automations, rows)
+    
+    async def get_automations(self) -> List[Dict]:
+        """获取所有自动化规则"""
+        return await self.run_read(self.database.get_automations)
+    
+    async def delete_automation(self, automation_id: str) -> bool:
+        """删除自动化规则"""
+        return await self.run_write(self.database.delete_automation, automation_id)
+    
+    # 状态同步日志操作
+    async def append_state_changes(self, rows: List[tuple]):
+        """追加变更日志"""
+        await self.run_write(self.database.append_state_changes, rows)
+    
+    async def get_state_changes(self, after_seq: int, limit: int = 1000) -> List[Dict]:
+        """按顺序获取序号大于 after_seq 的变更日志"""
+        return await self.run_read(self.database.get_state_changes, after_seq, limit)
+    
+    async def trim_state_changes(self, before: str) -> int:
+        """删除早于指定时间的变更日志"""
+        return await self.run_write(self.database.trim_state_changes, before)
+    
+    # 用户偏好操作
+    async def set_preference(self, key: str, value: Any):
+        """设置用户偏好"""
+        await self.run_write(self.database.set_preference, key, value)
+    
+    async def get_preference(self, key: str) -> Optional[Any]:
+        """获取用户偏好"""
+        return await self.run_read(self.database.get_preference, key)
+    
+    def shutdown(self):
+        """等待已提交的任务完成并停止线程"""
+        self._writer.shutdown(wait=True)
+        if self._owns_readers:
+            self._readers.shutdown(wait=True)
+
 # 全局数据库实例
 db = Database()
+async_db = AsyncDatabase(db)
 
 async def init_database():
     """初始化数据库"""
-    db.init_tables()
+    await async_db.run_write(db.init_tables)
     print("✅ 数据库初始化完成")
+
+async def close_database():
+    """关闭数据库连接"""
+    async_db.shutdown()
+    db.close()
+    print("🛑 数据库连接已关闭")
@@ -0,0 +1,92 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from models.devices import Device
+from database.database import AsyncDatabase
+
+DEVICE_FLUSH_INTERVAL = float(os.getenv("DEVICE_FLUSH_INTERVAL", 1.0))  # 秒
+DEVICE_FLUSH_BATCH_SIZE = int(os.getenv("DEVICE_FLUSH_BATCH_SIZE", 200))
+
+class DeviceWriteBuffer:
+    """设备状态写回缓冲（write-behind）
+
+    同一设备在一个刷新周期内的多次更新只保留最新状态，按时间间隔或待写数量阈值
+    在单个事务中批量落盘。
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        flush_interval: float = DEVICE_FLUSH_INTERVAL,
+        batch_size: int = DEVICE_FLUSH_BATCH_SIZE
+    ):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, Device] = {}
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        """待写入的设备数量"""
+        return len(self._pending)
+
+    def put(self, device: Device):
+        """登记设备的最新状态，等待批量写入"""
+        # 保存快照，避免写线程序列化时设备仍在被事件循环修改
+        self._pending[device.id] = device.copy()
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def start(self):
+        """启动后台刷新任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止后台刷新任务，并写入所有剩余更新"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        """按间隔或阈值触发刷新"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ 设备状态批量写入失败: {e}")
+
+    async def flush(self) -> int:
+        """立即将所有待写更新写入数据库
+
+        Returns:
+            int: 写入的设备数量
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            devices: List[Device] = list(batch.values())
+            try:
+                await self.database.save_devices(devices)
+            except Exception:
+                # 写入失败时放回队列，不覆盖期间产生的更新状态
+                for device_id, device in batch.items():
+                    self._pending.setdefault(device_id, device)
+                raise
+            return len(devices)
@@ -2,22 +2,36 @@
 from .devices import (
     Device, SensorDevice, LightDevice, ACDevice,
     DeviceType, DeviceStatus, SensorType, Room,
-    DeviceUpdateRequest, DeviceResponse, HomeState
+    DeviceUpdateRequest, DeviceResponse, HomeState, DeviceEvent,
+    DeviceCommand, BulkDeviceUpdateRequest, BulkDeviceUpdateResponse, Scene
 )
 from .agent import (
     AgentMessage, AgentContext, AgentSuggestion,
     UserInteraction, AgentResponse, AgentConfig,
-    MessageRole
+    MessageRole, RuleCondition, SuggestionRule
+)
+from .automation import (
+    TriggerType, AutomationTrigger, Automation, AutomationRequest
+)
+from .simulation import (
+    ThermalModel, OccupancyWindow, DeviceGroup, RoomDefinition, HomeDefinition
 )
 
 __all__ = [
     # Device models
     "Device", "SensorDevice", "LightDevice", "ACDevice",
     "DeviceType", "DeviceStatus", "SensorType", "Room",
-    "DeviceUpdateRequest", "DeviceResponse", "HomeState",
+    "DeviceUpdateRequest", "DeviceResponse", "HomeState", "DeviceEvent",
+    "DeviceCommand", "BulkDeviceUpdateRequest", "BulkDeviceUpdateResponse", "Scene",
     
     # Agent models
     "AgentMessage", "AgentContext", "AgentSuggestion",
     "UserInteraction", "AgentResponse", "AgentConfig",
-    "MessageRole"
+    "MessageRole", "RuleCondition", "SuggestionRule",
+    
+    # Automation models
+    "TriggerType", "AutomationTrigger", "Automation", "AutomationRequest",
+    
+    # Simulation models
+    "ThermalModel", "OccupancyWindow", "DeviceGroup", "RoomDefinition", "HomeDefinition"
 ]
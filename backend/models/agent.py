@@ -3,6 +3,8 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 
+from .devices import DeviceType, DeviceStatus, SensorType
+
 class MessageRole(str, Enum):
     """消息角色"""
     USER = "user"
@@ -31,6 +33,26 @@ class AgentSuggestion(BaseModel):
     suggested_actions: Dict[str, Any] = []  # 建议的操作
     reasoning: str  # 推理过程
     timestamp: datetime
+    cached: bool = False  # 家居状态与之前给出该建议时相同，操作不会重复执行
+
+class RuleCondition(BaseModel):
+    """规则中的设备条件，未给出的字段不做限制"""
+    type: Optional[DeviceType] = None
+    sensor_type: Optional[SensorType] = None
+    status: Optional[DeviceStatus] = None
+    above: Optional[float] = None  # 传感器读数高于该值
+    below: Optional[float] = None  # 传感器读数低于该值
+    held_for: float = 0  # 秒，保持该状态的最短时间；规则要求房间无人时从房间变为无人起计算，否则从设备上次更新起计算
+
+class SuggestionRule(BaseModel):
+    """主动建议规则：按房间匹配，命中时直接给出建议或交给LLM判断"""
+    name: str
+    target: RuleCondition  # 规则作用的设备
+    occupied: Optional[bool] = None  # 目标设备所在房间的占用状态
+    requires: List[RuleCondition] = []  # 同一房间内还必须存在满足这些条件的设备
+    action: Optional[Dict[str, Any]] = None  # 对目标设备执行的操作 {"status", "properties"}
+    message: str = ""  # 建议文本，可使用 {room}、{device}
+    escalate: bool = False  # 为True时命中后交给LLM分析
 
 class UserInteraction(BaseModel):
     """用户交互模型"""
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+from enum import Enum
+
+from .devices import DeviceStatus
+
+class TriggerType(str, Enum):
+    """自动化触发类型"""
+    SENSOR_ABOVE = "sensor_above"    # 传感器读数从不高于阈值变为高于阈值
+    SENSOR_BELOW = "sensor_below"    # 传感器读数从不低于阈值变为低于阈值
+    MOTION_START = "motion_start"    # 人体感应从无人变为有人
+    MOTION_STOP = "motion_stop"      # 人体感应从有人变为无人
+    DEVICE_STATUS = "device_status"  # 设备开关状态变为指定状态
+    TIME = "time"                    # 每天的指定时刻
+
+class AutomationTrigger(BaseModel):
+    """自动化触发条件"""
+    type: TriggerType
+    device_id: Optional[str] = None  # 除定时触发外必填
+    threshold: Optional[float] = None  # sensor_above / sensor_below 的阈值
+    status: Optional[DeviceStatus] = None  # device_status 的目标状态
+    at: Optional[str] = None  # time 触发的时刻，HH:MM
+
+class Automation(BaseModel):
+    """自动化规则模型"""
+    id: str
+    name: str
+    enabled: bool = True
+    trigger: AutomationTrigger
+    actions: Dict[str, Any] = {}  # 与智能体操作块相同：{device_id: {"status", "properties"}}，可含 "scene"
+    last_executed: Optional[datetime] = None
+    execution_count: int = 0
+
+class AutomationRequest(BaseModel):
+    """创建或修改自动化规则的请求模型"""
+    name: str
+    enabled: bool = True
+    trigger: AutomationTrigger
+    actions: Dict[str, Any]
@@ -34,6 +34,15 @@ class Room(str, Enum):
     BATHROOM = "bathroom"         # 卫生间
     BALCONY = "balcony"          # 阳台
 
+# 房间的中文名称（提示词、规则建议和接口共用）
+ROOM_NAMES = {
+    Room.LIVING_ROOM: "客厅",
+    Room.BEDROOM: "卧室",
+    Room.KITCHEN: "厨房",
+    Room.BATHROOM: "卫生间",
+    Room.BALCONY: "阳台"
+}
+
 class Device(BaseModel):
     """设备基础模型"""
     id: str
@@ -56,6 +65,10 @@ class SensorDevice(Device):
     unit: Optional[str] = None
     detection_duration: int = 0  # 检测持续时间（秒）
 
+def is_numeric(value: Any) -> bool:
+    """传感器读数是否为数值（设备更新不校验属性类型，可能写入任意JSON值）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
 class LightDevice(Device):
     """灯光设备模型"""
     brightness: int = 100  # 亮度 0-100
@@ -72,6 +85,31 @@ class DeviceUpdateRequest(BaseModel):
     status: Optional[DeviceStatus] = None
     properties: Optional[Dict[str, Any]] = None
 
+class DeviceCommand(BaseModel):
+    """批量更新中的一条指令：按设备ID，或按房间和/或类型选择设备"""
+    device_id: Optional[str] = None
+    room: Optional[Room] = None
+    type: Optional[DeviceType] = None
+    status: Optional[DeviceStatus] = None
+    properties: Optional[Dict[str, Any]] = None
+
+class BulkDeviceUpdateRequest(BaseModel):
+    """批量设备更新请求模型"""
+    commands: List[DeviceCommand]
+    atomic: bool = True  # 任一指令无效时不执行任何更新
+
+class Scene(BaseModel):
+    """场景模型：一组按顺序应用的设备指令"""
+    name: str
+    description: str = ""
+    commands: List[DeviceCommand]
+
+class BulkDeviceUpdateResponse(BaseModel):
+    """批量设备更新响应模型"""
+    success: bool
+    message: str
+    results: List[Dict[str, Any]]  # 每个设备一条：device_id, success, message, action
+
 class DeviceResponse(BaseModel):
     """设备响应模型"""
     success: bool
@@ -85,3 +123,18 @@ class HomeState(BaseModel):
     timestamp: datetime
     room_occupancy: Dict[Room, bool]  # 房间占用状态
     summary: str  # 状态摘要
+
+# 设备事件的发起方
+AGENT_EVENT_SOURCE = "agent"  # 智能体执行的操作
+USER_EVENT_SOURCE = "user"  # 用户通过设备接口发起的操作
+
+class DeviceEvent(BaseModel):
+    """设备变更事件模型"""
+    device_id: str
+    type: DeviceType
+    room: Room
+    changes: Dict[str, Any]  # 变化字段的新值
+    previous: Dict[str, Any]  # 变化字段的旧值
+    timestamp: datetime
+    remote: bool = False  # 由其他工作进程的变更同步而来（多进程部署）
+    source: Optional[str] = None  # 变更的发起方：智能体为 "agent"，设备接口为 "user"，模拟和自动化为空
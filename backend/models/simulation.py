@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+
+from .devices import DeviceType, DeviceStatus, SensorType, Room
+
+class ThermalModel(BaseModel):
+    """房间热模型（一阶）：室温以 time_constant 向室外温度靠拢，开启的空调和房间里的人加热或制冷"""
+    initial_temperature: float = 24.0
+    time_constant: float = 7200.0  # 秒，围护结构的热时间常数
+    ac_rate: float = 4.0  # 每台开启的空调最大制冷/制热速度（°C/小时），接近设定温度时按温差线性减小
+    occupant_heat: float = 0.3  # 有人时的升温速度（°C/小时）
+    humidity: float = 50.0  # 无人时的相对湿度（%）
+    occupant_humidity: float = 5.0  # 有人时湿度增加（%）
+
+class OccupancyWindow(BaseModel):
+    """一天中房间有人概率较高的时段"""
+    start: str  # HH:MM
+    end: str  # HH:MM，早于 start 表示跨过午夜
+    probability: float = 0.9  # 该时段内房间有人的概率
+
+class DeviceGroup(BaseModel):
+    """一组相同配置的设备"""
+    id: str  # count 为1时即设备ID，否则生成 {id}_{序号}
+    name: str
+    type: DeviceType
+    sensor_type: Optional[SensorType] = None  # 传感器必填
+    count: int = 1
+    status: DeviceStatus = DeviceStatus.ON
+    properties: Dict[str, Any] = {}  # 初始属性，如 brightness、temperature、value、unit
+    update_rate: Optional[float] = None  # 传感器每秒上报次数，默认使用 HomeDefinition.sensor_update_rate
+    noise: Optional[float] = None  # 传感器读数噪声的标准差，默认按传感器类型
+
+class RoomDefinition(BaseModel):
+    """房间：热模型、占用作息和设备"""
+    room: Room
+    thermal: ThermalModel = ThermalModel()
+    occupancy: List[OccupancyWindow] = []
+    base_occupancy: float = 0.05  # 不在任何作息时段内时房间有人的概率
+    mean_dwell: float = 900.0  # 秒，有人/无人状态的平均持续时间
+    window_lux: float = 400.0  # 正午的自然光照（lux）
+    devices: List[DeviceGroup] = []
+
+class HomeDefinition(BaseModel):
+    """声明式的家庭定义，模拟引擎据此创建设备并生成传感器读数"""
+    name: str = "默认家庭"
+    rooms: List[RoomDefinition] = []
+    outdoor_mean: float = 22.0  # 室外日平均温度（°C）
+    outdoor_amplitude: float = 5.0  # 室外温度日变化幅度，15点最高、3点最低
+    sensor_update_rate: float = 0.2  # 传感器默认每秒上报次数
+    time_scale: float = 1.0  # 模拟时间与真实时间之比，大于1时加速作息和温度变化
+    seed: int = 0  # 随机数种子，相同种子和步进序列得到相同的读数
@@ -1,5 +1,23 @@
 # services包初始化文件
+from .event_bus import DeviceEventBus
+from .state_backend import StateBackend, SQLiteStateBackend, RedisStateBackend, create_state_backend
+from .simulation_engine import SimulationEngine, load_home_definition
 from .home_simulator import HomeSimulator
+from .device_stream import DeviceStream
+from .scene_engine import SceneEngine
+from .device_dispatcher import DeviceCommandDispatcher
+from .proactive_monitor import ProactiveMonitor
+from .rule_engine import RuleEngine
+from .automation_engine import AutomationEngine
+from .llm_provider import LLMProvider, DashScopeProvider, SyntheticProvider, ReplayProvider, LatencyModel, create_llm_provider
 from .agent_service import AgentService
+from .retention import RetentionManager
+from .home_registry import Home, HomeRegistry
 
-__all__ = ["HomeSimulator", "AgentService"]
+__all__ = [
+    "DeviceEventBus", "StateBackend", "SQLiteStateBackend", "RedisStateBackend", "create_state_backend",
+    "SimulationEngine", "load_home_definition", "HomeSimulator", "DeviceStream", "SceneEngine", "DeviceCommandDispatcher",
+    "ProactiveMonitor", "RuleEngine", "AutomationEngine", "LLMProvider", "DashScopeProvider",
+    "SyntheticProvider", "ReplayProvider", "LatencyModel", "create_llm_provider", "AgentService", "RetentionManager",
+    "Home", "HomeRegistry"
+]
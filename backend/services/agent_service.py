@@ -1,17 +1,27 @@
 import asyncio
 import os
 import json
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import re
+from datetime import datetime
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import uuid
 
 from models.agent import (
     AgentMessage, AgentContext, AgentSuggestion, 
     UserInteraction, AgentResponse, AgentConfig, MessageRole
 )
-from models.devices import HomeState, SensorDevice, SensorType, Room
-from database.database import db
-from openai import OpenAI
+from models.devices import AGENT_EVENT_SOURCE, HomeState, SensorDevice, SensorType, Room, ROOM_NAMES
+from database.database import async_db
+from services.home_simulator import HomeSimulator
+from services.device_dispatcher import DeviceCommandDispatcher, AGENT_ACTION_MODE
+from services.suggestion_cache import SuggestionCache
+from services.state_encoder import encode_home_state
+from services.proactive_monitor import ProactiveMonitor
+from services.rule_engine import RuleEngine, AGENT_RULES_ENABLED
+from services.llm_provider import LLMProvider, create_llm_provider
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))  # 同时进行的LLM请求上限
+AGENT_SUGGESTION_INTERVAL = 10.0  # 秒，两次主动建议的最小间隔
 
 SYSTEM_PROMPT = """你是一个智能家居助手，负责分析家居状态并提供主动建议。
 
@@ -58,6 +68,16 @@ SYSTEM_PROMPT = """你是一个智能家居助手，负责分析家居状态并
 {"light_bedroom": {"status": "on", "properties": {"brightness": 60}}}
 </action>
 
+需要同时调整多个设备时，优先按名称激活场景（可用场景见末尾）：
+<action>
+{"scene": "sleep"}
+</action>
+
+激活场景后再单独调整某个设备：
+<action>
+{"scene": "sleep", "ac_bedroom": {"properties": {"temperature": 25}}}
+</action>
+
 只有在明确需要执行操作时才使用<action>标签，否则只给出文字建议。
 
 回复要求：
@@ -74,11 +94,70 @@ SYSTEM_PROMPT = """你是一个智能家居助手，负责分析家居状态并
 "客厅灯已经关了<action>...</action>"
 """
 
+class ActionStreamParser:
+    """流式解析LLM输出中的<action>标签
+    
+    逐块输入模型输出，返回可以立即展示的文本和已闭合的操作JSON；
+    可能是标签开头的片段会暂存，直到能确定它是否属于标签。
+    """
+    
+    OPEN_TAG = "<action>"
+    CLOSE_TAG = "</action>"
+    
+    def __init__(self):
+        self._buffer = ""
+        self._in_action = False
+    
+    def feed(self, chunk: str) -> Tuple[str, List[str]]:
+        """输入一段模型输出
+        
+        Returns:
+            Tuple[str, List[str]]: 可展示的文本，以及本次闭合的操作块内容
+        """
+        self._buffer += chunk
+        text_parts = []
+        action_blocks = []
+        
+        while True:
+            if self._in_action:
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end < 0:
+                    break
+                action_blocks.append(self._buffer[:end])
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self._in_action = False
+            else:
+                start = self._buffer.find(self.OPEN_TAG)
+                if start < 0:
+                    keep = self._partial_tag_length(self._buffer)
+                    text_parts.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                text_parts.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(self.OPEN_TAG):]
+                self._in_action = True
+        
+        return "".join(text_parts), action_blocks
+    
+    def flush(self) -> str:
+        """输出结束时返回剩余文本（未闭合的操作块被丢弃）"""
+        remaining = "" if self._in_action else self._buffer
+        self._buffer = ""
+        self._in_action = False
+        return remaining
+    
+    def _partial_tag_length(self, text: str) -> int:
+        """text末尾与开始标签前缀重合的长度"""
+        for length in range(min(len(text), len(self.OPEN_TAG) - 1), 0, -1):
+            if text.endswith(self.OPEN_TAG[:length]):
+                return length
+        return 0
+
 class AgentService:
     """智能体服务"""
     
-    def __init__(self):
-        self.config = AgentConfig()
+    def __init__(self, home_simulator: Optional[HomeSimulator] = None, llm_provider: Optional[LLMProvider] = None):
+        self.config = AgentConfig(model=os.getenv("DASHSCOPE_MODEL", "qwen-turbo"))
         self.context = AgentContext(
             messages=[],
             current_state={},
@@ -86,48 +165,56 @@ class AgentService:
         )
         self.last_suggestion_time = None
         self.is_active = False
-        self.llm_client = None
+        self.llm_provider = llm_provider
+        # 传入的LLM提供方由调用方（如多个家庭共享时的 HomeRegistry）负责关闭
+        self._owns_llm_provider = llm_provider is None
+        self.home_simulator = home_simulator
+        self.database = home_simulator.database if home_simulator is not None else async_db
+        # 设备变化驱动的主动分析，initialize时启动
+        self.proactive_monitor: Optional[ProactiveMonitor] = None
+        self._llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        # 相同家居状态的主动建议直接复用，不重复调用LLM
+        self.suggestion_cache = SuggestionCache()
+        # 规则快速通道：常见情况不调用LLM
+        self.rule_engine = RuleEngine() if AGENT_RULES_ENABLED else None
+        
+        # 设备操作分发器：有模拟器实例时进程内执行，否则通过HTTP调用设备API
+        self.dispatcher = DeviceCommandDispatcher(
+            home_simulator,
+            mode=AGENT_ACTION_MODE if home_simulator is not None else "remote",
+            api_prefix=f"/api/{home_simulator.home_id}" if home_simulator is not None and home_simulator.home_id else "/api",
+            source=AGENT_EVENT_SOURCE
+        )
         
-        # 初始化LLM客户端
-        self._init_llm_client()
+        # 初始化LLM提供方
+        if self.llm_provider is None:
+            self._init_llm_provider()
     
-    def _init_llm_client(self):
-        """初始化LLM客户端"""
-        # 优先使用DashScope API
-        dashscope_key = os.getenv("DASHSCOPE_API_KEY")
-        if dashscope_key:
-            dashscope_base_url = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            try:
-                self.llm_client = OpenAI(
-                    api_key=dashscope_key,
-                    base_url=dashscope_base_url
-                )
-                self.config.model = os.getenv("DASHSCOPE_MODEL", "qwen-turbo")
-                print(f"✅ 已配置DashScope API ({self.config.model})")
-                return
-            except Exception as e:
-                raise ValueError(f"❌ DashScope配置失败: {e}")
-
-        # 备用API
-        pass
- 
-        # 无可用API或使用演示模式
-        raise ValueError("❌ 未配置有效的LLM API密钥，请检查环境变量 DASHSCOPE_API_KEY")
+    def _init_llm_provider(self):
+        """初始化LLM提供方（LLM_PROVIDER 选择 DashScope、合成模型或录制重放）"""
+        self.llm_provider = create_llm_provider()
+        print(f"✅ 已配置LLM提供方 {self.llm_provider.name} ({self.config.model})")
     
     async def initialize(self):
         """初始化智能体服务（必须有LLM支持）"""
-        if not self.llm_client:
-            raise RuntimeError("❌ LLM客户端初始化失败，智能体服务无法启动。请检查DashScope API配置。")
+        if not self.llm_provider:
+            raise RuntimeError("❌ LLM提供方初始化失败，智能体服务无法启动。请检查LLM_PROVIDER和DashScope API配置。")
         
         # 加载历史消息
         await self._load_context()
+        
+        # 订阅设备事件，状态显著变化时主动分析
+        if self.home_simulator is not None and self.config.proactive_mode:
+            self.proactive_monitor = ProactiveMonitor(self, self.home_simulator)
+            await self.proactive_monitor.start()
+        
         self.is_active = True
         print("🤖 智能体服务已启动（LLM模式）")
     
     async def _load_context(self):
         """加载历史上下文"""
         # 从数据库加载最近的消息
-        recent_messages = db.get_recent_messages(self.config.max_context_length)
+        recent_messages = await self.database.get_recent_messages(self.config.max_context_length)
         
         self.context.messages = []
         for msg_data in recent_messages:
@@ -141,22 +228,36 @@ class AgentService:
             self.context.messages.append(message)
         
         # 加载用户偏好
-        preferences = db.get_preference("user_preferences")
+        preferences = await self.database.get_preference("user_preferences")
         if preferences:
             self.context.user_preferences = preferences
     
-    async def analyze_home_state(self, home_state: HomeState) -> Optional[AgentSuggestion]:
-        """分析家居状态并生成建议"""
+    async def analyze_home_state(self, home_state: HomeState, requested: bool = False) -> Optional[AgentSuggestion]:
+        """分析家居状态并生成建议
+        
+        Args:
+            requested: 用户主动请求的分析，没有规则命中时也交给LLM；主动分析时按 AGENT_RULES_UNMATCHED 处理
+        """
         self.context.current_state = home_state.dict()
         
         # 检查是否需要生成建议
         if not self._should_generate_suggestion(home_state):
             return None
         
-        # 分析状态并生成建议
-        suggestion = await self._generate_suggestion(home_state)
+        # 先由规则处理，只有规则无法判断时才调用LLM
+        use_llm, suggestion = True, None
+        if self.rule_engine is not None:
+            use_llm, suggestion = self.rule_engine.decide(
+                home_state,
+                unmatched="llm" if requested else None,
+                user_changes=self.home_simulator.user_changes if self.home_simulator is not None else None
+            )
+            if suggestion:
+                print(f"⚡ 规则命中，跳过LLM: {suggestion.reasoning}")
+        if use_llm:
+            suggestion = await self._generate_suggestion(home_state)
         
-        if suggestion:
+        if suggestion and not suggestion.cached:
             # 如果建议包含操作，执行这些操作
             if suggestion.suggested_actions:
                 print(f"🔧 执行建议操作: {suggestion.suggested_actions}")
@@ -183,16 +284,29 @@ class AgentService:
     def _should_generate_suggestion(self, home_state: HomeState) -> bool:
         """判断是否应该生成建议"""
         # 如果最近刚生成过建议，避免过于频繁
-        if (self.last_suggestion_time and 
-            datetime.now() - self.last_suggestion_time < timedelta(seconds=10)):
+        if self.suggestion_cooldown_remaining() > 0:
             return False
         
         # 检查是否有值得关注的状态
         return True
     
+    def suggestion_cooldown_remaining(self) -> float:
+        """距离可以再次生成建议还有多少秒"""
+        if self.last_suggestion_time is None:
+            return 0.0
+        elapsed = (datetime.now() - self.last_suggestion_time).total_seconds()
+        return max(0.0, AGENT_SUGGESTION_INTERVAL - elapsed)
+    
     async def _generate_suggestion(self, home_state: HomeState) -> Optional[AgentSuggestion]:
         """**主动**生成智能建议"""
         try:
+            fingerprint = self.suggestion_cache.fingerprint(home_state)
+            cached = self.suggestion_cache.get(fingerprint)
+            if cached is not None:
+                # 同一状态已经给出过建议（操作已执行、消息已保存），返回标记为缓存的副本
+                print("♻️ 家居状态未变化，返回缓存的建议")
+                return cached.copy(update={"id": str(uuid.uuid4()), "timestamp": datetime.now(), "cached": True})
+            
             # 构建详细的状态描述
             state_description = self._build_detailed_state_description(home_state)
             print(f"🔍 分析家居状态: {state_description}")
@@ -207,7 +321,9 @@ class AgentService:
             
             if response:
                 # 解析AI响应
-                return self._parse_ai_response(response)
+                suggestion = self._parse_ai_response(response)
+                self.suggestion_cache.put(fingerprint, suggestion)
+                return suggestion
             else:
                 print("❌ LLM调用失败，无可用的建议生成方式")
                 return None
@@ -219,54 +335,22 @@ class AgentService:
     async def _call_llm_api(self, system_prompt: str, user_prompt: str, with_history: bool = False) -> Optional[str]:
         """调用LLM API"""
         try:
-            if not self.llm_client:
+            if not self.llm_provider:
                 return None
             
-            import asyncio
-            
-            # 构建消息列表
-            if with_history:
-                # 包含历史消息
-                messages = [{"role": "system", "content": system_prompt}]
-                
-                # 添加最近的历史消息（限制数量以避免超过token限制）
-                recent_messages = self.context.messages[-6:]  # 最近6条消息
-                for msg in recent_messages:
-                    role = "user" if msg.role == MessageRole.USER else "assistant"
-                    messages.append({"role": role, "content": msg.content})
-                
-                # 添加当前用户消息
-                messages.append({"role": "user", "content": user_prompt})
-            else:
-                # 不包含历史消息，只有系统提示和用户消息
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
+            messages = self._build_llm_messages(system_prompt, user_prompt, with_history)
             
-            # 使用异步方式调用
-            def sync_call():
-                # 为qwen模型添加特殊参数
-                extra_params = {}
-                if "qwen" in self.config.model.lower():
-                    extra_params["stream"] = False
-                    # extra_params["extra_body"] = {"enable_thinking": False}
-                
-                return self.llm_client.chat.completions.create(
-                    model=self.config.model,
-                    messages=messages,
+            # 异步调用，并发数受信号量限制
+            async with self._llm_semaphore:
+                response = await self.llm_provider.complete(
+                    self.config.model,
+                    messages,
                     temperature=0.7,
-                    max_tokens=300,
-                    timeout=10,  # 10秒超时
-                    **extra_params
+                    max_tokens=300
                 )
             
-            # 在线程池中执行同步调用
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, sync_call)
-            
-            if response and response.choices:
-                return response.choices[0].message.content.strip()
+            if response:
+                return response.strip()
             else:
                 print("❌ LLM API返回空响应")
                 return None
@@ -274,6 +358,46 @@ class AgentService:
         except Exception as e:
             print(f"❌ LLM API调用失败: {e}")
             return None    
+    
+    async def _stream_llm_api(self, system_prompt: str, user_prompt: str, with_history: bool = False) -> AsyncIterator[str]:
+        """流式调用LLM API，逐段返回生成的文本"""
+        if not self.llm_provider:
+            return
+        
+        messages = self._build_llm_messages(system_prompt, user_prompt, with_history)
+        try:
+            async with self._llm_semaphore:
+                async for chunk in self.llm_provider.stream(
+                    self.config.model,
+                    messages,
+                    temperature=0.7,
+                    max_tokens=300
+                ):
+                    yield chunk
+        except Exception as e:
+            print(f"❌ LLM流式调用失败: {e}")
+    
+    def _build_llm_messages(self, system_prompt: str, user_prompt: str, with_history: bool) -> List[Dict[str, str]]:
+        """构建LLM消息列表"""
+        if with_history:
+            # 包含历史消息
+            messages = [{"role": "system", "content": system_prompt}]
+            
+            # 添加最近的历史消息（限制数量以避免超过token限制）
+            recent_messages = self.context.messages[-6:]  # 最近6条消息
+            for msg in recent_messages:
+                role = "user" if msg.role == MessageRole.USER else "assistant"
+                messages.append({"role": role, "content": msg.content})
+            
+            # 添加当前用户消息
+            messages.append({"role": "user", "content": user_prompt})
+            return messages
+        
+        # 不包含历史消息，只有系统提示和用户消息
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
         
     def _build_detailed_state_description(self, home_state: HomeState) -> str:
         """构建详细的状态描述
@@ -284,14 +408,17 @@ class AgentService:
         Returns:
             str: 详细的状态描述字符串
         """
-        
-        return str(home_state)
-        
-        # return home_state.dict()
+        return encode_home_state(home_state)
+    
+    def _build_system_prompt(self) -> str:
+        """系统提示词，附加当前可用的场景"""
+        if self.home_simulator is None or not self.home_simulator.scenes.list_scenes():
+            return SYSTEM_PROMPT
+        return f"{SYSTEM_PROMPT}\n可用场景：\n{self.home_simulator.scenes.describe()}\n"
     
     def _build_analysis_system_prompt(self) -> str:
         """构建优化的系统提示词"""
-        return SYSTEM_PROMPT
+        return self._build_system_prompt()
     
     def _build_analysis_user_prompt(self, state_description: str) -> str:
         """构建优化的用户提示词"""
@@ -302,9 +429,6 @@ class AgentService:
     
     def _parse_ai_response(self, ai_response: str) -> AgentSuggestion:
         """解析AI响应"""
-        import re
-        import json
-        
         # 解析AI响应中的操作指令，格式为：<action>{...}</action>
         print(f"🔍 解析AI响应: {ai_response}")
         action_pattern = re.compile(r'<action>(.*?)</action>', re.DOTALL)
@@ -335,14 +459,7 @@ class AgentService:
     
     def _translate_room_name(self, room: str) -> str:
         """翻译房间名称"""
-        room_names = {
-            "living_room": "客厅",
-            "bedroom": "卧室", 
-            "kitchen": "厨房",
-            "bathroom": "卫生间",
-            "balcony": "阳台"
-        }
-        return room_names.get(room, room)
+        return ROOM_NAMES.get(room, room)
     
     async def handle_user_interaction(self, interaction: UserInteraction) -> AgentResponse:
         """处理用户交互"""
@@ -378,24 +495,109 @@ class AgentService:
             timestamp=datetime.now()
         )
     
+    async def stream_user_interaction(self, interaction: UserInteraction) -> AsyncIterator[Dict[str, Any]]:
+        """流式处理用户交互
+        
+        逐段产出事件：
+        - {"type": "token", "content": ...}: 去除<action>标签后的回复文本
+        - {"type": "action", "results": [...]}: 某个操作块的执行结果
+        - {"type": "done", "response": AgentResponse}: 完整回复
+        
+        操作块在闭合标签解析完成后立即开始执行，不等待模型输出结束。
+        """
+        user_message = AgentMessage(
+            id=str(uuid.uuid4()),
+            role=MessageRole.USER,
+            content=interaction.message,
+            timestamp=datetime.now(),
+            metadata=interaction.context or {}
+        )
+        await self._add_message(user_message)
+        
+        user_prompt = f"用户说：{interaction.message}\n\n请给出合适的回复："
+        parser = ActionStreamParser()
+        content_parts = []
+        pending_actions: List[asyncio.Task] = []
+        actions_taken = []
+        
+        async for delta in self._stream_llm_api(self._build_system_prompt(), user_prompt, with_history=True):
+            text, action_blocks = parser.feed(delta)
+            if text:
+                content_parts.append(text)
+                yield {"type": "token", "content": text}
+            
+            for block in action_blocks:
+                actions = self._parse_action_json(block)
+                if actions:
+                    print(f"🔧 用户交互中执行操作: {actions}")
+                    pending_actions.append(asyncio.create_task(self._execute_suggested_actions(actions)))
+            
+            # 推送已经完成的操作结果
+            for task in [task for task in pending_actions if task.done()]:
+                pending_actions.remove(task)
+                results = task.result()
+                actions_taken.extend(results)
+                yield {"type": "action", "results": results}
+        
+        tail = parser.flush()
+        if tail:
+            content_parts.append(tail)
+            yield {"type": "token", "content": tail}
+        
+        for task in pending_actions:
+            results = await task
+            actions_taken.extend(results)
+            yield {"type": "action", "results": results}
+        
+        response_content = "".join(content_parts).strip()
+        if not response_content:
+            response_content = "操作已完成。" if actions_taken else "我明白了。有什么需要帮助的可以随时告诉我。"
+        
+        agent_message = AgentMessage(
+            id=str(uuid.uuid4()),
+            role=MessageRole.AGENT,
+            content=response_content,
+            timestamp=datetime.now(),
+            metadata={"actions_taken": actions_taken}
+        )
+        await self._add_message(agent_message)
+        
+        yield {
+            "type": "done",
+            "response": AgentResponse(
+                message=response_content,
+                suggestions=[],
+                actions_taken=actions_taken,
+                needs_user_confirmation=False,
+                timestamp=datetime.now()
+            )
+        }
+    
+    def _parse_action_json(self, action_block: str) -> Dict[str, Any]:
+        """解析操作块中的JSON，失败时返回空字典"""
+        try:
+            actions = json.loads(action_block.strip())
+        except json.JSONDecodeError as e:
+            print(f"❌ 解析操作JSON失败: {e}")
+            print(f"原始内容: {action_block}")
+            return {}
+        return actions if isinstance(actions, dict) else {}
+    
     async def _process_user_response(self, message: str) -> str:
         """处理用户响应（使用LLM）"""
         try:
-            if not self.llm_client:
-                print("❌ LLM客户端不可用，无法处理用户响应")
+            if not self.llm_provider:
+                print("❌ LLM提供方不可用，无法处理用户响应")
                 return "抱歉，我暂时无法处理您的请求。"
             
             # 构建历史消息和当前用户消息
             user_prompt = f"用户说：{message}\n\n请给出合适的回复："
             
             # 调用改进的LLM API（包含历史消息）
-            response = await self._call_llm_api(SYSTEM_PROMPT, user_prompt, with_history=True)
+            response = await self._call_llm_api(self._build_system_prompt(), user_prompt, with_history=True)
             
             if response:
                 # 解析响应中的操作
-                import re
-                import json
-                
                 action_pattern = re.compile(r'<action>(.*?)</action>', re.DOTALL)
                 matches = action_pattern.search(response)
                 
@@ -424,79 +626,8 @@ class AgentService:
     
     async def _execute_suggested_actions(self, actions: dict) -> List[Dict[str, Any]]:
         """执行建议的操作"""
-        results = []
-        
-        if not actions:
-            return results
-        
         try:
-            import httpx
-            import os
-            
-            # 获取后端服务地址 - 直接使用localhost:8000，因为这是内部调用
-            base_url = f"http://localhost:{os.getenv('PORT', 8000)}"
-            
-            async with httpx.AsyncClient() as client:
-                for device_id, device_config in actions.items():
-                    try:
-                        # 准备更新数据
-                        update_data = {}
-                        
-                        # 设置设备状态
-                        if "status" in device_config:
-                            update_data["status"] = device_config["status"]
-                        
-                        # 设置设备属性
-                        if "properties" in device_config:
-                            update_data["properties"] = device_config["properties"]
-                        
-                        # 发送PUT请求更新设备
-                        response = await client.put(
-                            f"{base_url}/api/devices/{device_id}",
-                            json=update_data,
-                            headers={"Content-Type": "application/json"},
-                            timeout=10.0
-                        )
-                        
-                        if response.status_code == 200:
-                            response_data = response.json()
-                            if response_data.get("success"):
-                                results.append({
-                                    "device_id": device_id,
-                                    "success": True,
-                                    "message": response_data.get("message", "设备控制成功"),
-                                    "action": device_config
-                                })
-                                print(f"✅ 设备 {device_id} 控制成功")
-                            else:
-                                results.append({
-                                    "device_id": device_id,
-                                    "success": False,
-                                    "message": response_data.get("message", "设备控制失败"),
-                                    "action": device_config
-                                })
-                                print(f"❌ 设备 {device_id} 控制失败: {response_data.get('message')}")
-                        else:
-                            error_text = response.text
-                            results.append({
-                                "device_id": device_id,
-                                "success": False,
-                                "message": f"HTTP {response.status_code}: {error_text}",
-                                "action": device_config
-                            })
-                            print(f"❌ 设备 {device_id} API调用失败: HTTP {response.status_code}")
-                            
-                    except Exception as e:
-                        results.append({
-                            "device_id": device_id,
-                            "success": False,
-                            "message": f"执行失败: {str(e)}",
-                            "action": device_config
-                        })
-                        print(f"❌ 设备 {device_id} 执行异常: {e}")
-            
-            return results
-            
+            return await self.dispatcher.dispatch(actions)
         except Exception as e:
             print(f"❌ 执行建议操作失败: {e}")
             return [{
@@ -504,14 +635,13 @@ class AgentService:
                 "message": f"执行失败: {str(e)}",
                 "actions": actions
             }]
-        
     
     async def _add_message(self, message: AgentMessage):
         """添加消息到上下文"""
         self.context.messages.append(message)
         
         # 保存到数据库
-        db.save_message(message)
+        await self.database.save_message(message)
         
         # 限制上下文长度
         if len(self.context.messages) > self.config.max_context_length:
@@ -519,13 +649,21 @@ class AgentService:
         
         self.context.last_interaction = datetime.now()
     
+    async def close(self):
+        """释放智能体服务持有的资源"""
+        if self.proactive_monitor:
+            await self.proactive_monitor.stop()
+        await self.dispatcher.close()
+        if self.llm_provider and self._owns_llm_provider:
+            await self.llm_provider.close()
+    
     def get_context(self) -> AgentContext:
         """获取当前上下文"""
         return self.context
     
     async def get_conversation_history(self, limit: int = 20) -> List[AgentMessage]:
         """获取对话历史"""
-        messages_data = db.get_recent_messages(limit)
+        messages_data = await self.database.get_recent_messages(limit)
         messages = []
         
         for msg_data in messages_data:
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from models.automation import Automation, AutomationTrigger, TriggerType
+from models.devices import DeviceEvent
+from services.home_simulator import HomeSimulator
+from services.device_dispatcher import DeviceCommandDispatcher
+
+AUTOMATION_COOLDOWN = float(os.getenv("AUTOMATION_COOLDOWN", 1.0))  # 秒，同一规则两次执行的最短间隔
+
+class AutomationEngine:
+    """自动化规则引擎
+
+    触发条件按监听的设备ID建立索引（定时触发按 HH:MM 索引），每个设备事件
+    只评估监听该设备的规则，与规则总数无关。多进程部署时只有主进程评估
+    触发条件（包括其他进程同步来的事件），规则修改后通知其他进程重新加载。阈值和人体感应触发比较事件中的
+    新旧值，只在越过阈值的那一次更新时触发。动作格式与智能体操作块相同，
+    通过本地模式的 DeviceCommandDispatcher 作为一次批量更新执行。
+    """
+
+    def __init__(self, home_simulator: HomeSimulator, cooldown: float = AUTOMATION_COOLDOWN):
+        self.home_simulator = home_simulator
+        self.cooldown = cooldown
+        self.dispatcher = DeviceCommandDispatcher(home_simulator, mode="local")
+        self._automations: Dict[str, Automation] = {}
+        # 设备ID / 时刻 -> 规则ID（dict作为有序集合）
+        self._device_index: Dict[str, Dict[str, None]] = {}
+        self._time_index: Dict[str, Dict[str, None]] = {}
+        self._last_fired: Dict[str, float] = {}
+        self._dirty: Set[str] = set()  # 执行统计待写入的规则
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.evaluated_count = 0
+
+    async def start(self):
+        """加载规则，订阅设备事件并启动定时触发"""
+        if self._tasks:
+            return
+        await self._load()
+        self.home_simulator.state_backend.on_reload("automations", self._load)
+        # 触发不能丢事件，使用无界队列
+        self._queue = self.home_simulator.event_bus.subscribe(queue_size=0)
+        self._tasks = [asyncio.create_task(self._run_events()), asyncio.create_task(self._run_timer())]
+
+    async def stop(self):
+        """停止触发并写入执行统计"""
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._queue is not None:
+            self.home_simulator.event_bus.unsubscribe(self._queue)
+            self._queue = None
+        await self._flush_stats()
+        await self.dispatcher.close()
+
+    async def _load(self):
+        """从数据库（重新）加载规则"""
+        await self._flush_stats()
+        self._automations.clear()
+        self._device_index.clear()
+        self._time_index.clear()
+        for row in await self.home_simulator.database.get_automations():
+            self._index(Automation.parse_raw(row["definition"]))
+
+    @property
+    def is_primary(self) -> bool:
+        """是否在本进程评估触发条件"""
+        return self.home_simulator.state_backend.is_primary
+
+    def list_automations(self) -> List[Automation]:
+        """获取所有规则"""
+        return list(self._automations.values())
+
+    def get_automation(self, automation_id: str) -> Optional[Automation]:
+        """获取规则"""
+        return self._automations.get(automation_id)
+
+    async def save(self, automation: Automation):
+        """创建或替换规则
+
+        Raises:
+            ValueError: 触发条件不完整
+        """
+        self.validate_trigger(automation.trigger)
+        previous = self._automations.get(automation.id)
+        if previous is not None:
+            self._unindex(previous)
+        self._index(automation)
+        await self.home_simulator.database.save_automations([self._row(automation)])
+        await self.home_simulator.state_backend.notify_reload("automations")
+
+    async def delete(self, automation_id: str) -> bool:
+        """删除规则"""
+        automation = self._automations.get(automation_id)
+        if automation is None:
+            return False
+        self._unindex(automation)
+        self._dirty.discard(automation_id)
+        await self.home_simulator.database.delete_automation(automation_id)
+        await self.home_simulator.state_backend.notify_reload("automations")
+        return True
+
+    async def run(self, automation_id: str) -> List[Dict[str, Any]]:
+        """立即执行规则的动作（忽略触发条件和启用状态）
+
+        Raises:
+            KeyError: 规则不存在
+        """
+        automation = self._automations[automation_id]
+        results = await self._execute(automation, force=True)
+        await self._flush_stats()
+        await self.home_simulator.state_backend.notify_reload("automations")
+        return results
+
+    @staticmethod
+    def validate_trigger(trigger: AutomationTrigger):
+        """检查触发条件所需字段"""
+        if trigger.type == TriggerType.TIME:
+            try:
+                datetime.strptime(trigger.at or "", "%H:%M")
+            except ValueError:
+                raise ValueError("定时触发需要 HH:MM 格式的 at")
+            return
+
+        if not trigger.device_id:
+            raise ValueError("设备触发需要 device_id")
+        if trigger.type in (TriggerType.SENSOR_ABOVE, TriggerType.SENSOR_BELOW) and trigger.threshold is None:
+            raise ValueError("阈值触发需要 threshold")
+        if trigger.type == TriggerType.DEVICE_STATUS and trigger.status is None:
+            raise ValueError("设备状态触发需要 status")
+
+    @staticmethod
+    def is_triggered(trigger: AutomationTrigger, event: DeviceEvent) -> bool:
+        """判断设备事件是否满足触发条件"""
+        if trigger.type == TriggerType.DEVICE_STATUS:
+            return event.changes.get("status") == trigger.status
+
+        if "value" not in event.changes:
+            return False
+        value, previous = event.changes["value"], event.previous.get("value")
+        if value is None:
+            return False
+
+        if trigger.type == TriggerType.SENSOR_ABOVE:
+            return value > trigger.threshold and (previous is None or previous <= trigger.threshold)
+        if trigger.type == TriggerType.SENSOR_BELOW:
+            return value < trigger.threshold and (previous is None or previous >= trigger.threshold)
+        if trigger.type == TriggerType.MOTION_START:
+            return value == 1 and previous != 1
+        if trigger.type == TriggerType.MOTION_STOP:
+            return value == 0 and previous == 1
+        return False
+
+    def _index(self, automation: Automation):
+        self._automations[automation.id] = automation
+        if automation.trigger.type == TriggerType.TIME:
+            self._time_index.setdefault(automation.trigger.at, {})[automation.id] = None
+        else:
+            self._device_index.setdefault(automation.trigger.device_id, {})[automation.id] = None
+
+    def _unindex(self, automation: Automation):
+        self._automations.pop(automation.id, None)
+        index = self._time_index if automation.trigger.type == TriggerType.TIME else self._device_index
+        key = automation.trigger.at if automation.trigger.type == TriggerType.TIME else automation.trigger.device_id
+        bucket = index.get(key, {})
+        bucket.pop(automation.id, None)
+        if not bucket:
+            index.pop(key, None)
+
+    async def _run_events(self):
+        """处理设备事件，每批事件处理完后写入执行统计"""
+        while True:
+            events = [await self._queue.get()]
+            while not self._queue.empty():
+                events.append(self._queue.get_nowait())
+            if not self.is_primary:
+                continue
+
+            for event in events:
+                for automation_id in list(self._device_index.get(event.device_id, {})):
+                    automation = self._automations.get(automation_id)
+                    if automation is None or not automation.enabled:
+                        continue
+                    self.evaluated_count += 1
+                    if self.is_triggered(automation.trigger, event):
+                        await self._execute(automation)
+
+            try:
+                await self._flush_stats()
+            except Exception as e:
+                print(f"❌ 自动化执行统计写入失败: {e}")
+
+    async def _run_timer(self):
+        """每分钟开始时执行该时刻的定时规则"""
+        while True:
+            now = datetime.now()
+            next_minute = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
+            await asyncio.sleep((next_minute - now).total_seconds())
+            if not self.is_primary:
+                continue
+
+            for automation_id in list(self._time_index.get(next_minute.strftime("%H:%M"), {})):
+                automation = self._automations.get(automation_id)
+                if automation is not None and automation.enabled:
+                    await self._execute(automation)
+
+            try:
+                await self._flush_stats()
+            except Exception as e:
+                print(f"❌ 自动化执行统计写入失败: {e}")
+
+    async def _execute(self, automation: Automation, force: bool = False) -> List[Dict[str, Any]]:
+        """执行规则的动作，冷却时间内的重复触发被忽略（避免规则之间循环触发）"""
+        now = time.monotonic()
+        if not force and now - self._last_fired.get(automation.id, float("-inf")) < self.cooldown:
+            return []
+        self._last_fired[automation.id] = now
+
+        print(f"⚙️ 执行自动化: {automation.name}")
+        try:
+            results = await self.dispatcher.dispatch(dict(automation.actions))
+        except Exception as e:
+            print(f"❌ 自动化 {automation.name} 执行失败: {e}")
+            return []
+
+        automation.last_executed = datetime.now()
+        automation.execution_count += 1
+        self._dirty.add(automation.id)
+        return results
+
+    async def _flush_stats(self):
+        """写入执行统计有变化的规则"""
+        if not self._dirty:
+            return
+        rows = [self._row(self._automations[automation_id])
+                for automation_id in self._dirty if automation_id in self._automations]
+        self._dirty.clear()
+        if rows:
+            await self.home_simulator.database.save_automations(rows)
+
+    @staticmethod
+    def _row(automation: Automation) -> tuple:
+        return (automation.id, automation.name, automation.json())
+
+    def stats(self) -> Dict[str, Any]:
+        """规则数量和触发评估次数"""
+        return {
+            "automations": len(self._automations),
+            "watched_devices": len(self._device_index),
+            "scheduled_times": len(self._time_index),
+            "evaluated": self.evaluated_count
+        }
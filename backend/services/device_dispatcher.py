@@ -0,0 +1,178 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from services.home_simulator import HomeSimulator
+
+# local: 直接调用进程内的HomeSimulator；remote: 通过HTTP调用设备API
+AGENT_ACTION_MODE = os.getenv("AGENT_ACTION_MODE", "local")
+AGENT_ACTION_BASE_URL = os.getenv("AGENT_ACTION_BASE_URL", f"http://localhost:{os.getenv('PORT', 8000)}")
+
+# 操作块中表示激活场景的保留键：{"scene": "sleep", "light_bedroom": {...}}
+SCENE_ACTION_KEY = "scene"
+
+class DeviceCommandDispatcher:
+    """设备指令分发器
+
+    执行智能体给出的 {device_id: {"status": ..., "properties": {...}}} 操作，
+    一个操作块中的所有设备作为一次批量更新执行（本地直接调用
+    HomeSimulator.update_devices，远程调用 /api/devices/bulk），每个设备返回一条结果：
+    {"device_id", "success", "message", "action"}
+
+    操作块可以包含 "scene" 键按名称激活场景，同一块中的设备操作在场景之后应用。
+    设备事件带上 source（远程执行时通过 X-Change-Source 请求头传递），订阅方据此区分操作的发起方。
+    """
+
+    def __init__(
+        self,
+        home_simulator: Optional[HomeSimulator] = None,
+        mode: str = AGENT_ACTION_MODE,
+        base_url: str = AGENT_ACTION_BASE_URL,
+        api_prefix: str = "/api",
+        source: Optional[str] = None
+    ):
+        if mode not in ("local", "remote"):
+            raise ValueError(f"未知的操作执行模式: {mode}")
+        if mode == "local" and home_simulator is None:
+            raise ValueError("本地模式需要提供HomeSimulator实例")
+
+        self.home_simulator = home_simulator
+        self.mode = mode
+        self.base_url = base_url
+        self.api_prefix = api_prefix  # 多家庭部署时为 /api/{home_id}
+        self.source = source
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    async def dispatch(self, actions: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """批量执行所有设备的操作，各设备互不影响
+
+        Args:
+            actions: 设备ID到操作配置的映射
+
+        Returns:
+            List[Dict[str, Any]]: 每个设备的执行结果，顺序与actions一致
+        """
+        if not actions:
+            return []
+
+        scene = actions.get(SCENE_ACTION_KEY)
+        device_actions = {key: value for key, value in actions.items() if key != SCENE_ACTION_KEY}
+        execute = self._execute_local if self.mode == "local" else self._execute_remote
+        try:
+            results = await execute(scene, device_actions)
+        except Exception as e:
+            results = [self._result(device_id, device_config, False, f"执行失败: {str(e)}")
+                       for device_id, device_config in device_actions.items()]
+            if scene is not None:
+                results.insert(0, self._scene_result(scene, f"执行失败: {str(e)}"))
+
+        for result in results:
+            if result["success"]:
+                print(f"✅ 设备 {result['device_id']} 控制成功")
+            else:
+                print(f"❌ 设备 {result['device_id']} 控制失败: {result['message']}")
+        return results
+
+    async def _execute_local(self, scene: Optional[str], device_actions: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """直接调用HomeSimulator批量更新设备，场景计划与设备操作合并为一次更新"""
+        if scene is None:
+            return await self.home_simulator.update_devices(device_actions, atomic=False, source=self.source)
+
+        try:
+            plan = self.home_simulator.scenes.plan(scene)
+        except KeyError:
+            results = [self._scene_result(scene, "场景不存在")]
+            if device_actions:
+                results.extend(await self.home_simulator.update_devices(device_actions, atomic=False, source=self.source))
+            return results
+
+        merged = dict(plan)
+        for device_id, device_config in device_actions.items():
+            merged[device_id] = self._merge_action(merged.get(device_id), device_config)
+        return await self.home_simulator.update_devices(merged, atomic=False, source=self.source)
+
+    async def _execute_remote(self, scene: Optional[str], device_actions: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """通过场景激活接口和设备批量更新接口更新设备"""
+        results = []
+        if scene is not None:
+            response = await self._get_http_client().post(
+                f"{self.api_prefix}/scenes/{scene}/activate",
+                params={"atomic": "false"}
+            )
+            if response.status_code == 200:
+                results.extend(response.json()["results"])
+            else:
+                results.append(self._scene_result(scene, f"HTTP {response.status_code}: {response.text}"))
+
+        if device_actions:
+            results.extend(await self._execute_bulk_remote(device_actions))
+        return results
+
+    async def _execute_bulk_remote(self, actions: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """调用设备批量更新接口"""
+        commands = []
+        for device_id, device_config in actions.items():
+            command = {"device_id": device_id}
+            if "status" in device_config:
+                command["status"] = device_config["status"]
+            if "properties" in device_config:
+                command["properties"] = device_config["properties"]
+            commands.append(command)
+
+        response = await self._get_http_client().post(
+            f"{self.api_prefix}/devices/bulk",
+            json={"commands": commands, "atomic": False}
+        )
+
+        if response.status_code != 200:
+            message = f"HTTP {response.status_code}: {response.text}"
+            return [self._result(device_id, device_config, False, message)
+                    for device_id, device_config in actions.items()]
+
+        results = {result["device_id"]: result for result in response.json()["results"]}
+        return [
+            self._result(device_id, device_config, results[device_id]["success"], results[device_id]["message"])
+            if device_id in results else self._result(device_id, device_config, False, "设备控制失败")
+            for device_id, device_config in actions.items()
+        ]
+
+    @staticmethod
+    def _merge_action(base: Optional[Dict[str, Any]], override: Dict[str, Any]) -> Dict[str, Any]:
+        """在场景计划的设备操作上应用覆盖：状态替换，属性按键合并"""
+        if base is None:
+            return override
+        merged = dict(base)
+        if "status" in override:
+            merged["status"] = override["status"]
+        if override.get("properties"):
+            merged["properties"] = {**base.get("properties", {}), **override["properties"]}
+        return merged
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """获取复用的HTTP客户端"""
+        if self._http_client is None:
+            headers = {"X-Change-Source": self.source} if self.source else None
+            self._http_client = httpx.AsyncClient(base_url=self.base_url, timeout=10.0, headers=headers)
+        return self._http_client
+
+    @classmethod
+    def _scene_result(cls, scene: str, message: str) -> Dict[str, Any]:
+        """构建场景本身无法执行时的结果"""
+        return cls._result(None, {SCENE_ACTION_KEY: scene}, False, f"场景 {scene}: {message}")
+
+    @staticmethod
+    def _result(device_id: Optional[str], device_config: Dict[str, Any], success: bool, message: str) -> Dict[str, Any]:
+        """构建单个设备的执行结果"""
+        return {
+            "device_id": device_id,
+            "success": success,
+            "message": message,
+            "action": device_config
+        }
+
+    async def close(self):
+        """关闭HTTP客户端"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
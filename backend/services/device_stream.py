@@ -0,0 +1,98 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from models.devices import Device, DeviceEvent, Room
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+DEVICE_STREAM_QUEUE_SIZE = int(os.getenv("DEVICE_STREAM_QUEUE_SIZE", 256))  # 每个推送客户端的事件队列长度
+DEVICE_STREAM_HEARTBEAT = float(os.getenv("DEVICE_STREAM_HEARTBEAT", 15.0))  # 秒，无事件时的心跳间隔
+DEVICE_STREAM_MAX_BATCH = int(os.getenv("DEVICE_STREAM_MAX_BATCH", 500))  # 单条推送消息最多合并的事件数
+
+class DeviceStream:
+    """单个推送客户端的设备事件流
+
+    订阅事件总线（可按房间过滤），每次取出队列中已积压的全部事件，同一设备的
+    多次变化合并为一条再推送。客户端消费过慢时总线丢弃最旧的事件，流随后发送
+    一次完整快照让客户端重新同步，而不是无限堆积。
+
+    推送消息格式：
+        {"type": "snapshot", "devices": [...], "resync": bool}
+        {"type": "changes", "events": [DeviceEvent, ...]}
+        {"type": "ping"}
+    """
+
+    def __init__(
+        self,
+        home_simulator: "HomeSimulator",
+        rooms: Optional[Iterable[Room]] = None,
+        queue_size: int = DEVICE_STREAM_QUEUE_SIZE,
+        heartbeat: float = DEVICE_STREAM_HEARTBEAT,
+        max_batch: int = DEVICE_STREAM_MAX_BATCH
+    ):
+        self.home_simulator = home_simulator
+        self.rooms = set(rooms) if rooms else None
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def __aenter__(self) -> "DeviceStream":
+        self._queue = self.home_simulator.event_bus.subscribe(queue_size=self.queue_size, rooms=self.rooms)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.home_simulator.event_bus.unsubscribe(self._queue)
+        self._queue = None
+
+    def snapshot(self, resync: bool = False) -> Dict[str, Any]:
+        """订阅范围内所有设备的当前状态"""
+        if self.rooms is None:
+            devices: List[Device] = self.home_simulator.get_all_devices()
+        else:
+            devices = [device for room in self.rooms for device in self.home_simulator.get_devices_by_room(room)]
+        return {"type": "snapshot", "devices": devices, "resync": resync}
+
+    async def messages(self):
+        """依次产生推送消息：首先是快照，之后是合并后的变更、重新同步的快照或心跳"""
+        yield self.snapshot()
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.heartbeat)
+            except asyncio.TimeoutError:
+                yield {"type": "ping"}
+                continue
+
+            events = [first]
+            while len(events) < self.max_batch and not self._queue.empty():
+                events.append(self._queue.get_nowait())
+
+            if self.home_simulator.event_bus.take_dropped(self._queue):
+                # 已丢失部分事件，增量无法还原完整状态
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+                yield self.snapshot(resync=True)
+                continue
+
+            yield {"type": "changes", "events": self._coalesce(events)}
+
+    @staticmethod
+    def _coalesce(events: List[DeviceEvent]) -> List[DeviceEvent]:
+        """合并同一设备的多次变化：保留最新值和最早的旧值"""
+        merged: Dict[str, DeviceEvent] = {}
+        copied = set()  # 事件对象由所有订阅者共享，合并前先复制
+        for event in events:
+            current = merged.get(event.device_id)
+            if current is None:
+                merged[event.device_id] = event
+                continue
+            if event.device_id not in copied:
+                current = merged[event.device_id] = current.copy(deep=True)
+                copied.add(event.device_id)
+            current.changes.update(event.changes)
+            for key, value in event.previous.items():
+                current.previous.setdefault(key, value)
+            current.timestamp = event.timestamp
+        return list(merged.values())
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from models.devices import DeviceEvent, Room
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 1000))
+
+class DeviceEventBus:
+    """进程内设备事件总线
+
+    每个订阅者持有独立的有界队列，发布不会阻塞发布者；
+    订阅者处理不过来时丢弃其队列中最旧的事件。
+    多进程部署时，其他进程同步来的事件（remote）也发布到总线，
+    只处理本进程变更的订阅者（落盘、历史记录）可以只订阅本地事件。
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[asyncio.Queue, Tuple[Optional[FrozenSet[Room]], bool]] = {}
+        self._dropped: Dict[asyncio.Queue, int] = {}
+        self.dropped_events = 0
+
+    def subscribe(
+        self,
+        queue_size: Optional[int] = None,
+        rooms: Optional[Iterable[Room]] = None,
+        local_only: bool = False
+    ) -> asyncio.Queue:
+        """订阅设备事件
+
+        Args:
+            queue_size: 队列长度，默认使用总线配置；0表示不限长度（不丢事件）
+            rooms: 只接收这些房间的事件，默认接收全部
+            local_only: 只接收本进程的事件，不接收其他进程同步来的事件
+
+        Returns:
+            asyncio.Queue: 接收 DeviceEvent 的队列
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size if queue_size is None else queue_size)
+        self._subscribers[queue] = (frozenset(rooms) if rooms else None, local_only)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """取消订阅"""
+        self._subscribers.pop(queue, None)
+        self._dropped.pop(queue, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        """当前订阅者数量"""
+        return len(self._subscribers)
+
+    def take_dropped(self, queue: asyncio.Queue) -> int:
+        """返回该订阅者自上次调用以来被丢弃的事件数并清零"""
+        return self._dropped.pop(queue, 0)
+
+    def publish(self, event: DeviceEvent):
+        """向所有订阅者发布事件"""
+        for queue, (rooms, local_only) in self._subscribers.items():
+            if rooms is not None and event.room not in rooms:
+                continue
+            if local_only and event.remote:
+                continue
+            if queue.full():
+                queue.get_nowait()
+                self.dropped_events += 1
+                self._dropped[queue] = self._dropped.get(queue, 0) + 1
+            queue.put_nowait(event)
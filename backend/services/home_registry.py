@@ -0,0 +1,283 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from database.database import Database, AsyncDatabase, DATABASE_READ_WORKERS, async_db
+from services.home_simulator import HomeSimulator
+from services.agent_service import AgentService
+from services.llm_provider import LLMProvider, create_llm_provider
+from services.automation_engine import AutomationEngine
+from services.retention import RetentionManager
+
+DEFAULT_HOME_ID = os.getenv("DEFAULT_HOME_ID", "default")  # 不带家庭ID的旧接口使用的家庭，使用 DATABASE_URL
+HOME_DATA_DIR = os.getenv("HOME_DATA_DIR", "./homes")  # 其他家庭的数据库文件目录，每个家庭一个 {home_id}.db
+HOME_MAX_LOADED = int(os.getenv("HOME_MAX_LOADED", 256))  # 同时加载的家庭数上限，超出时淘汰最久未使用的
+HOME_IDLE_TIMEOUT = float(os.getenv("HOME_IDLE_TIMEOUT", 1800))  # 秒，家庭空闲多久后卸载
+HOME_SWEEP_INTERVAL = float(os.getenv("HOME_SWEEP_INTERVAL", 60))  # 秒，空闲家庭检查间隔
+
+HOME_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# 与 /api 下的固定路径冲突的家庭ID
+RESERVED_HOME_IDS = {"devices", "agent", "scenes", "automations", "homes", "status"}
+
+class Home:
+    """一个家庭的服务分片：模拟器、自动化规则引擎、智能体和保留策略，使用独立的数据库"""
+
+    def __init__(
+        self,
+        home_id: str,
+        database: AsyncDatabase,
+        llm_provider: Optional[LLMProvider] = None,
+        is_default: bool = False
+    ):
+        self.home_id = home_id
+        self.database = database
+        # 默认家庭的模拟器不带家庭ID，远程模式的设备操作使用不带家庭ID的旧接口
+        self.home_simulator = HomeSimulator(database, home_id=None if is_default else home_id)
+        self.automation_engine = AutomationEngine(self.home_simulator)
+        self.agent_service = AgentService(self.home_simulator, llm_provider=llm_provider)
+        self.retention_manager = RetentionManager(database, is_primary=lambda: self.home_simulator.state_backend.is_primary)
+        self.last_used = time.monotonic()
+        self.leases = 0  # 正在处理的请求和推送连接数，大于0时不会被卸载
+
+    async def start(self):
+        """初始化数据库并启动本家庭的服务"""
+        await self.database.run_write(self.database.database.init_tables)
+        await self.home_simulator.initialize()
+        # 模拟器启动后才能确定本进程是否为主进程（只有主进程执行清理）
+        await self.retention_manager.start()
+        await self.automation_engine.start()
+        await self.agent_service.initialize()
+
+    async def stop(self):
+        """停止本家庭的服务，剩余状态全部落盘"""
+        await self.agent_service.close()
+        await self.automation_engine.stop()
+        await self.home_simulator.stop()
+        await self.retention_manager.stop()
+
+    def touch(self):
+        """记录最近一次使用时间"""
+        self.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def lease(self):
+        """在请求或推送连接期间占用家庭，避免被卸载"""
+        self.leases += 1
+        self.touch()
+        try:
+            yield self
+        finally:
+            self.leases -= 1
+            self.touch()
+
+    def stats(self) -> Dict[str, Any]:
+        """家庭的加载状态"""
+        return {
+            "home_id": self.home_id,
+            "devices_count": self.home_simulator.device_count,
+            "leases": self.leases,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1)
+        }
+
+class HomeRegistry:
+    """按家庭ID分片的服务注册表
+
+    每个家庭的 HomeSimulator、AgentService 等在首次请求时从该家庭的数据库
+    懒加载（设备状态由状态历史恢复），空闲超过 idle_timeout 秒或加载数超过
+    max_loaded 时按最久未使用的顺序卸载，卸载前状态全部落盘。
+    默认家庭使用全局数据库，常驻不卸载。所有家庭共享LLM提供方和数据库读线程池。
+    """
+
+    def __init__(
+        self,
+        data_dir: str = HOME_DATA_DIR,
+        max_loaded: int = HOME_MAX_LOADED,
+        idle_timeout: float = HOME_IDLE_TIMEOUT,
+        sweep_interval: float = HOME_SWEEP_INTERVAL,
+        default_home_id: str = DEFAULT_HOME_ID
+    ):
+        self.data_dir = data_dir
+        self.max_loaded = max_loaded
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.default_home_id = default_home_id
+        self._homes: "OrderedDict[str, Home]" = OrderedDict()  # 按最近使用排序
+        self._loading: Dict[str, asyncio.Task] = {}
+        # 正在卸载（落盘和关闭数据库）的家庭，重新加载前需要等待卸载完成
+        self._evicting: Dict[str, asyncio.Task] = {}
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self.llm_provider: Optional[LLMProvider] = None
+        self.loaded_count = 0
+        self.evicted_count = 0
+
+    @property
+    def default_home(self) -> Home:
+        """默认家庭（start之后可用）"""
+        return self._homes[self.default_home_id]
+
+    async def start(self):
+        """加载默认家庭并启动空闲家庭清理任务"""
+        if self._task is not None:
+            return
+        self.llm_provider = create_llm_provider()
+        self._readers = ThreadPoolExecutor(max_workers=DATABASE_READ_WORKERS, thread_name_prefix="home-db-reader")
+        home = Home(self.default_home_id, async_db, self.llm_provider, is_default=True)
+        await home.start()
+        self._homes[self.default_home_id] = home
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """卸载所有家庭（默认家庭的数据库由 close_database 关闭）"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for home_id in reversed(list(self._homes)):
+            await self.evict(home_id, force=True)
+        if self._readers:
+            self._readers.shutdown(wait=True)
+            self._readers = None
+        if self.llm_provider:
+            await self.llm_provider.close()
+            self.llm_provider = None
+
+    @staticmethod
+    def validate_home_id(home_id: str):
+        """检查家庭ID（同时用作数据库文件名）
+
+        Raises:
+            ValueError: 家庭ID无效
+        """
+        if not HOME_ID_PATTERN.match(home_id) or home_id in RESERVED_HOME_IDS:
+            raise ValueError(f"无效的家庭ID: {home_id}")
+
+    async def get(self, home_id: str) -> Home:
+        """获取家庭，未加载时从数据库加载（同一家庭的并发请求只加载一次）
+
+        Raises:
+            ValueError: 家庭ID无效
+        """
+        home = self._homes.get(home_id)
+        if home is None:
+            self.validate_home_id(home_id)
+            task = self._loading.get(home_id)
+            if task is None:
+                task = asyncio.create_task(self._load(home_id))
+                self._loading[home_id] = task
+            home = await asyncio.shield(task)
+        if self._homes.get(home_id) is home:
+            self._homes.move_to_end(home_id)
+        home.touch()
+        return home
+
+    async def _load(self, home_id: str) -> Home:
+        try:
+            # 旧实例还在写同一个数据库文件时，等它落盘关闭后再恢复状态
+            evicting = self._evicting.get(home_id)
+            if evicting is not None:
+                await asyncio.wait({evicting})
+            os.makedirs(self.data_dir, exist_ok=True)
+            database = AsyncDatabase(Database(os.path.join(self.data_dir, f"{home_id}.db")), readers=self._readers)
+            home = Home(home_id, database, self.llm_provider)
+            try:
+                await home.start()
+            except Exception:
+                try:
+                    await home.stop()
+                finally:
+                    await self._close_database(home)
+                raise
+            self._homes[home_id] = home
+            self.loaded_count += 1
+            print(f"🏠 已加载家庭 {home_id}（当前 {len(self._homes)} 个）")
+        finally:
+            self._loading.pop(home_id, None)
+
+        await self._evict_overflow()
+        return home
+
+    async def evict(self, home_id: str, force: bool = False) -> bool:
+        """卸载家庭，状态落盘后释放内存和数据库连接
+
+        Args:
+            force: 为False时不卸载默认家庭和正在使用的家庭
+
+        Returns:
+            bool: 是否已卸载
+        """
+        home = self._homes.get(home_id)
+        if home is None or (not force and (home_id == self.default_home_id or home.leases > 0)):
+            return False
+        del self._homes[home_id]
+        task = asyncio.create_task(self._stop_home(home))
+        self._evicting[home_id] = task
+        await asyncio.shield(task)
+        self.evicted_count += 1
+        print(f"💤 已卸载家庭 {home_id}")
+        return True
+
+    async def _stop_home(self, home: Home):
+        """停止家庭的服务并关闭其数据库，完成后才允许重新加载该家庭"""
+        try:
+            await home.stop()
+        finally:
+            try:
+                if home.home_id != self.default_home_id:
+                    await self._close_database(home)
+            finally:
+                self._evicting.pop(home.home_id, None)
+
+    async def _evict_overflow(self):
+        """加载数超过上限时卸载最久未使用的空闲家庭"""
+        for home_id in list(self._homes):
+            if len(self._homes) <= self.max_loaded:
+                return
+            await self.evict(home_id)
+
+    async def evict_idle(self) -> int:
+        """卸载空闲超过 idle_timeout 秒的家庭"""
+        now = time.monotonic()
+        idle = [home_id for home_id, home in self._homes.items() if now - home.last_used >= self.idle_timeout]
+        evicted = 0
+        for home_id in idle:
+            if await self.evict(home_id):
+                evicted += 1
+        return evicted
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                print(f"❌ 空闲家庭卸载失败: {e}")
+
+    @staticmethod
+    async def _close_database(home: Home):
+        # shutdown 会等待写线程中剩余的任务完成，不阻塞事件循环
+        await asyncio.to_thread(home.database.shutdown)
+        home.database.database.close()
+
+    def list_homes(self) -> List[Dict[str, Any]]:
+        """已加载的家庭，最近使用的在后"""
+        return [home.stats() for home in self._homes.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        """注册表统计"""
+        return {
+            "loaded": len(self._homes),
+            "max_loaded": self.max_loaded,
+            "loading": len(self._loading),
+            "evicting": len(self._evicting),
+            "loaded_total": self.loaded_count,
+            "evicted_total": self.evicted_count
+        }
@@ -1,190 +1,193 @@
 import asyncio
+import hashlib
+import json
 import random
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 from models.devices import (
     Device, SensorDevice, LightDevice, ACDevice,
-    DeviceType, DeviceStatus, SensorType, Room, HomeState
+    DeviceType, DeviceStatus, SensorType, Room, HomeState, DeviceEvent, DeviceCommand, USER_EVENT_SOURCE
 )
-from database.database import db
+from database.database import AsyncDatabase, async_db
+from database.write_behind import DeviceWriteBuffer
+from services.event_bus import DeviceEventBus
+from services.state_history import StateHistory
+from services.sensor_history import SensorHistory
+from services.scene_engine import SceneEngine
+from services.state_backend import create_state_backend
+from services.simulation_engine import SimulationEngine, SIMULATION_ENABLED, SIMULATION_TICK
+
+# 各类设备可通过 update_device 修改的属性
+SETTABLE_PROPERTIES = {
+    LightDevice: {"brightness"},
+    ACDevice: {"temperature", "mode", "fan_speed"},
+    SensorDevice: {"value", "detection_duration"},
+}
 
 class HomeSimulator:
     """家居环境模拟器"""
     
-    def __init__(self):
+    def __init__(self, database: AsyncDatabase = async_db, home_id: Optional[str] = None):
+        # 家庭ID和本家庭的数据库（多家庭部署时每个家庭一个数据库文件；默认家庭的ID为None）
+        self.home_id = home_id
+        self.database = database
         self.devices: Dict[str, Device] = {}
+        # 二级索引（dict作为有序集合，保持设备注册顺序）
+        self._room_index: Dict[Room, Dict[str, None]] = {}
+        self._type_index: Dict[DeviceType, Dict[str, None]] = {}
+        self._motion_sensor_index: Dict[Room, Dict[str, None]] = {}
+        # 增量维护的聚合状态：检测到人的传感器、房间占用、各房间开关计数和状态摘要
+        self._occupied_sensors: Dict[Room, Set[str]] = {room: set() for room in Room}
+        self._room_occupancy: Dict[Room, bool] = {room: False for room in Room}
+        self._room_status_counts: Dict[Room, Dict[DeviceStatus, int]] = {
+            room: {status: 0 for status in DeviceStatus} for room in Room
+        }
+        self._type_status_counts: Dict[DeviceType, Dict[DeviceStatus, int]] = {
+            device_type: {status: 0 for status in DeviceStatus} for device_type in DeviceType
+        }
+        self._summary = self._generate_state_summary(self._room_occupancy)
+        # 设备开关统计变化时递增，作为缓存的设备摘要的版本号
+        self.summary_version = 0
+        self._devices_summary_cache: Optional[Dict[str, Any]] = None
+        self._devices_summary_etag: Optional[str] = None
         self.is_running = False
         self.simulation_task = None
+        # 设备状态写回缓冲，合并高频更新后批量落盘
+        self.device_writer = DeviceWriteBuffer(database)
+        # 设备变更事件总线，供智能体等订阅
+        self.event_bus = DeviceEventBus()
+        # 各设备最近一次由用户发起变更的时间（包括其他进程同步来的），规则据此不覆盖用户的操作
+        self.user_changes: Dict[str, datetime] = {}
+        # 设备增删时递增，状态历史据此写入新的关键帧
+        self.registry_version = 0
+        # 基于变更日志的状态历史
+        self.history = StateHistory(self)
+        # 传感器读数时序存储
+        self.sensor_history = SensorHistory(self)
+        # 场景定义与预编译的更新计划
+        self.scenes = SceneEngine(self)
+        # 多进程部署时在工作进程之间同步设备变更
+        self.state_backend = create_state_backend(self)
+        self.state_backend.on_reload("scenes", self.scenes.load)
+        # 家庭定义驱动的模拟引擎，SIMULATION_ENABLED 时按步进生成传感器读数
+        self.simulation = SimulationEngine(self)
     
     async def initialize(self):
         """初始化模拟器"""
-        await self._create_default_devices()
+        await self.device_writer.start()
+        # 先确定是否为主进程：数据库中没有状态时只有主进程写入默认设备
+        await self.state_backend.connect()
+        if not await self._restore_devices():
+            await self._create_default_devices()
+        await self.scenes.load()
+        await self.history.start()
+        await self.sensor_history.start()
+        # 补上其他进程尚未写入状态历史的变更
+        await self.state_backend.start()
         self.is_running = True
-        # 启动后台模拟任务
-        self.simulation_task = asyncio.create_task(self._simulation_loop())
+        if SIMULATION_ENABLED:
+            self.simulation_task = asyncio.create_task(self._simulation_loop())
         print("🏠 家居模拟器已启动")
     
-    async def _create_default_devices(self):
-        """创建默认设备"""
-        current_time = datetime.now()
-        
-        # 创建传感器设备
-        sensors = [
-            {
-                "id": "sensor_bedroom_motion",
-                "name": "卧室人体感应器",
-                "room": Room.BEDROOM,
-                "sensor_type": SensorType.MOTION,
-                "value": 1,  # 模拟有人
-                "unit": "boolean"
-            },
-            {
-                "id": "sensor_living_motion", 
-                "name": "客厅人体感应器",
-                "room": Room.LIVING_ROOM,
-                "sensor_type": SensorType.MOTION,
-                "value": 0, # 模拟无人
-                "unit": "boolean"
-            },
-            {
-                "id": "sensor_bedroom_temp",
-                "name": "卧室温度传感器",
-                "room": Room.BEDROOM,
-                "sensor_type": SensorType.TEMPERATURE,
-                "value": 25.5,
-                "unit": "°C"
-            }
-        ]
-        
-        for sensor_data in sensors:
-            sensor = SensorDevice(
-                id=sensor_data["id"],
-                name=sensor_data["name"],
-                type=DeviceType.SENSOR,
-                room=sensor_data["room"],
-                status=DeviceStatus.ON,
-                sensor_type=sensor_data["sensor_type"],
-                value=sensor_data["value"],
-                unit=sensor_data["unit"],
-                detection_duration=0,
-                last_updated=current_time,
-                created_at=current_time,
-                properties={}
-            )
-            self.devices[sensor.id] = sensor
-            db.save_device(sensor)
+    async def _restore_devices(self) -> bool:
+        """从状态历史（最近的关键帧 + 其后的增量）恢复设备
         
-        # 创建灯光设备
-        lights = [
-            {
-                "id": "light_bedroom",
-                "name": "卧室主灯",
-                "room": Room.BEDROOM,
-                "status": DeviceStatus.ON,
-                "brightness": 80
-            },
-            {
-                "id": "light_living",
-                "name": "客厅主灯", 
-                "room": Room.LIVING_ROOM,
-                "status": DeviceStatus.ON,
-                "brightness": 90
-            },
-            {
-                "id": "light_kitchen",
-                "name": "厨房灯",
-                "room": Room.KITCHEN,
-                "status": DeviceStatus.OFF,
-                "brightness": 100
-            }
-        ]
-        
-        for light_data in lights:
-            light = LightDevice(
-                id=light_data["id"],
-                name=light_data["name"],
-                type=DeviceType.LIGHT,
-                room=light_data["room"],
-                status=light_data["status"],
-                brightness=light_data["brightness"],
-                last_updated=current_time,
-                created_at=current_time,
-                properties={}
-            )
-            self.devices[light.id] = light
-            db.save_device(light)
+        Returns:
+            bool: 数据库中没有任何历史状态时返回False
+        """
+        state = await self.history.get_state_at(datetime.now())
+        if state is None or not state.devices:
+            return False
+        for device in state.devices:
+            self.add_device(device, persist=self.state_backend.is_primary)
+        print(f"📂 已从数据库恢复 {len(state.devices)} 个设备")
+        return True
+    
+    async def _create_default_devices(self):
+        """按家庭定义（SIMULATION_CONFIG，未配置时为默认家庭）创建设备
         
-        # 创建空调设备
-        ac = ACDevice(
-            id="ac_bedroom",
-            name="卧室空调",
-            type=DeviceType.AC,
-            room=Room.BEDROOM,
-            status=DeviceStatus.OFF,
-            temperature=26.0,
-            mode="auto",
-            fan_speed=3,
-            last_updated=current_time,
-            created_at=current_time,
-            properties={}
-        )
-        self.devices[ac.id] = ac
-        db.save_device(ac)
+        多进程部署时只有主进程把默认设备写入数据库，其他进程只在内存中创建，
+        避免覆盖主进程已经写入的变更。
+        """
+        persist = self.state_backend.is_primary
+        for device in self.simulation.build_devices():
+            self.add_device(device, persist=persist)
     
     async def _simulation_loop(self):
-        """模拟循环"""
+        """按 SIMULATION_TICK 推进模拟，只在主进程生成读数（其他进程通过状态后端同步）"""
         while self.is_running:
-            pass
-            await asyncio.sleep(10)
+            await asyncio.sleep(SIMULATION_TICK)
+            if not self.state_backend.is_primary:
+                continue
+            try:
+                await self.simulation.step()
+            except ValueError as e:
+                # 家庭定义或依赖配置错误，不再重试
+                print(e)
+                return
+            except Exception as e:
+                print(f"❌ 模拟步进失败: {e}")
     
-    async def _save_current_state(self):
-        """保存当前家居状态"""
-        room_occupancy = {}
+    def add_device(self, device: Device, persist: bool = True):
+        """注册设备（已存在则替换），维护索引，persist 为True时登记持久化"""
+        if device.id in self.devices:
+            old_device = self.devices[device.id]
+            self._unindex_device(old_device)
+            self._account_device(old_device, -1)
+        self.devices[device.id] = device
+        self._index_device(device)
+        self._account_device(device, 1)
+        self._bump_summary_version()
+        self.registry_version += 1
+        if persist:
+            self.device_writer.put(device)
+    
+    def remove_device(self, device_id: str) -> Optional[Device]:
+        """从模拟器中移除设备"""
+        device = self.devices.pop(device_id, None)
+        if device is not None:
+            self._unindex_device(device)
+            self._account_device(device, -1)
+            self._bump_summary_version()
+            self.registry_version += 1
+        return device
+    
+    def _index_device(self, device: Device):
+        """将设备加入二级索引"""
+        self._room_index.setdefault(device.room, {})[device.id] = None
+        self._type_index.setdefault(device.type, {})[device.id] = None
+        if isinstance(device, SensorDevice) and device.sensor_type == SensorType.MOTION:
+            self._motion_sensor_index.setdefault(device.room, {})[device.id] = None
+    
+    def _unindex_device(self, device: Device):
+        """将设备移出二级索引"""
+        self._room_index.get(device.room, {}).pop(device.id, None)
+        self._type_index.get(device.type, {}).pop(device.id, None)
+        self._motion_sensor_index.get(device.room, {}).pop(device.id, None)
+    
+    def _account_device(self, device: Device, sign: int):
+        """将设备计入（sign=1）或移出（sign=-1）聚合状态"""
+        self._room_status_counts[device.room][device.status] += sign
+        self._type_status_counts[device.type][device.status] += sign
         
-        # 计算房间占用状态
-        for room in Room:
-            # 查找该房间的运动传感器
-            motion_sensors = [
-                device for device in self.devices.values()
-                if isinstance(device, SensorDevice) 
+        if (isinstance(device, SensorDevice)
                 and device.sensor_type == SensorType.MOTION
-                and device.room == room
-            ]
+                and device.value == 1):
+            # 任一传感器检测到人即认为房间有人
+            occupied = self._occupied_sensors[device.room]
+            if sign > 0:
+                occupied.add(device.id)
+            else:
+                occupied.discard(device.id)
             
-            # 如果有任一传感器检测到人，则认为房间有人
-            room_occupancy[room] = any(sensor.value == 1 for sensor in motion_sensors)
-        
-        # 生成状态摘要
-        summary = self._generate_state_summary(room_occupancy)
-        
-        # 创建状态对象，转换datetime为字符串
-        devices_list = []
-        for device in self.devices.values():
-            device_dict = device.dict()
-            # 转换datetime字段为ISO格式字符串
-            if 'last_updated' in device_dict:
-                device_dict['last_updated'] = device_dict['last_updated'].isoformat()
-            if 'created_at' in device_dict:
-                device_dict['created_at'] = device_dict['created_at'].isoformat()
-            devices_list.append(device_dict)
-        
-        # 直接保存到数据库，不使用HomeState对象
-        from database.database import db
-        import json
-        
-        devices_data = json.dumps(devices_list)
-        room_occupancy_data = json.dumps({room.value: occupied for room, occupied in room_occupancy.items()})
-        
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO home_states (timestamp, devices_data, room_occupancy, summary)
-            VALUES (?, ?, ?, ?)
-        ''', (datetime.now().isoformat(), devices_data, room_occupancy_data, summary))
-        
-        conn.commit()
-        conn.close()
+            is_occupied = bool(occupied)
+            if self._room_occupancy[device.room] != is_occupied:
+                self._room_occupancy[device.room] = is_occupied
+                self._summary = self._generate_state_summary(self._room_occupancy)
+    
+    async def _save_current_state(self):
+        """保存当前家居状态的完整快照"""
+        await self.database.save_home_state(self.get_current_state())
     
     def _generate_state_summary(self, room_occupancy: Dict[Room, bool]) -> str:
         """生成状态摘要"""
@@ -208,15 +211,40 @@ class HomeSimulator:
     
     def get_devices_by_room(self, room: Room) -> List[Device]:
         """按房间获取设备"""
-        return [device for device in self.devices.values() if device.room == room]
+        return [self.devices[device_id] for device_id in self._room_index.get(room, {})]
+    
+    def get_devices_by_type(self, device_type: DeviceType) -> List[Device]:
+        """按类型获取设备"""
+        return [self.devices[device_id] for device_id in self._type_index.get(device_type, {})]
     
-    async def update_device(self, device_id: str, status: DeviceStatus = None, properties: Dict[str, Any] = None) -> bool:
-        """更新设备状态"""
+    def get_motion_sensors(self, room: Room) -> List[SensorDevice]:
+        """获取房间内的人体感应器"""
+        return [self.devices[device_id] for device_id in self._motion_sensor_index.get(room, {})]
+    
+    async def update_device(
+        self,
+        device_id: str,
+        status: DeviceStatus = None,
+        properties: Dict[str, Any] = None,
+        remote: bool = False,
+        timestamp: Optional[datetime] = None,
+        source: Optional[str] = None
+    ) -> bool:
+        """更新设备状态
+        
+        Args:
+            remote: 是否为其他进程同步来的变更（由该进程落盘，这里只更新内存并发布 remote 事件）
+            timestamp: 变更时间，默认为当前时间
+            source: 变更的发起方，记录在设备事件中
+        """
         if device_id not in self.devices:
             return False
         
         device = self.devices[device_id]
-        current_time = datetime.now()
+        current_time = timestamp or datetime.now()
+        before = self._event_fields(device)
+        previous_status = device.status
+        self._account_device(device, -1)
         
         if status is not None:
             device.status = status
@@ -232,31 +260,273 @@ class HomeSimulator:
                     device.mode = properties["mode"]
                 if "fan_speed" in properties:
                     device.fan_speed = properties["fan_speed"]
+            elif isinstance(device, SensorDevice):
+                if "value" in properties:
+                    device.value = properties["value"]
+                if "detection_duration" in properties:
+                    device.detection_duration = properties["detection_duration"]
         
+        self._account_device(device, 1)
+        if device.status != previous_status:
+            self._bump_summary_version()
         device.last_updated = current_time
-        db.save_device(device)
+        if not remote:
+            self.device_writer.put(device)
+        self._publish_changes(device, before, current_time, remote, source)
         return True
     
-    def get_current_state(self) -> HomeState:
-        """获取当前状态"""
-        room_occupancy = {}
+    async def apply_remote_changes(
+        self,
+        device_id: str,
+        changes: Dict[str, Any],
+        timestamp: datetime,
+        source: Optional[str] = None
+    ) -> bool:
+        """应用其他进程同步来的设备变更（事件中的变化字段）"""
+        status = changes.get("status")
+        properties = {key: value for key, value in changes.items() if key != "status"}
+        return await self.update_device(
+            device_id,
+            DeviceStatus(status) if status is not None else None,
+            properties,
+            remote=True,
+            timestamp=timestamp,
+            source=source
+        )
+    
+    def select_devices(
+        self,
+        device_id: Optional[str] = None,
+        room: Optional[Room] = None,
+        device_type: Optional[DeviceType] = None
+    ) -> List[Device]:
+        """按设备ID，或按房间和/或类型（取交集）选择设备"""
+        if device_id is not None:
+            device = self.devices.get(device_id)
+            return [device] if device else []
+        if room is not None:
+            devices = self.get_devices_by_room(room)
+            return [device for device in devices if device_type is None or device.type == device_type]
+        if device_type is not None:
+            return self.get_devices_by_type(device_type)
+        return []
+    
+    def compile_commands(self, commands: List[DeviceCommand]) -> Dict[str, Dict[str, Any]]:
+        """将按选择器给出的指令展开为逐设备的更新计划
         
-        for room in Room:
-            motion_sensors = [
-                device for device in self.devices.values()
-                if isinstance(device, SensorDevice) 
-                and device.sensor_type == SensorType.MOTION
-                and device.room == room
-            ]
-            room_occupancy[room] = any(sensor.value == 1 for sensor in motion_sensors)
+        同一设备被多条指令选中时按顺序合并，后面的指令覆盖前面的状态和同名属性。
+        按房间/类型选择时，属性只应用到支持该属性的设备（如房间内的灯和空调混在一起时，
+        亮度只应用到灯），既没有状态也没有可用属性的设备不进入计划。
+        按设备ID选择的设备即使不存在也保留在计划中，由 update_devices 报告错误。
         
+        Returns:
+            Dict[str, Dict[str, Any]]: 设备ID到 {"status": ..., "properties": {...}} 的映射
+        """
+        plan: Dict[str, Dict[str, Any]] = {}
+        for command in commands:
+            if command.device_id is not None:
+                targets = [(command.device_id, command.properties)]
+            else:
+                targets = [
+                    (device.id, self.supported_properties(device, command.properties))
+                    for device in self.select_devices(room=command.room, device_type=command.type)
+                ]
+            
+            for device_id, properties in targets:
+                if command.status is None and not properties:
+                    continue
+                action = plan.setdefault(device_id, {})
+                if command.status is not None:
+                    action["status"] = command.status.value
+                if properties:
+                    action.setdefault("properties", {}).update(properties)
+        return plan
+    
+    @staticmethod
+    def supported_properties(device: Device, properties: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """只保留设备可以修改的属性"""
+        settable = SETTABLE_PROPERTIES.get(type(device), set())
+        return {key: value for key, value in (properties or {}).items() if key in settable}
+    
+    def validate_update(self, device_id: str, status: Any = None, properties: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """检查一条设备更新是否可以执行
+        
+        设备不支持的属性不算无效，与单个设备更新一样忽略。
+        
+        Returns:
+            Optional[str]: 无法执行的原因，可以执行时为None
+        """
+        device = self.devices.get(device_id)
+        if device is None:
+            return "设备不存在"
+        if status is not None:
+            try:
+                DeviceStatus(status)
+            except ValueError:
+                return f"无效的设备状态: {status}"
+        return None
+    
+    async def update_devices(
+        self,
+        updates: Dict[str, Dict[str, Any]],
+        atomic: bool = True,
+        source: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """批量更新设备，并在一个事务中落盘
+        
+        Args:
+            updates: 设备ID到 {"status": ..., "properties": {...}} 的映射
+            atomic: 为True时任一更新无效则不执行任何更新
+            source: 变更的发起方，记录在设备事件中
+            
+        Returns:
+            List[Dict[str, Any]]: 每个设备的结果 {"device_id", "success", "message", "action"}，顺序与updates一致
+        """
+        errors = {
+            device_id: error
+            for device_id, action in updates.items()
+            if (error := self.validate_update(device_id, action.get("status"), action.get("properties"))) is not None
+        }
+        
+        results = []
+        for device_id, action in updates.items():
+            if device_id in errors:
+                results.append(self._update_result(device_id, action, False, errors[device_id]))
+            elif errors and atomic:
+                results.append(self._update_result(device_id, action, False, "未执行：批量更新中存在无效指令"))
+            else:
+                status = action.get("status")
+                if status is not None:
+                    status = DeviceStatus(status)
+                await self.update_device(device_id, status, action.get("properties"), source=source)
+                message = "设备状态更新成功"
+                if status:
+                    message = f"设备已{'开启' if status == DeviceStatus.ON else '关闭'}"
+                ignored = set(action.get("properties") or {}) - SETTABLE_PROPERTIES.get(type(self.devices[device_id]), set())
+                if ignored:
+                    message += f"（已忽略不支持的属性: {', '.join(sorted(ignored))}）"
+                results.append(self._update_result(device_id, action, True, message))
+        
+        if len(errors) < len(updates) and not (errors and atomic):
+            # 本批更新一次性写入，而不是等待下一个刷新周期
+            await self.device_writer.flush()
+        return results
+    
+    @staticmethod
+    def _update_result(device_id: str, action: Dict[str, Any], success: bool, message: str) -> Dict[str, Any]:
+        """构建单个设备的更新结果"""
+        return {
+            "device_id": device_id,
+            "success": success,
+            "message": message,
+            "action": action
+        }
+    
+    @staticmethod
+    def _event_fields(device: Device) -> Dict[str, Any]:
+        """事件比较用的设备字段：状态和属性"""
+        fields = device.properties
+        fields["status"] = device.status
+        return fields
+    
+    def _publish_changes(
+        self,
+        device: Device,
+        before: Dict[str, Any],
+        timestamp: datetime,
+        remote: bool = False,
+        source: Optional[str] = None
+    ):
+        """与更新前比较，有变化时发布设备事件"""
+        after = self._event_fields(device)
+        changed = [key for key, value in after.items() if before.get(key) != value]
+        if not changed:
+            return
+        
+        if source == USER_EVENT_SOURCE:
+            self.user_changes[device.id] = timestamp
+        self.event_bus.publish(DeviceEvent(
+            device_id=device.id,
+            type=device.type,
+            room=device.room,
+            changes={key: after[key] for key in changed},
+            previous={key: before.get(key) for key in changed},
+            timestamp=timestamp,
+            remote=remote,
+            source=source
+        ))
+    
+    def get_current_state(self) -> HomeState:
+        """获取当前状态"""
         return HomeState(
             devices=list(self.devices.values()),
             timestamp=datetime.now(),
-            room_occupancy=room_occupancy,
-            summary=self._generate_state_summary(room_occupancy)
+            room_occupancy=self.get_room_occupancy(),
+            summary=self._summary
         )
     
+    def get_room_occupancy(self) -> Dict[Room, bool]:
+        """获取房间占用状态"""
+        return dict(self._room_occupancy)
+    
+    def get_state_summary(self) -> str:
+        """获取状态摘要"""
+        return self._summary
+    
+    def get_room_status_counts(self, room: Room) -> Dict[str, int]:
+        """获取房间内各状态的设备数量"""
+        return {status.value: count for status, count in self._room_status_counts[room].items()}
+    
+    def _bump_summary_version(self):
+        """开关统计发生变化，使缓存的设备摘要失效"""
+        self.summary_version += 1
+        self._devices_summary_cache = None
+        self._devices_summary_etag = None
+    
+    def get_devices_summary(self) -> Dict[str, Any]:
+        """获取设备摘要：总数、开关数以及按类型和房间的统计
+        
+        由增量维护的计数器生成，并按 summary_version 缓存，
+        统计不变时重复调用直接返回缓存结果。
+        """
+        if self._devices_summary_cache is None:
+            def stats(counts: Dict[DeviceStatus, int]) -> Dict[str, int]:
+                total = sum(counts.values())
+                return {"total": total, "on": counts[DeviceStatus.ON], "off": total - counts[DeviceStatus.ON]}
+            
+            self._devices_summary_cache = {
+                "total_devices": len(self.devices),
+                "devices_on": sum(counts[DeviceStatus.ON] for counts in self._type_status_counts.values()),
+                "devices_off": sum(counts[DeviceStatus.OFF] for counts in self._type_status_counts.values()),
+                "by_type": {
+                    device_type.value: stats(counts)
+                    for device_type, counts in self._type_status_counts.items()
+                    if sum(counts.values())
+                },
+                "by_room": {
+                    room.value: stats(counts)
+                    for room, counts in self._room_status_counts.items()
+                    if sum(counts.values())
+                }
+            }
+        return self._devices_summary_cache
+    
+    def get_devices_summary_etag(self) -> str:
+        """设备摘要的内容摘要，用作ETag
+        
+        响应体只包含统计内容（不含进程内的版本号），多进程部署时各工作进程对相同的
+        响应体给出相同的ETag，重启后统计不变的客户端缓存也仍然有效。
+        """
+        if self._devices_summary_etag is None:
+            payload = json.dumps(self.get_devices_summary(), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+            self._devices_summary_etag = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        return self._devices_summary_etag
+    
+    @property
+    def device_count(self) -> int:
+        """设备总数"""
+        return len(self.devices)
+    
     def get_current_time(self) -> datetime:
         """获取当前时间"""
         return datetime.now()
@@ -270,4 +540,9 @@ class HomeSimulator:
                 await self.simulation_task
             except asyncio.CancelledError:
                 pass
+        # 确保变更日志和缓冲中的设备状态全部落盘
+        await self.state_backend.stop()
+        await self.history.stop()
+        await self.sensor_history.stop()
+        await self.device_writer.stop()
         print("🛑 家居模拟器已停止")
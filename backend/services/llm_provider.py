@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+# dashscope: DashScope（OpenAI兼容接口）；synthetic: 合成延迟模型，固定回复；replay: 重放录制的响应
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "dashscope")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))  # HTTP连接池大小
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 10.0))  # 秒
+LLM_RECORD_FILE = os.getenv("LLM_RECORD_FILE", "")  # 设置后把每次调用的请求、响应和耗时追加到该文件（JSONL），供 replay 使用
+LLM_REPLAY_FILE = os.getenv("LLM_REPLAY_FILE", "./llm_recordings.jsonl")
+LLM_REPLAY_TIMING = os.getenv("LLM_REPLAY_TIMING", "recorded")  # recorded: 按录制的耗时回放；synthetic: 使用合成延迟模型
+LLM_SYNTHETIC_LATENCY = float(os.getenv("LLM_SYNTHETIC_LATENCY", 0.3))  # 秒，首个token的基础延迟
+LLM_SYNTHETIC_TPS = float(os.getenv("LLM_SYNTHETIC_TPS", 50))  # 输出速度（token/秒），0表示不限速
+LLM_SYNTHETIC_PREFILL_TPS = float(os.getenv("LLM_SYNTHETIC_PREFILL_TPS", 0))  # 提示词处理速度（token/秒），0表示忽略
+LLM_SYNTHETIC_CAPACITY = int(os.getenv("LLM_SYNTHETIC_CAPACITY", 0))  # 服务端同时处理的请求数，超出排队，0表示不限
+LLM_SYNTHETIC_JITTER = float(os.getenv("LLM_SYNTHETIC_JITTER", 0.2))  # 首token延迟的对数正态抖动（sigma），0表示固定
+LLM_SYNTHETIC_SEED = int(os.getenv("LLM_SYNTHETIC_SEED", 0))
+LLM_SYNTHETIC_REPLY = os.getenv(
+    "LLM_SYNTHETIC_REPLY",
+    '客厅现在没人，我帮你把客厅灯关掉了。<action>{"light_living": {"status": "off"}}</action>'
+)
+
+STREAM_CHUNK_CHARS = 4  # 合成/重放的流式输出每块字符数
+
+def estimate_tokens(text: str) -> int:
+    """估算token数：中文每字约一个token，其他字符约四个一个"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + (len(text) - cjk + 3) // 4
+
+def messages_key(messages: List[Dict[str, str]]) -> str:
+    """消息列表的摘要，重放时按它精确匹配录制的响应"""
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def last_user_message(messages: List[Dict[str, str]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+class LLMProvider(ABC):
+    """LLM提供方接口
+
+    AgentService 只通过 complete / stream 调用模型，并发数由调用方的信号量限制。
+    失败时抛出异常，由调用方处理。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.requests = 0
+
+    @abstractmethod
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Optional[str]:
+        """非流式调用，返回完整回复"""
+
+    @abstractmethod
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """流式调用，逐段返回生成的文本"""
+
+    async def close(self):
+        """释放连接等资源"""
+
+    def stats(self) -> Dict[str, Any]:
+        """提供方类型和调用统计"""
+        return {"provider": self.name, "requests": self.requests}
+
+class DashScopeProvider(LLMProvider):
+    """DashScope等OpenAI兼容接口（所有会话共享同一个连接池，复用TCP/TLS连接）"""
+
+    name = "dashscope"
+
+    def __init__(self):
+        super().__init__()
+        dashscope_key = os.getenv("DASHSCOPE_API_KEY")
+        if not dashscope_key:
+            raise ValueError("❌ 未配置有效的LLM API密钥，请检查环境变量 DASHSCOPE_API_KEY（离线运行可设置 LLM_PROVIDER=synthetic 或 replay）")
+        dashscope_base_url = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+        try:
+            self.client = AsyncOpenAI(
+                api_key=dashscope_key,
+                base_url=dashscope_base_url,
+                timeout=LLM_TIMEOUT,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS
+                    ),
+                    timeout=LLM_TIMEOUT
+                )
+            )
+        except Exception as e:
+            raise ValueError(f"❌ DashScope配置失败: {e}")
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Optional[str]:
+        self.requests += 1
+        # 为qwen模型添加特殊参数
+        extra_params = {}
+        if "qwen" in model.lower():
+            extra_params["stream"] = False
+            # extra_params["extra_body"] = {"enable_thinking": False}
+
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **extra_params
+        )
+        if response and response.choices:
+            return response.choices[0].message.content
+        return None
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        self.requests += 1
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def close(self):
+        await self.client.close()
+
+class LatencyModel:
+    """合成的LLM延迟和吞吐模型
+
+    首token延迟 = 基础延迟 × 对数正态抖动 + 提示词token数 / 提示词处理速度，
+    之后按输出速度逐token生成；服务端同时处理的请求数超过 capacity 时排队，
+    模拟提供方的吞吐上限。抖动使用固定种子，相同调用顺序得到相同的延迟序列。
+    """
+
+    def __init__(
+        self,
+        first_token_latency: float = LLM_SYNTHETIC_LATENCY,
+        tokens_per_second: float = LLM_SYNTHETIC_TPS,
+        prefill_tokens_per_second: float = LLM_SYNTHETIC_PREFILL_TPS,
+        capacity: int = LLM_SYNTHETIC_CAPACITY,
+        jitter: float = LLM_SYNTHETIC_JITTER,
+        seed: int = LLM_SYNTHETIC_SEED
+    ):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.capacity = capacity
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._slots = asyncio.Semaphore(capacity) if capacity > 0 else None
+        self.queued = 0
+
+    def first_token_delay(self, prompt_tokens: int) -> float:
+        """秒，收到请求到第一个token的延迟（不含排队）"""
+        delay = self.first_token_latency
+        if self.jitter > 0:
+            delay *= self._rng.lognormvariate(0, self.jitter)
+        if self.prefill_tokens_per_second > 0:
+            delay += prompt_tokens / self.prefill_tokens_per_second
+        return delay
+
+    def output_delay(self, tokens: int) -> float:
+        """秒，生成 tokens 个token的时间"""
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    async def acquire(self):
+        """占用一个服务端处理槽位，没有空闲槽位时排队"""
+        if self._slots is not None:
+            self.queued += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "first_token_latency": self.first_token_latency,
+            "tokens_per_second": self.tokens_per_second,
+            "capacity": self.capacity,
+            "queued": self.queued
+        }
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """按估算的token数截断回复，模拟 max_tokens 的效果"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+class SyntheticProvider(LLMProvider):
+    """固定回复的合成提供方，延迟和吞吐由 LatencyModel 决定，不需要网络"""
+
+    name = "synthetic"
+
+    def __init__(self, reply: str = LLM_SYNTHETIC_REPLY, latency_model: Optional[LatencyModel] = None):
+        super().__init__()
+        self.reply = reply
+        self.latency_model = latency_model or LatencyModel()
+
+    def _reply_for(self, messages: List[Dict[str, str]]) -> str:
+        return self.reply
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Optional[str]:
+        self.requests += 1
+        reply = truncate_to_tokens(self._reply_for(messages), max_tokens)
+        prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        await self.latency_model.acquire()
+        try:
+            await asyncio.sleep(self.latency_model.first_token_delay(prompt_tokens) + self.latency_model.output_delay(estimate_tokens(reply)))
+        finally:
+            self.latency_model.release()
+        return reply
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        self.requests += 1
+        reply = truncate_to_tokens(self._reply_for(messages), max_tokens)
+        prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        await self.latency_model.acquire()
+        try:
+            await asyncio.sleep(self.latency_model.first_token_delay(prompt_tokens))
+            for i in range(0, len(reply), STREAM_CHUNK_CHARS):
+                chunk = reply[i:i + STREAM_CHUNK_CHARS]
+                yield chunk
+                await asyncio.sleep(self.latency_model.output_delay(estimate_tokens(chunk)))
+        finally:
+            self.latency_model.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "latency_model": self.latency_model.stats()}
+
+class ReplayProvider(SyntheticProvider):
+    """重放录制的响应（录制文件由 LLM_RECORD_FILE 生成）
+
+    按消息列表精确匹配；提示词中含有实时家居状态时通常匹配不到，
+    再按最后一条用户消息匹配，仍匹配不到时按录制顺序轮流返回，保证结果确定。
+    latency_model 为空时按录制的首token延迟和总耗时回放。
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = LLM_REPLAY_FILE, latency_model: Optional[LatencyModel] = None):
+        super().__init__()
+        self.latency_model = latency_model
+        self.path = path
+        self.recordings: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_user_message: Dict[str, Dict[str, Any]] = {}
+        self._cursor = 0
+        self.exact_hits = 0
+        self.message_hits = 0
+        self.fallbacks = 0
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self.recordings.append(json.loads(line))
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"❌ 无法读取LLM录制文件 {path}: {e}")
+        if not self.recordings:
+            raise ValueError(f"❌ LLM录制文件 {path} 中没有记录")
+
+        for record in self.recordings:
+            self._by_key.setdefault(record["key"], record)
+            self._by_user_message.setdefault(last_user_message(record["messages"]), record)
+
+    def _lookup(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        record = self._by_key.get(messages_key(messages))
+        if record is not None:
+            self.exact_hits += 1
+            return record
+        record = self._by_user_message.get(last_user_message(messages))
+        if record is not None:
+            self.message_hits += 1
+            return record
+        self.fallbacks += 1
+        record = self.recordings[self._cursor % len(self.recordings)]
+        self._cursor += 1
+        return record
+
+    def _reply_for(self, messages: List[Dict[str, str]]) -> str:
+        return self._lookup(messages)["response"]
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Optional[str]:
+        if self.latency_model is not None:
+            return await super().complete(model, messages, temperature, max_tokens)
+        self.requests += 1
+        record = self._lookup(messages)
+        await asyncio.sleep(record.get("duration", 0))
+        return record["response"]
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        if self.latency_model is not None:
+            async for chunk in super().stream(model, messages, temperature, max_tokens):
+                yield chunk
+            return
+        self.requests += 1
+        record = self._lookup(messages)
+        reply = record["response"]
+        first_token = record.get("first_token_latency", 0)
+        await asyncio.sleep(first_token)
+        chunks = [reply[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(reply), STREAM_CHUNK_CHARS)]
+        interval = max(0.0, record.get("duration", 0) - first_token) / max(1, len(chunks))
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "recordings": len(self.recordings),
+            "exact_hits": self.exact_hits,
+            "message_hits": self.message_hits,
+            "fallbacks": self.fallbacks,
+            "latency_model": self.latency_model.stats() if self.latency_model else "recorded"
+        }
+
+class RecordingProvider(LLMProvider):
+    """包装另一个提供方，把每次成功调用的消息、回复、首token延迟和总耗时追加到JSONL文件"""
+
+    def __init__(self, provider: LLMProvider, path: str):
+        super().__init__()
+        self.provider = provider
+        self.name = provider.name
+        self.path = path
+        self.recorded = 0
+
+    async def _record(self, messages: List[Dict[str, str]], response: str, first_token_latency: float, duration: float):
+        line = json.dumps({
+            "key": messages_key(messages),
+            "messages": messages,
+            "response": response,
+            "first_token_latency": round(first_token_latency, 4),
+            "duration": round(duration, 4)
+        }, ensure_ascii=False)
+
+        def append():
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+        await asyncio.to_thread(append)
+        self.recorded += 1
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Optional[str]:
+        start = time.perf_counter()
+        response = await self.provider.complete(model, messages, temperature, max_tokens)
+        duration = time.perf_counter() - start
+        if response:
+            # 非流式调用无法区分首token延迟，按总耗时记录
+            await self._record(messages, response, duration, duration)
+        return response
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        first_token_latency = None
+        chunks = []
+        async for chunk in self.provider.stream(model, messages, temperature, max_tokens):
+            if first_token_latency is None:
+                first_token_latency = time.perf_counter() - start
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            await self._record(messages, "".join(chunks), first_token_latency, time.perf_counter() - start)
+
+    async def close(self):
+        await self.provider.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.provider.stats(), "recording_to": self.path, "recorded": self.recorded}
+
+def create_llm_provider(kind: str = LLM_PROVIDER) -> LLMProvider:
+    """按配置创建LLM提供方
+
+    Raises:
+        ValueError: 未知的提供方类型，或提供方配置无效（如未配置 DASHSCOPE_API_KEY、录制文件不存在）
+    """
+    if kind == "dashscope":
+        provider = DashScopeProvider()
+    elif kind == "synthetic":
+        provider = SyntheticProvider()
+    elif kind == "replay":
+        provider = ReplayProvider(latency_model=LatencyModel() if LLM_REPLAY_TIMING == "synthetic" else None)
+    else:
+        raise ValueError(f"未知的LLM提供方: {kind}")
+
+    if LLM_RECORD_FILE:
+        provider = RecordingProvider(provider, LLM_RECORD_FILE)
+    return provider
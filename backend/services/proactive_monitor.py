@@ -0,0 +1,140 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+
+from models.devices import AGENT_EVENT_SOURCE, DeviceEvent, DeviceType, SensorDevice, SensorType, HomeState, is_numeric
+from services.home_simulator import HomeSimulator
+
+if TYPE_CHECKING:
+    from services.agent_service import AgentService
+
+AGENT_PROACTIVE_DEBOUNCE = float(os.getenv("AGENT_PROACTIVE_DEBOUNCE", 2.0))  # 秒，事件静默多久后开始分析
+AGENT_PROACTIVE_MAX_DELAY = float(os.getenv("AGENT_PROACTIVE_MAX_DELAY", 10.0))  # 秒，持续有事件时最多等待多久
+AGENT_SENSOR_THRESHOLD = float(os.getenv("AGENT_SENSOR_THRESHOLD", 1.0))  # 数值传感器相对上次分析的变化阈值
+
+# 变化不单独触发分析的字段
+IGNORED_EVENT_FIELDS = {"detection_duration"}
+
+class ProactiveMonitor:
+    """事件驱动的主动分析
+
+    订阅设备事件总线，只有显著变化（设备开关、人体/门磁变化、数值传感器
+    相对上次分析的变化超过阈值、设备设置变化）才触发分析；触发后等待事件
+    静默 debounce 秒再分析一次，连续变化时最多等待 max_delay 秒。
+    智能体自己执行的操作（source 为 agent）不触发分析；智能体仍处于两次建议的
+    最小间隔内时等待间隔结束再分析，期间的事件合并到这一次分析中。
+    多进程部署时只有主进程分析（包括其他进程同步来的事件）。
+    """
+
+    def __init__(
+        self,
+        agent: "AgentService",
+        home_simulator: HomeSimulator,
+        debounce: float = AGENT_PROACTIVE_DEBOUNCE,
+        max_delay: float = AGENT_PROACTIVE_MAX_DELAY,
+        sensor_threshold: float = AGENT_SENSOR_THRESHOLD
+    ):
+        self.agent = agent
+        self.home_simulator = home_simulator
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.sensor_threshold = sensor_threshold
+        self.analysis_count = 0
+        self._baselines: Dict[str, float] = {}  # 上次分析时的数值传感器读数
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """订阅事件并启动监听任务"""
+        if self._task is None:
+            self._record_baselines(self.home_simulator.get_current_state())
+            self._queue = self.home_simulator.event_bus.subscribe()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止监听"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            self.home_simulator.event_bus.unsubscribe(self._queue)
+            self._queue = None
+
+    def is_significant(self, event: DeviceEvent) -> bool:
+        """判断事件是否值得触发分析"""
+        if event.source == AGENT_EVENT_SOURCE:
+            return False
+
+        if "status" in event.changes:
+            return True
+
+        if event.type == DeviceType.SENSOR and "value" in event.changes:
+            sensor = self.home_simulator.get_device(event.device_id)
+            if not isinstance(sensor, SensorDevice) or sensor.sensor_type in (SensorType.MOTION, SensorType.DOOR):
+                return True
+
+            value = event.changes["value"]
+            baseline = self._baselines.get(event.device_id, event.previous.get("value"))
+            # 读数或基准不是数值（如通过设备更新写入的字符串）时无法比较，视为显著变化
+            if not is_numeric(value) or not is_numeric(baseline):
+                return True
+            return abs(value - baseline) >= self.sensor_threshold
+
+        return any(field not in IGNORED_EVENT_FIELDS for field in event.changes)
+
+    async def _run(self):
+        """等待显著事件，防抖后执行分析"""
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._handle(event)
+            except Exception as e:
+                print(f"❌ 主动分析事件处理失败: {e}")
+
+    async def _handle(self, event: DeviceEvent):
+        """处理一个事件：显著时等待事件静默和建议间隔后分析"""
+        if not self.home_simulator.state_backend.is_primary or not self.is_significant(event):
+            return
+
+        loop = asyncio.get_running_loop()
+        # 等待事件静默，合并同一波变化
+        deadline = loop.time() + self.max_delay
+        while True:
+            timeout = min(self.debounce, deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+
+        # 智能体限制了建议频率，等到可以分析时再分析，而不是丢弃这次触发
+        while (remaining := self.agent.suggestion_cooldown_remaining()) > 0:
+            try:
+                await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        await self._analyze()
+
+    async def _analyze(self):
+        """分析当前状态"""
+        home_state = self.home_simulator.get_current_state()
+        self._record_baselines(home_state)
+        self.analysis_count += 1
+        try:
+            await self.agent.analyze_home_state(home_state)
+        except Exception as e:
+            print(f"❌ 主动分析失败: {e}")
+
+    def _record_baselines(self, home_state: HomeState):
+        """记录数值传感器的当前读数作为下一次比较的基准"""
+        for device in home_state.devices:
+            if (isinstance(device, SensorDevice)
+                    and device.sensor_type not in (SensorType.MOTION, SensorType.DOOR)
+                    and is_numeric(device.value)):
+                self._baselines[device.id] = device.value
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from database.database import AsyncDatabase
+
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", 3600))  # 秒，两次清理的间隔
+MESSAGE_RETENTION_DAYS = float(os.getenv("MESSAGE_RETENTION_DAYS", 30))  # 0表示永久保留
+STATE_HISTORY_RETENTION_DAYS = float(os.getenv("STATE_HISTORY_RETENTION_DAYS", 30))
+SENSOR_RAW_RETENTION_DAYS = float(os.getenv("SENSOR_RAW_RETENTION_DAYS", 7))
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "True").lower() == "true"
+
+class RetentionManager:
+    """历史数据保留策略
+
+    定期把超出保留期的对话消息、状态历史（关键帧和变更日志）和传感器原始读数
+    移出热表：开启归档时压缩为归档段，否则直接删除。传感器汇总数据不受影响。
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        interval: float = RETENTION_INTERVAL,
+        message_days: float = MESSAGE_RETENTION_DAYS,
+        state_history_days: float = STATE_HISTORY_RETENTION_DAYS,
+        sensor_raw_days: float = SENSOR_RAW_RETENTION_DAYS,
+        archive: bool = ARCHIVE_ENABLED,
+        is_primary: Optional[Callable[[], bool]] = None
+    ):
+        self.database = database
+        self.interval = interval
+        self.message_days = message_days
+        self.state_history_days = state_history_days
+        self.sensor_raw_days = sensor_raw_days
+        self.archive = archive
+        # 多进程部署时只在主进程清理
+        self.is_primary = is_primary or (lambda: True)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动定期清理任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止清理任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            if self.is_primary():
+                try:
+                    moved = await self.compact()
+                    if any(moved.values()):
+                        print(f"🗄️ 历史数据已归档: {moved}")
+                except Exception as e:
+                    print(f"❌ 历史数据清理失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """执行一次清理
+
+        Returns:
+            Dict[str, int]: 各表移出的行数
+        """
+        now = now or datetime.now()
+        moved = {}
+
+        if self.message_days > 0:
+            # agent_messages 的时间由sqlite3默认适配器写入，日期和时间以空格分隔
+            cutoff = (now - timedelta(days=self.message_days)).isoformat(" ")
+            moved["agent_messages"] = await self.database.archive_rows("agent_messages", cutoff, self.archive)
+
+        if self.state_history_days > 0:
+            # 保留截止时间之前最近的关键帧，保证其后的任意时刻都能重建
+            cutoff = (now - timedelta(days=self.state_history_days)).isoformat()
+            keyframe = await self.database.get_latest_home_state(cutoff)
+            if keyframe is not None:
+                keep_from = keyframe["timestamp"]
+                moved["home_states"] = await self.database.archive_rows("home_states", keep_from, self.archive)
+                moved["device_changes"] = await self.database.archive_rows("device_changes", keep_from, self.archive)
+
+        if self.sensor_raw_days > 0:
+            cutoff = (now - timedelta(days=self.sensor_raw_days)).isoformat()
+            moved["sensor_readings"] = await self.database.archive_rows("sensor_readings", cutoff, self.archive)
+
+        return moved
@@ -0,0 +1,194 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.agent import AgentSuggestion, RuleCondition, SuggestionRule
+from models.devices import Device, DeviceStatus, DeviceType, SensorDevice, SensorType, Room, HomeState, ROOM_NAMES
+
+AGENT_RULES_FILE = os.getenv("AGENT_RULES_FILE", "")  # 规则JSON文件，为空时使用内置规则
+AGENT_RULES_ENABLED = os.getenv("AGENT_RULES_ENABLED", "True").lower() == "true"
+# 主动分析时没有任何规则命中的处理：ignore 视为状态正常，不调用LLM；llm 交给LLM分析
+# 用户主动请求的分析（/api/agent/analyze）没有规则命中时总是交给LLM
+AGENT_RULES_UNMATCHED = os.getenv("AGENT_RULES_UNMATCHED", "ignore")
+AGENT_RULES_USER_HOLD = float(os.getenv("AGENT_RULES_USER_HOLD", 1800))  # 秒，用户操作过的设备在此期间不被规则操作
+
+DEFAULT_RULES = [
+    SuggestionRule(
+        name="light_on_empty_room",
+        target=RuleCondition(type=DeviceType.LIGHT, status=DeviceStatus.ON, held_for=60),
+        occupied=False,
+        action={"status": "off"},
+        message="{room}没人，{device}还开着，已经帮你关掉了。"
+    ),
+    SuggestionRule(
+        name="ac_on_empty_room",
+        target=RuleCondition(type=DeviceType.AC, status=DeviceStatus.ON, held_for=600),
+        occupied=False,
+        action={"status": "off"},
+        message="{room}没人，{device}已经开了一段时间，帮你关掉省点电。"
+    ),
+    SuggestionRule(
+        name="hot_occupied_room",
+        target=RuleCondition(type=DeviceType.AC, status=DeviceStatus.OFF),
+        occupied=True,
+        requires=[RuleCondition(sensor_type=SensorType.TEMPERATURE, above=28)],
+        action={"status": "on", "properties": {"temperature": 26, "mode": "cool"}},
+        message="{room}温度有点高，已经帮你把{device}开到26度。"
+    ),
+    SuggestionRule(
+        name="door_open",
+        target=RuleCondition(sensor_type=SensorType.DOOR, above=0),
+        escalate=True
+    ),
+]
+
+def load_rules(path: str = AGENT_RULES_FILE) -> List[SuggestionRule]:
+    """从JSON文件加载规则列表，未配置文件时返回内置规则"""
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(path, encoding="utf-8") as f:
+        return [SuggestionRule(**rule) for rule in json.load(f)]
+
+class RuleEngine:
+    """主动分析的规则快速通道
+
+    在调用LLM之前按房间评估声明式规则（房间占用、设备状态、传感器阈值、
+    状态持续时间）。常见情况由规则直接给出建议和操作，只有命中 escalate
+    规则时才交给LLM；没有规则命中时按 unmatched 处理（默认视为状态正常）。
+    用户在 user_hold 秒内亲自操作过的设备不会被带操作的规则改回去。
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[SuggestionRule]] = None,
+        unmatched: str = AGENT_RULES_UNMATCHED,
+        user_hold: float = AGENT_RULES_USER_HOLD
+    ):
+        if unmatched not in ("llm", "ignore"):
+            raise ValueError(f"未知的未命中处理方式: {unmatched}")
+        self.rules = rules if rules is not None else load_rules()
+        self.unmatched = unmatched
+        self.user_hold = user_hold
+        self.handled_count = 0
+        self.escalated_count = 0
+
+    def evaluate(
+        self,
+        home_state: HomeState,
+        user_changes: Optional[Dict[str, datetime]] = None
+    ) -> List[Tuple[SuggestionRule, Device]]:
+        """返回所有命中的 (规则, 目标设备)
+
+        Args:
+            user_changes: 设备ID到用户最近一次操作该设备的时间，最近操作过的设备不作为带操作规则的目标
+        """
+        now = home_state.timestamp
+        held = {
+            device_id for device_id, changed_at in (user_changes or {}).items()
+            if (now - changed_at).total_seconds() < self.user_hold
+        }
+        by_room: Dict[Room, List[Device]] = {}
+        for device in home_state.devices:
+            by_room.setdefault(device.room, []).append(device)
+
+        matches = []
+        for rule in self.rules:
+            for room, devices in by_room.items():
+                if rule.occupied is not None and home_state.room_occupancy.get(room, False) != rule.occupied:
+                    continue
+                if not all(any(self._matches(condition, device, now) for device in devices)
+                           for condition in rule.requires):
+                    continue
+                since = self._vacant_since(devices) if rule.occupied is False else None
+                matches.extend(
+                    (rule, device) for device in devices
+                    if not (rule.action and device.id in held) and self._matches(rule.target, device, now, since)
+                )
+        return matches
+
+    def decide(
+        self,
+        home_state: HomeState,
+        unmatched: Optional[str] = None,
+        user_changes: Optional[Dict[str, datetime]] = None
+    ) -> Tuple[bool, Optional[AgentSuggestion]]:
+        """决定是否需要LLM
+
+        Args:
+            unmatched: 覆盖没有规则命中时的处理方式，默认使用 self.unmatched
+            user_changes: 用户最近操作设备的时间，见 evaluate
+
+        Returns:
+            Tuple[bool, Optional[AgentSuggestion]]: (是否交给LLM, 规则给出的建议)；
+            不需要LLM且没有建议时表示状态正常
+        """
+        matches = self.evaluate(home_state, user_changes)
+        if any(rule.escalate for rule, _ in matches) or (not matches and (unmatched or self.unmatched) == "llm"):
+            self.escalated_count += 1
+            return True, None
+
+        self.handled_count += 1
+        if not matches:
+            return False, None
+        return False, self._build_suggestion(matches)
+
+    def stats(self) -> Dict[str, Any]:
+        """规则数量及本地处理/交给LLM的次数"""
+        return {
+            "rules": len(self.rules),
+            "handled": self.handled_count,
+            "escalated": self.escalated_count,
+            "unmatched": self.unmatched
+        }
+
+    @staticmethod
+    def _vacant_since(devices: List[Device]) -> Optional[datetime]:
+        """房间变为无人的时间：房间内人体传感器最后一次变为未检测到人的时间，没有人体传感器时返回None"""
+        motion_sensors = [
+            device for device in devices
+            if isinstance(device, SensorDevice) and device.sensor_type == SensorType.MOTION
+        ]
+        if not motion_sensors:
+            return None
+        return max(sensor.last_updated for sensor in motion_sensors)
+
+    @staticmethod
+    def _matches(condition: RuleCondition, device: Device, now: datetime, since: Optional[datetime] = None) -> bool:
+        """判断设备是否满足条件，since 给出时 held_for 从该时间起计算，否则从设备上次更新起计算"""
+        if condition.type is not None and device.type != condition.type:
+            return False
+        if condition.status is not None and device.status != condition.status:
+            return False
+        if condition.sensor_type is not None or condition.above is not None or condition.below is not None:
+            if not isinstance(device, SensorDevice) or device.value is None:
+                return False
+            if condition.sensor_type is not None and device.sensor_type != condition.sensor_type:
+                return False
+            if condition.above is not None and not device.value > condition.above:
+                return False
+            if condition.below is not None and not device.value < condition.below:
+                return False
+        if condition.held_for and (now - (since or device.last_updated)).total_seconds() < condition.held_for:
+            return False
+        return True
+
+    @staticmethod
+    def _build_suggestion(matches: List[Tuple[SuggestionRule, Device]]) -> AgentSuggestion:
+        """把命中的规则合并为一条建议"""
+        messages = []
+        actions: Dict[str, Any] = {}
+        for rule, device in matches:
+            if rule.message:
+                messages.append(rule.message.format(room=ROOM_NAMES.get(device.room, device.room.value), device=device.name))
+            if rule.action:
+                actions[device.id] = rule.action
+
+        return AgentSuggestion(
+            id=str(uuid.uuid4()),
+            content="".join(messages),
+            suggested_actions=actions,
+            reasoning="规则: " + ", ".join(dict.fromkeys(rule.name for rule, _ in matches)),
+            timestamp=datetime.now()
+        )
@@ -0,0 +1,116 @@
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from models.devices import DeviceCommand, DeviceStatus, DeviceType, Room, Scene
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+# 数据库中没有任何场景时写入的默认场景
+DEFAULT_SCENES = [
+    Scene(name="sleep", description="睡眠：关闭所有灯，卧室空调26度", commands=[
+        DeviceCommand(type=DeviceType.LIGHT, status=DeviceStatus.OFF),
+        DeviceCommand(room=Room.BEDROOM, type=DeviceType.AC, status=DeviceStatus.ON,
+                      properties={"temperature": 26, "mode": "auto"}),
+    ]),
+    Scene(name="leave_home", description="离家：关闭所有灯和空调", commands=[
+        DeviceCommand(type=DeviceType.LIGHT, status=DeviceStatus.OFF),
+        DeviceCommand(type=DeviceType.AC, status=DeviceStatus.OFF),
+    ]),
+    Scene(name="come_home", description="回家：打开客厅灯", commands=[
+        DeviceCommand(room=Room.LIVING_ROOM, type=DeviceType.LIGHT, status=DeviceStatus.ON,
+                      properties={"brightness": 80}),
+    ]),
+]
+
+class SceneEngine:
+    """场景引擎
+
+    场景定义保存在 scenes 表，启动时加载到内存；激活时使用预编译的逐设备更新
+    计划，作为一次批量更新执行。计划在场景修改或设备增删（registry_version
+    变化）后才重新编译。
+    """
+
+    def __init__(self, home_simulator: "HomeSimulator"):
+        self.home_simulator = home_simulator
+        self._scenes: Dict[str, Scene] = {}
+        self._plans: Dict[str, Tuple[int, Dict[str, Dict[str, Any]]]] = {}  # 场景名 -> (registry_version, 计划)
+
+    async def load(self):
+        """从数据库加载场景，没有任何场景时写入默认场景"""
+        rows = await self.home_simulator.database.get_scenes()
+        if not rows:
+            for scene in DEFAULT_SCENES:
+                await self.save(scene)
+            return
+
+        self._scenes = {
+            row["name"]: Scene(
+                name=row["name"],
+                description=row["description"] or "",
+                commands=json.loads(row["commands"])
+            )
+            for row in rows
+        }
+        self._plans.clear()
+
+    def list_scenes(self) -> List[Scene]:
+        """获取所有场景"""
+        return list(self._scenes.values())
+
+    def get_scene(self, name: str) -> Optional[Scene]:
+        """获取场景"""
+        return self._scenes.get(name)
+
+    async def save(self, scene: Scene):
+        """创建或替换场景"""
+        commands = [command.dict(exclude_none=True) for command in scene.commands]
+        await self.home_simulator.database.save_scene(scene.name, scene.description, commands)
+        self._scenes[scene.name] = scene
+        self._plans.pop(scene.name, None)
+        await self.home_simulator.state_backend.notify_reload("scenes")
+
+    async def delete(self, name: str) -> bool:
+        """删除场景"""
+        if name not in self._scenes:
+            return False
+        await self.home_simulator.database.delete_scene(name)
+        del self._scenes[name]
+        self._plans.pop(name, None)
+        await self.home_simulator.state_backend.notify_reload("scenes")
+        return True
+
+    def plan(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """获取场景的更新计划（设备ID到 {"status", "properties"} 的映射），调用方不应修改
+
+        Raises:
+            KeyError: 场景不存在
+        """
+        scene = self._scenes.get(name)
+        if scene is None:
+            raise KeyError(name)
+
+        registry_version = self.home_simulator.registry_version
+        cached = self._plans.get(name)
+        if cached is None or cached[0] != registry_version:
+            cached = (registry_version, self.home_simulator.compile_commands(scene.commands))
+            self._plans[name] = cached
+        return cached[1]
+
+    async def activate(self, name: str, atomic: bool = True, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """激活场景
+
+        Args:
+            source: 变更的发起方，记录在设备事件中
+
+        Returns:
+            List[Dict[str, Any]]: 每个设备的执行结果
+
+        Raises:
+            KeyError: 场景不存在
+        """
+        return await self.home_simulator.update_devices(self.plan(name), atomic=atomic, source=source)
+
+    def describe(self) -> str:
+        """场景列表的简短描述，用于提示词"""
+        return "\n".join(f"- {scene.name}: {scene.description}" for scene in self._scenes.values())
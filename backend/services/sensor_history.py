@@ -0,0 +1,163 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from models.devices import DeviceType, is_numeric
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+SENSOR_HISTORY_FLUSH_INTERVAL = float(os.getenv("SENSOR_HISTORY_FLUSH_INTERVAL", 1.0))  # 秒
+
+# 汇总粒度及其时间桶截断方式
+ROLLUP_STEPS = {
+    "1m": lambda ts: ts.replace(second=0, microsecond=0),
+    "1h": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "1d": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+HISTORY_STEPS = ("raw",) + tuple(ROLLUP_STEPS)
+
+class SensorHistory:
+    """传感器时序数据
+
+    订阅设备事件，把传感器读数批量追加到 sensor_readings，同时在内存中按
+    1m / 1h / 1d 时间桶预聚合后合并进 sensor_rollups（min / max / sum / count），
+    范围查询直接读取对应粒度的汇总，不扫描原始读数。
+    """
+
+    def __init__(self, home_simulator: "HomeSimulator", flush_interval: float = SENSOR_HISTORY_FLUSH_INTERVAL):
+        self.home_simulator = home_simulator
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[str, datetime, float]] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def start(self):
+        """开始订阅传感器读数变化
+
+        启动时不记录当前读数：重启或家庭重新加载前的读数已经落盘，重复写入会影响汇总的 min/avg/count。
+        """
+        if self._task is None:
+            self._queue = self.home_simulator.event_bus.subscribe(queue_size=0, local_only=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止订阅并写入剩余读数"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            await self.flush()
+            self.home_simulator.event_bus.unsubscribe(self._queue)
+            self._queue = None
+
+    async def _run(self):
+        """定期写入读数"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ 传感器读数写入失败: {e}")
+
+    async def flush(self):
+        """写入待写读数及其汇总"""
+        async with self._flush_lock:
+            while self._queue is not None and not self._queue.empty():
+                event = self._queue.get_nowait()
+                value = event.changes.get("value")
+                # 设备更新不校验属性类型，非数值读数不进入时序数据
+                if event.type == DeviceType.SENSOR and is_numeric(value):
+                    self._pending.append((event.device_id, event.timestamp, float(value)))
+
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, []
+            readings = [(device_id, ts.isoformat(), value) for device_id, ts, value in batch]
+            try:
+                await self.home_simulator.database.save_sensor_readings(readings, self._aggregate(batch))
+            except Exception:
+                self._pending = batch + self._pending
+                raise
+
+    @staticmethod
+    def _aggregate(batch: List[Tuple[str, datetime, float]]) -> List[tuple]:
+        """把一批读数聚合为各粒度的汇总行"""
+        buckets: Dict[Tuple[str, str, str], List[float]] = {}
+        for device_id, ts, value in batch:
+            for step, truncate in ROLLUP_STEPS.items():
+                key = (device_id, step, truncate(ts).isoformat())
+                stats = buckets.get(key)
+                if stats is None:
+                    buckets[key] = [value, value, value, 1]
+                else:
+                    stats[0] = min(stats[0], value)
+                    stats[1] = max(stats[1], value)
+                    stats[2] += value
+                    stats[3] += 1
+
+        return [key + tuple(stats) for key, stats in buckets.items()]
+
+    async def query(
+        self,
+        device_id: str,
+        start: datetime,
+        end: datetime,
+        step: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """查询传感器在时间区间内的历史
+
+        Args:
+            device_id: 传感器ID
+            start: 开始时间
+            end: 结束时间
+            step: raw / 1m / 1h / 1d，默认按区间长度自动选择
+
+        Returns:
+            Dict[str, Any]: 包含粒度和数据点的结果
+        """
+        if step is None:
+            step = self._auto_step(end - start)
+        if step not in HISTORY_STEPS:
+            raise ValueError(f"不支持的粒度: {step}")
+
+        # 让刚产生的读数也能被查询到
+        await self.flush()
+
+        if step == "raw":
+            points = await self.home_simulator.database.get_sensor_readings(device_id, start.isoformat(), end.isoformat())
+        else:
+            # 包含起点所在的时间桶
+            bucket_start = ROLLUP_STEPS[step](start).isoformat()
+            rows = await self.home_simulator.database.get_sensor_rollups(device_id, step, bucket_start, end.isoformat())
+            points = [{
+                "timestamp": row["bucket"],
+                "min": row["min_value"],
+                "max": row["max_value"],
+                "avg": row["sum_value"] / row["count"] if row["count"] else None,
+                "count": row["count"]
+            } for row in rows]
+
+        return {
+            "device_id": device_id,
+            "step": step,
+            "from": start,
+            "to": end,
+            "points": points
+        }
+
+    @staticmethod
+    def _auto_step(span: timedelta) -> str:
+        """按查询区间长度选择粒度，使数据点数量保持在几百个以内"""
+        if span <= timedelta(hours=6):
+            return "1m"
+        if span <= timedelta(days=14):
+            return "1h"
+        return "1d"
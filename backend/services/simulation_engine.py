@@ -0,0 +1,392 @@
+import asyncio
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # 只有开启模拟时需要，创建设备不依赖numpy
+    np = None
+
+from models.devices import (
+    Device, SensorDevice, LightDevice, ACDevice,
+    DeviceType, DeviceStatus, SensorType, Room
+)
+from models.simulation import HomeDefinition, RoomDefinition
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+SIMULATION_ENABLED = os.getenv("SIMULATION_ENABLED", "False").lower() == "true"
+SIMULATION_CONFIG = os.getenv("SIMULATION_CONFIG", "")  # 家庭定义JSON文件，为空时使用 DEFAULT_HOME_DEFINITION
+SIMULATION_TICK = float(os.getenv("SIMULATION_TICK", 1.0))  # 秒，模拟步进间隔（真实时间）
+SIMULATION_MAX_STEP = 60.0  # 秒（模拟时间），单次欧拉积分的最大步长
+SIMULATION_YIELD_EVERY = 500  # 每应用这么多条读数让出一次事件循环
+LIGHT_LUX = 300.0  # 房间里的灯全部全亮时的光照（lux）
+
+# 按传感器类型的默认单位、噪声标准差和读数小数位
+SENSOR_UNITS = {
+    SensorType.MOTION: "boolean",
+    SensorType.TEMPERATURE: "°C",
+    SensorType.HUMIDITY: "%",
+    SensorType.LIGHT: "lux",
+    SensorType.DOOR: "boolean",
+}
+SENSOR_NOISE = {
+    SensorType.TEMPERATURE: 0.1,
+    SensorType.HUMIDITY: 1.0,
+    SensorType.LIGHT: 10.0,
+}
+SENSOR_DECIMALS = {
+    SensorType.TEMPERATURE: 1,
+    SensorType.HUMIDITY: 1,
+    SensorType.LIGHT: 0,
+}
+
+# 模拟引擎生成读数的传感器类型（门磁等其他传感器保持原值）
+SIMULATED_SENSORS = [SensorType.MOTION, SensorType.TEMPERATURE, SensorType.HUMIDITY, SensorType.LIGHT]
+
+# 未配置 SIMULATION_CONFIG 时的家庭：卧室、客厅、厨房的默认设备，以及各房间的作息
+DEFAULT_HOME_DEFINITION = {
+    "name": "默认家庭",
+    "rooms": [
+        {
+            "room": "bedroom",
+            "thermal": {"initial_temperature": 25.5},
+            "occupancy": [{"start": "22:30", "end": "07:30", "probability": 0.95}],
+            "devices": [
+                {"id": "sensor_bedroom_motion", "name": "卧室人体感应器", "type": "sensor", "sensor_type": "motion", "properties": {"value": 1}},
+                {"id": "sensor_bedroom_temp", "name": "卧室温度传感器", "type": "sensor", "sensor_type": "temperature", "properties": {"value": 25.5}},
+                {"id": "light_bedroom", "name": "卧室主灯", "type": "light", "properties": {"brightness": 80}},
+                {"id": "ac_bedroom", "name": "卧室空调", "type": "air_conditioner", "status": "off",
+                 "properties": {"temperature": 26.0, "mode": "auto", "fan_speed": 3}}
+            ]
+        },
+        {
+            "room": "living_room",
+            "occupancy": [
+                {"start": "07:30", "end": "08:30", "probability": 0.5},
+                {"start": "18:30", "end": "22:30", "probability": 0.8}
+            ],
+            "devices": [
+                {"id": "sensor_living_motion", "name": "客厅人体感应器", "type": "sensor", "sensor_type": "motion", "properties": {"value": 0}},
+                {"id": "light_living", "name": "客厅主灯", "type": "light", "properties": {"brightness": 90}}
+            ]
+        },
+        {
+            "room": "kitchen",
+            "occupancy": [
+                {"start": "07:00", "end": "07:45", "probability": 0.7},
+                {"start": "18:00", "end": "19:00", "probability": 0.7}
+            ],
+            "devices": [
+                {"id": "light_kitchen", "name": "厨房灯", "type": "light", "status": "off", "properties": {"brightness": 100}}
+            ]
+        },
+        {
+            "room": "bathroom",
+            "occupancy": [
+                {"start": "07:00", "end": "07:30", "probability": 0.6},
+                {"start": "22:00", "end": "22:30", "probability": 0.5}
+            ]
+        },
+        {"room": "balcony", "base_occupancy": 0.02}
+    ]
+}
+
+def load_home_definition(path: str = SIMULATION_CONFIG) -> HomeDefinition:
+    """读取家庭定义文件，未配置时使用默认家庭
+
+    Raises:
+        ValueError: 文件无法读取或格式无效
+    """
+    if not path:
+        return HomeDefinition(**DEFAULT_HOME_DEFINITION)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return HomeDefinition(**json.load(f))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"❌ 无法读取家庭定义 {path}: {e}")
+
+def build_devices(definition: HomeDefinition) -> List[Device]:
+    """按家庭定义创建设备，设备组展开为 {id}_{序号}"""
+    current_time = datetime.now()
+    devices = []
+    for room in definition.rooms:
+        for group in room.devices:
+            for i in range(group.count):
+                fields = {
+                    "id": group.id if group.count == 1 else f"{group.id}_{i}",
+                    "name": group.name if group.count == 1 else f"{group.name}{i + 1}",
+                    "type": group.type,
+                    "room": room.room,
+                    "status": group.status,
+                    "last_updated": current_time,
+                    "created_at": current_time,
+                    **group.properties
+                }
+                if group.type == DeviceType.SENSOR:
+                    if group.sensor_type is None:
+                        raise ValueError(f"❌ 传感器设备组 {group.id} 缺少 sensor_type")
+                    fields.setdefault("unit", SENSOR_UNITS.get(group.sensor_type))
+                    fields.setdefault("value", initial_sensor_value(room, group.sensor_type))
+                    devices.append(SensorDevice(sensor_type=group.sensor_type, **fields))
+                elif group.type == DeviceType.LIGHT:
+                    devices.append(LightDevice(**fields))
+                elif group.type == DeviceType.AC:
+                    devices.append(ACDevice(**fields))
+                else:
+                    devices.append(Device(**fields))
+    return devices
+
+def initial_sensor_value(room: RoomDefinition, sensor_type: SensorType) -> float:
+    """未指定初始读数时按房间的热模型给出"""
+    if sensor_type == SensorType.TEMPERATURE:
+        return room.thermal.initial_temperature
+    if sensor_type == SensorType.HUMIDITY:
+        return room.thermal.humidity
+    return 0
+
+def parse_minutes(value: str) -> int:
+    """HH:MM 转为一天中的分钟数"""
+    hour, minute = value.split(":")
+    return int(hour) * 60 + int(minute)
+
+class SimulationEngine:
+    """声明式家庭定义驱动的模拟引擎
+
+    每次步进用NumPy按房间和传感器整体计算：房间占用按作息概率做两状态马尔可夫切换，
+    室温按一阶热模型积分（室外温度日变化、开启的空调、房间里的人），湿度和光照由占用、
+    日照和开着的灯决定；到达上报时间的传感器生成带噪声的读数，变化的读数通过
+    HomeSimulator.update_device 走完整的事件、历史和落盘流程。
+
+    模拟的是模拟器中实际存在的设备（包括从数据库恢复的），设备增删后下一次步进重新绑定；
+    上报频率优先取家庭定义中对应设备组的 update_rate。
+    """
+
+    def __init__(self, home_simulator: "HomeSimulator", definition: Optional[HomeDefinition] = None):
+        self.home_simulator = home_simulator
+        self.definition = definition or load_home_definition()
+        self.rooms = list(Room)
+        room_definitions = {room.room: room for room in self.definition.rooms}
+        self._room_definitions = [room_definitions.get(room, RoomDefinition(room=room)) for room in self.rooms]
+        self._rng = None
+        self._bound_version = None
+        self._last_step: Optional[float] = None
+        self.sim_time: Optional[datetime] = None
+        self.ticks = 0
+        self.readings = 0
+        self.updates = 0
+        self.last_step_ms = 0.0
+
+    def build_devices(self) -> List[Device]:
+        """按家庭定义创建设备"""
+        return build_devices(self.definition)
+
+    def _group_settings(self) -> Dict[str, Dict[str, Any]]:
+        """设备ID到所属设备组的上报频率和噪声"""
+        settings = {}
+        for room in self.definition.rooms:
+            for group in room.devices:
+                setting = {"update_rate": group.update_rate, "noise": group.noise}
+                if group.count == 1:
+                    settings[group.id] = setting
+                else:
+                    for i in range(group.count):
+                        settings[f"{group.id}_{i}"] = setting
+        return settings
+
+    def _bind(self):
+        """按模拟器中当前的设备建立数组"""
+        if np is None:
+            raise ValueError("❌ SIMULATION_ENABLED 需要安装 numpy 包: pip install numpy")
+        if self._rng is None:
+            self._rng = np.random.default_rng(self.definition.seed)
+            self._init_rooms()
+
+        room_index = {room: i for i, room in enumerate(self.rooms)}
+        settings = self._group_settings()
+        sensors = [
+            device for device in self.home_simulator.devices.values()
+            if isinstance(device, SensorDevice) and device.sensor_type in SIMULATED_SENSORS
+        ]
+        self._sensor_ids = [device.id for device in sensors]
+        self._sensor_room = np.array([room_index[device.room] for device in sensors], dtype=np.int64)
+        self._sensor_kind = np.array([SIMULATED_SENSORS.index(device.sensor_type) for device in sensors], dtype=np.int64)
+        self._sensor_decimals = np.array([SENSOR_DECIMALS.get(device.sensor_type, 0) for device in sensors], dtype=np.int64)
+        rates, noise = [], []
+        for device in sensors:
+            setting = settings.get(device.id, {})
+            rates.append(setting.get("update_rate") or self.definition.sensor_update_rate)
+            configured_noise = setting.get("noise")
+            noise.append(configured_noise if configured_noise is not None else SENSOR_NOISE.get(device.sensor_type, 0.0))
+        self._sensor_period = 1.0 / np.maximum(np.array(rates, dtype=np.float64), 1e-6)
+        self._sensor_noise = np.array(noise, dtype=np.float64)
+        # 首次上报时间在一个周期内错开，避免所有传感器在同一次步进中上报
+        self._sensor_next = self._rng.random(len(sensors)) * self._sensor_period
+
+        self._lights = [device for device in self.home_simulator.devices.values() if isinstance(device, LightDevice)]
+        self._light_room = np.array([room_index[device.room] for device in self._lights], dtype=np.int64)
+        self._lights_per_room = np.bincount(self._light_room, minlength=len(self.rooms))
+        self._acs = [device for device in self.home_simulator.devices.values() if isinstance(device, ACDevice)]
+        self._ac_room = np.array([room_index[device.room] for device in self._acs], dtype=np.int64)
+
+        self._bound_version = self.home_simulator.registry_version
+        self._elapsed = 0.0
+
+    def _init_rooms(self):
+        """房间参数和初始状态"""
+        rooms = self._room_definitions
+        self._tau = np.array([room.thermal.time_constant for room in rooms], dtype=np.float64)
+        self._ac_rate = np.array([room.thermal.ac_rate for room in rooms], dtype=np.float64) / 3600
+        self._occupant_heat = np.array([room.thermal.occupant_heat for room in rooms], dtype=np.float64) / 3600
+        self._base_humidity = np.array([room.thermal.humidity for room in rooms], dtype=np.float64)
+        self._occupant_humidity = np.array([room.thermal.occupant_humidity for room in rooms], dtype=np.float64)
+        self._window_lux = np.array([room.window_lux for room in rooms], dtype=np.float64)
+        self._dwell = np.maximum(np.array([room.mean_dwell for room in rooms], dtype=np.float64), 1.0)
+        self._windows = [
+            [(parse_minutes(window.start), parse_minutes(window.end), window.probability) for window in room.occupancy]
+            for room in rooms
+        ]
+        self._temperature = np.array([room.thermal.initial_temperature for room in rooms], dtype=np.float64)
+        # 初始占用按当前时刻的作息概率抽样（即马尔可夫切换的稳态分布）
+        self._occupied = self._rng.random(len(rooms)) < self._occupancy_probability(self._minute_of_day())
+
+    def _minute_of_day(self) -> float:
+        return self.sim_time.hour * 60 + self.sim_time.minute + self.sim_time.second / 60
+
+    def _occupancy_probability(self, minute_of_day: float) -> "np.ndarray":
+        """各房间当前时刻有人的概率（落在多个时段内时取最大值）"""
+        probability = np.array([room.base_occupancy for room in self._room_definitions], dtype=np.float64)
+        for i, windows in enumerate(self._windows):
+            for start, end, p in windows:
+                inside = start <= minute_of_day < end if start <= end else (minute_of_day >= start or minute_of_day < end)
+                if inside:
+                    probability[i] = max(probability[i], p)
+        return probability
+
+    def _advance_rooms(self, dt: float, minute_of_day: float):
+        """推进 dt 秒（模拟时间）的房间占用和室温"""
+        hour = minute_of_day / 60
+        outdoor = self.definition.outdoor_mean + self.definition.outdoor_amplitude * math.sin(2 * math.pi * (hour - 9) / 24)
+
+        # 两状态马尔可夫切换，稳态下有人的时间比例等于作息概率
+        probability = self._occupancy_probability(minute_of_day)
+        switch = self._rng.random(len(self.rooms))
+        enter = ~self._occupied & (switch < np.minimum(probability * dt / self._dwell, 1.0))
+        leave = self._occupied & (switch < np.minimum((1 - probability) * dt / self._dwell, 1.0))
+        self._occupied = self._occupied ^ (enter | leave)
+
+        # 开启的空调按设定温度与室温之差制冷/制热
+        ac_on = np.array([device.status == DeviceStatus.ON for device in self._acs], dtype=bool)
+        setpoint = np.array([device.temperature for device in self._acs], dtype=np.float64)
+        mode = [device.mode for device in self._acs]
+        can_cool = np.array([m in ("auto", "cool") for m in mode], dtype=bool)
+        can_heat = np.array([m in ("auto", "heat") for m in mode], dtype=bool)
+
+        remaining = dt
+        while remaining > 0:
+            step = min(remaining, SIMULATION_MAX_STEP)
+            drive = np.zeros(len(self.rooms))
+            if len(self._acs):
+                delta = np.clip(setpoint - self._temperature[self._ac_room], -1.0, 1.0)
+                delta = np.where(delta < 0, delta * can_cool, delta * can_heat) * ac_on
+                np.add.at(drive, self._ac_room, delta * self._ac_rate[self._ac_room])
+            self._temperature += step * (
+                (outdoor - self._temperature) / self._tau
+                + self._occupied * self._occupant_heat
+                + drive
+            )
+            remaining -= step
+
+    def _room_lux(self, minute_of_day: float) -> "np.ndarray":
+        """各房间的光照：日照加上房间里灯的平均亮度"""
+        daylight = max(0.0, math.sin(math.pi * (minute_of_day / 60 - 6) / 12))
+        lux = self._window_lux * daylight
+        if self._lights:
+            light_on = np.array([
+                device.brightness / 100 if device.status == DeviceStatus.ON else 0.0
+                for device in self._lights
+            ], dtype=np.float64)
+            brightness = np.zeros(len(self.rooms))
+            np.add.at(brightness, self._light_room, light_on)
+            lux += brightness / np.maximum(self._lights_per_room, 1) * LIGHT_LUX
+        return lux
+
+    def _readings(self, due: "np.ndarray", minute_of_day: float) -> "np.ndarray":
+        """到达上报时间的传感器的读数"""
+        room = self._sensor_room[due]
+        kind = self._sensor_kind[due]
+        noise = self._rng.standard_normal(len(room)) * self._sensor_noise[due]
+        occupied = self._occupied[room].astype(np.float64)
+        values = np.select(
+            [kind == 0, kind == 1, kind == 2],
+            [
+                occupied,
+                self._temperature[room] + noise,
+                np.clip(self._base_humidity[room] + occupied * self._occupant_humidity[room] + noise, 0, 100),
+            ],
+            default=np.maximum(self._room_lux(minute_of_day)[room] + noise, 0),
+        )
+        scale = 10.0 ** self._sensor_decimals[due]
+        return np.round(values * scale) / scale
+
+    async def step(self) -> int:
+        """推进到当前时间，应用到达上报时间的传感器读数
+
+        Returns:
+            int: 本次实际变化的传感器数
+        """
+        started = time.perf_counter()
+        now = time.monotonic()
+        if self._last_step is None:
+            self._last_step = now
+            self.sim_time = datetime.now()
+        if self._bound_version != self.home_simulator.registry_version:
+            self._bind()
+        # 非主进程期间或长时间阻塞后不补算整段时间
+        real_dt = min(now - self._last_step, 10 * SIMULATION_TICK)
+        self._last_step = now
+        dt = real_dt * self.definition.time_scale
+        self.sim_time += timedelta(seconds=dt)
+        self._elapsed += dt
+        minute_of_day = self._minute_of_day()
+
+        self._advance_rooms(dt, minute_of_day)
+        due = np.flatnonzero(self._sensor_next <= self._elapsed)
+        applied = 0
+        if len(due):
+            values = self._readings(due, minute_of_day)
+            self._sensor_next[due] = np.maximum(self._sensor_next[due] + self._sensor_period[due], self._elapsed)
+            timestamp = datetime.now()
+            devices = self.home_simulator.devices
+            for n, (index, value) in enumerate(zip(due.tolist(), values.tolist())):
+                device_id = self._sensor_ids[index]
+                device = devices.get(device_id)
+                if device is None or device.value == value:
+                    continue
+                await self.home_simulator.update_device(device_id, properties={"value": value}, timestamp=timestamp)
+                applied += 1
+                if n % SIMULATION_YIELD_EVERY == SIMULATION_YIELD_EVERY - 1:
+                    await asyncio.sleep(0)
+
+        self.ticks += 1
+        self.readings += len(due)
+        self.updates += applied
+        self.last_step_ms = (time.perf_counter() - started) * 1000
+        return applied
+
+    def stats(self) -> Dict[str, Any]:
+        """模拟统计"""
+        return {
+            "home": self.definition.name,
+            "sim_time": self.sim_time.isoformat() if self.sim_time else None,
+            "sensors": len(self._sensor_ids) if self._bound_version is not None else 0,
+            "ticks": self.ticks,
+            "readings": self.readings,
+            "updates": self.updates,
+            "last_step_ms": round(self.last_step_ms, 2)
+        }
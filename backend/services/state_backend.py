@@ -0,0 +1,427 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台没有文件锁，所有进程都视为主进程
+    fcntl = None
+
+from models.devices import DeviceEvent
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+# memory: 进程内（单进程部署）；sqlite: 共享数据库中的变更日志；redis: Redis或兼容Redis协议的服务
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_SYNC_POLL_INTERVAL = float(os.getenv("STATE_SYNC_POLL_INTERVAL", 0.05))  # 秒，sqlite后端检查其他进程提交的间隔
+STATE_SYNC_LOG_RETENTION = float(os.getenv("STATE_SYNC_LOG_RETENTION", 300))  # 秒，变更日志保留时间
+STATE_SYNC_PRIMARY_TTL = float(os.getenv("STATE_SYNC_PRIMARY_TTL", 10))  # 秒，redis后端主进程租约时长
+STATE_SYNC_READ_BATCH = 1000  # sqlite后端每次读取的日志条数
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "active-hass")
+
+# 变更日志条目类型：设备变更，或场景/自动化定义修改后的重新加载通知
+DEVICE_CHANGE = "device"
+
+# 本进程的标识，用于忽略自己写入的日志
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class StateBackend:
+    """设备状态后端（进程内）
+
+    单进程部署时设备状态只存在于本进程的 HomeSimulator，不需要同步，
+    本进程就是主进程。多进程部署使用 SyncedStateBackend 的子类。
+    """
+
+    name = "memory"
+
+    def __init__(self, home_simulator: "HomeSimulator"):
+        self.home_simulator = home_simulator
+        self.worker_id = WORKER_ID
+        self._reload_handlers: Dict[str, Callable[[], Awaitable[Any]]] = {}
+
+    @property
+    def is_primary(self) -> bool:
+        """是否为主进程：全局只需执行一次的任务（定时自动化、主动分析、保留策略）只在主进程执行"""
+        return True
+
+    def on_reload(self, kind: str, handler: Callable[[], Awaitable[Any]]):
+        """登记其他进程修改某类定义（如 scenes、automations）后的重新加载函数"""
+        self._reload_handlers[kind] = handler
+
+    async def notify_reload(self, kind: str):
+        """通知其他进程重新加载某类定义"""
+
+    async def connect(self):
+        """连接后端并确定本进程是否为主进程（在恢复设备之前调用，可重复调用）"""
+
+    async def start(self):
+        """开始同步"""
+
+    async def stop(self):
+        """停止同步"""
+
+    def stats(self) -> Dict[str, Any]:
+        """后端类型和同步统计"""
+        return {"backend": self.name, "worker_id": self.worker_id, "primary": self.is_primary}
+
+class SyncedStateBackend(StateBackend, ABC):
+    """多进程状态同步
+
+    本进程的设备事件写入共享的变更日志；其他进程写入的设备变更应用到本进程的
+    HomeSimulator，作为 remote 事件发布（不重复落盘和记录历史），重新加载通知
+    调用登记的重新加载函数。启动时先重放日志中保留的全部条目，补上状态历史
+    尚未落盘的变更（设备变更是绝对值，重放是幂等的）。
+
+    子类实现 _connect / _close / _append / _read_backlog / _run_listen。
+    """
+
+    def __init__(self, home_simulator: "HomeSimulator"):
+        super().__init__(home_simulator)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._connected = False
+        self.published_count = 0
+        self.applied_count = 0
+
+    async def connect(self):
+        """连接共享的变更日志并参与主进程选举"""
+        if not self._connected:
+            await self._connect()
+            self._connected = True
+
+    async def start(self):
+        """重放日志，订阅本地事件并开始监听其他进程的变更"""
+        if self._tasks:
+            return
+        await self.connect()
+        for entry in await self._read_backlog():
+            await self._apply(entry)
+        self._queue = self.home_simulator.event_bus.subscribe(queue_size=0, local_only=True)
+        self._tasks = [asyncio.create_task(self._run_publish()), asyncio.create_task(self._run_listen())]
+
+    async def stop(self):
+        """停止监听，写入剩余的本地事件"""
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._queue is not None:
+            events = []
+            while not self._queue.empty():
+                events.append(self._queue.get_nowait())
+            self.home_simulator.event_bus.unsubscribe(self._queue)
+            self._queue = None
+            if events:
+                await self._append([self._event_entry(event) for event in events])
+        if self._connected:
+            await self._close()
+            self._connected = False
+
+    async def notify_reload(self, kind: str):
+        """写入重新加载通知"""
+        await self._append([self._entry(kind, None, {}, datetime.now())])
+
+    async def _run_publish(self):
+        """把本地事件批量写入变更日志"""
+        while True:
+            events = [await self._queue.get()]
+            while not self._queue.empty():
+                events.append(self._queue.get_nowait())
+            try:
+                await self._append([self._event_entry(event) for event in events])
+                self.published_count += len(events)
+            except Exception as e:
+                print(f"❌ 状态同步写入失败: {e}")
+
+    async def _apply(self, entry: Dict[str, Any]):
+        """应用其他进程写入的日志条目"""
+        if entry["origin"] == self.worker_id:
+            return
+        if entry["kind"] == DEVICE_CHANGE:
+            await self.home_simulator.apply_remote_changes(
+                entry["device_id"], entry["changes"], entry["timestamp"], source=entry["source"]
+            )
+        else:
+            handler = self._reload_handlers.get(entry["kind"])
+            if handler is not None:
+                await handler()
+        self.applied_count += 1
+
+    def _entry(
+        self,
+        kind: str,
+        device_id: Optional[str],
+        changes: Dict[str, Any],
+        timestamp: datetime,
+        source: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return {
+            "origin": self.worker_id,
+            "kind": kind,
+            "device_id": device_id,
+            "changes": changes,
+            "timestamp": timestamp,
+            "source": source
+        }
+
+    def _event_entry(self, event: DeviceEvent) -> Dict[str, Any]:
+        return self._entry(DEVICE_CHANGE, event.device_id, event.changes, event.timestamp, event.source)
+
+    @abstractmethod
+    async def _connect(self):
+        """连接共享的变更日志"""
+
+    @abstractmethod
+    async def _close(self):
+        """断开连接"""
+
+    @abstractmethod
+    async def _append(self, entries: List[Dict[str, Any]]):
+        """追加日志条目"""
+
+    @abstractmethod
+    async def _read_backlog(self) -> List[Dict[str, Any]]:
+        """读取日志中保留的全部条目"""
+
+    @abstractmethod
+    async def _run_listen(self):
+        """持续读取其他进程写入的条目并调用 _apply"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "published": self.published_count,
+            "applied": self.applied_count
+        }
+
+class SQLiteStateBackend(SyncedStateBackend):
+    """共享SQLite数据库中的变更日志（state_changes 表）
+
+    用独立连接轮询 PRAGMA data_version，只有其他连接提交过才读取新的日志。
+    主进程由数据库文件旁的文件锁决定（主进程退出后由其他进程接替），
+    并负责删除超过保留时间的日志。适用于同一台机器上的多个工作进程。
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        home_simulator: "HomeSimulator",
+        poll_interval: float = STATE_SYNC_POLL_INTERVAL,
+        log_retention: float = STATE_SYNC_LOG_RETENTION
+    ):
+        super().__init__(home_simulator)
+        self.database = home_simulator.database
+        self.poll_interval = poll_interval
+        self.log_retention = log_retention
+        self._conn = None
+        self._data_version: Optional[int] = None
+        self._last_seq = 0
+        self._lock_file = None
+        self._last_trim = 0.0
+
+    @property
+    def is_primary(self) -> bool:
+        return fcntl is None or self._lock_file is not None
+
+    async def _connect(self):
+        self._conn = await asyncio.to_thread(self.database.database._connect)
+        # 先记录版本号再读取日志，两者之间的提交会在第一次轮询时读到
+        self._data_version = await asyncio.to_thread(self._read_data_version)
+        self._try_acquire_primary()
+
+    async def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _try_acquire_primary(self):
+        """非阻塞地尝试获取主进程文件锁"""
+        if fcntl is None or self._lock_file is not None:
+            return
+        lock_file = open(f"{self.database.database.db_path}.primary.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        self._lock_file = lock_file
+
+    async def _append(self, entries: List[Dict[str, Any]]):
+        await self.database.append_state_changes([
+            (entry["origin"], entry["kind"], entry["device_id"],
+             json.dumps(entry["changes"]), entry["timestamp"].isoformat(), entry["source"])
+            for entry in entries
+        ])
+
+    async def _read_new(self) -> List[Dict[str, Any]]:
+        """读取序号大于上次读取位置的全部日志"""
+        entries = []
+        while True:
+            rows = await self.database.get_state_changes(self._last_seq, STATE_SYNC_READ_BATCH)
+            for row in rows:
+                entries.append({
+                    "origin": row["origin"],
+                    "kind": row["kind"],
+                    "device_id": row["device_id"],
+                    "changes": json.loads(row["changes"]) if row["changes"] else {},
+                    "timestamp": datetime.fromisoformat(row["timestamp"]),
+                    "source": row["source"]
+                })
+            if rows:
+                self._last_seq = rows[-1]["seq"]
+            if len(rows) < STATE_SYNC_READ_BATCH:
+                return entries
+
+    async def _read_backlog(self) -> List[Dict[str, Any]]:
+        return await self._read_new()
+
+    async def _run_listen(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                data_version = await asyncio.to_thread(self._read_data_version)
+                if data_version != self._data_version:
+                    self._data_version = data_version
+                    for entry in await self._read_new():
+                        await self._apply(entry)
+
+                now = time.monotonic()
+                if now - self._last_trim >= min(self.log_retention / 10, 60):
+                    self._last_trim = now
+                    self._try_acquire_primary()
+                    if self.is_primary:
+                        cutoff = (datetime.now() - timedelta(seconds=self.log_retention)).isoformat()
+                        await self.database.trim_state_changes(cutoff)
+            except Exception as e:
+                print(f"❌ 状态同步读取失败: {e}")
+
+class RedisStateBackend(SyncedStateBackend):
+    """Redis Stream 作为变更日志
+
+    适用于跨机器部署，也可以使用兼容Redis协议的本地替代服务。每个家庭一个
+    Stream（保留最近的条目），XREAD 阻塞等待新条目；主进程通过带过期时间的
+    键（SET NX PX）选举并定期续约。需要安装 redis 包。
+    """
+
+    name = "redis"
+    STREAM_MAXLEN = 10000
+
+    def __init__(
+        self,
+        home_simulator: "HomeSimulator",
+        url: str = REDIS_URL,
+        key_prefix: str = REDIS_KEY_PREFIX,
+        primary_ttl: float = STATE_SYNC_PRIMARY_TTL
+    ):
+        super().__init__(home_simulator)
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise ValueError("❌ STATE_BACKEND=redis 需要安装 redis 包: pip install redis")
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        home_key = f"{key_prefix}:{home_simulator.home_id or 'default'}"
+        self._stream = f"{home_key}:changes"
+        self._primary_key = f"{home_key}:primary"
+        self.primary_ttl = primary_ttl
+        self._primary = False
+        self._last_renewal = 0.0
+        self._last_id = "0-0"
+
+    @property
+    def is_primary(self) -> bool:
+        return self._primary
+
+    async def _connect(self):
+        await self._redis.ping()
+        await self._renew_primary()
+
+    async def _close(self):
+        if self._primary and await self._redis.get(self._primary_key) == self.worker_id:
+            await self._redis.delete(self._primary_key)
+        self._primary = False
+        await self._redis.aclose()
+
+    async def _renew_primary(self):
+        """获取或续约主进程租约"""
+        self._last_renewal = time.monotonic()
+        ttl = int(self.primary_ttl * 1000)
+        if self._primary and await self._redis.get(self._primary_key) == self.worker_id:
+            await self._redis.pexpire(self._primary_key, ttl)
+        else:
+            self._primary = bool(await self._redis.set(self._primary_key, self.worker_id, nx=True, px=ttl))
+
+    async def _append(self, entries: List[Dict[str, Any]]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for entry in entries:
+                pipe.xadd(self._stream, {
+                    "origin": entry["origin"],
+                    "kind": entry["kind"],
+                    "device_id": entry["device_id"] or "",
+                    "changes": json.dumps(entry["changes"]),
+                    "timestamp": entry["timestamp"].isoformat(),
+                    "source": entry["source"] or ""
+                }, maxlen=self.STREAM_MAXLEN, approximate=True)
+            await pipe.execute()
+
+    @staticmethod
+    def _decode(fields: Dict[str, str]) -> Dict[str, Any]:
+        return {
+            "origin": fields["origin"],
+            "kind": fields["kind"],
+            "device_id": fields["device_id"] or None,
+            "changes": json.loads(fields["changes"]),
+            "timestamp": datetime.fromisoformat(fields["timestamp"]),
+            "source": fields.get("source") or None
+        }
+
+    async def _read_backlog(self) -> List[Dict[str, Any]]:
+        messages = await self._redis.xrange(self._stream, "-", "+")
+        if messages:
+            self._last_id = messages[-1][0]
+        return [self._decode(fields) for _, fields in messages]
+
+    async def _run_listen(self):
+        block = int(self.primary_ttl * 1000 / 3)
+        while True:
+            try:
+                if time.monotonic() - self._last_renewal >= self.primary_ttl / 3:
+                    await self._renew_primary()
+                result = await self._redis.xread({self._stream: self._last_id}, count=1000, block=block)
+                for _, messages in result or []:
+                    for message_id, fields in messages:
+                        self._last_id = message_id
+                        await self._apply(self._decode(fields))
+            except Exception as e:
+                self._primary = False
+                print(f"❌ 状态同步读取失败: {e}")
+                await asyncio.sleep(1)
+
+STATE_BACKENDS = {
+    "memory": StateBackend,
+    "sqlite": SQLiteStateBackend,
+    "redis": RedisStateBackend,
+}
+
+def create_state_backend(home_simulator: "HomeSimulator", kind: str = STATE_BACKEND) -> StateBackend:
+    """按配置创建状态后端"""
+    backend = STATE_BACKENDS.get(kind)
+    if backend is None:
+        raise ValueError(f"未知的状态后端: {kind}")
+    return backend(home_simulator)
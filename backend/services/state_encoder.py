@@ -0,0 +1,89 @@
+import os
+from typing import Dict, List
+
+from models.devices import (
+    Device, SensorDevice, LightDevice, ACDevice,
+    DeviceStatus, SensorType, Room, HomeState, ROOM_NAMES
+)
+
+# minimal: 只列出开启的设备和传感器读数（未列出的设备即为关闭）；compact: 每个设备一项，只带相关属性；full: 完整的模型repr
+STATE_VERBOSITY_LEVELS = ("minimal", "compact", "full")
+AGENT_STATE_VERBOSITY = os.getenv("AGENT_STATE_VERBOSITY", "compact")
+
+def encode_home_state(home_state: HomeState, verbosity: str = AGENT_STATE_VERBOSITY) -> str:
+    """将家居状态编码为节省token的提示词文本
+
+    按房间每行输出一条记录，例如：
+        时间 14:30
+        卧室(有人): light_bedroom=on(亮度80); ac_bedroom=off; sensor_bedroom_temp=25.5°C
+        客厅(无人): light_living=on(亮度90); sensor_living_motion=无人
+
+    不输出 created_at、last_updated 以及与当前状态无关的默认属性
+    （如关闭的灯的亮度、关闭的空调的设定温度）。
+
+    Args:
+        home_state: 家居状态对象
+        verbosity: minimal / compact / full
+
+    Returns:
+        str: 状态描述文本
+    """
+    if verbosity not in STATE_VERBOSITY_LEVELS:
+        raise ValueError(f"未知的状态描述详细程度: {verbosity}")
+    if verbosity == "full":
+        return str(home_state)
+
+    devices_by_room: Dict[Room, List[Device]] = {}
+    for device in home_state.devices:
+        devices_by_room.setdefault(device.room, []).append(device)
+
+    lines = [f"时间 {home_state.timestamp.strftime('%H:%M')}"]
+    for room in Room:
+        devices = devices_by_room.get(room)
+        if not devices:
+            continue
+
+        entries = [
+            _encode_device(device)
+            for device in sorted(devices, key=lambda d: d.id)
+            if verbosity != "minimal" or isinstance(device, SensorDevice) or device.status == DeviceStatus.ON
+        ]
+
+        occupancy = "有人" if home_state.room_occupancy.get(room) else "无人"
+        line = f"{ROOM_NAMES.get(room, room.value)}({occupancy})"
+        lines.append(f"{line}: {'; '.join(entries)}" if entries else line)
+
+    return "\n".join(lines)
+
+def _encode_device(device: Device) -> str:
+    """编码单个设备：id=状态(相关属性)"""
+    if isinstance(device, SensorDevice):
+        return f"{device.id}={_encode_sensor_value(device)}"
+
+    details = []
+    if device.status == DeviceStatus.ON:
+        if isinstance(device, LightDevice):
+            details.append(f"亮度{device.brightness}")
+        elif isinstance(device, ACDevice):
+            details.append(f"{_format_number(device.temperature)}°C {device.mode} 风速{device.fan_speed}")
+
+    encoded = f"{device.id}={device.status.value}"
+    if details:
+        encoded += f"({' '.join(details)})"
+    return encoded
+
+def _encode_sensor_value(sensor: SensorDevice) -> str:
+    """编码传感器读数"""
+    if sensor.status != DeviceStatus.ON or sensor.value is None:
+        return "无读数"
+    if sensor.sensor_type == SensorType.MOTION:
+        return "有人" if sensor.value == 1 else "无人"
+    if sensor.sensor_type == SensorType.DOOR:
+        return "开" if sensor.value == 1 else "关"
+
+    unit = sensor.unit if sensor.unit and sensor.unit != "boolean" else ""
+    return f"{_format_number(sensor.value)}{unit}"
+
+def _format_number(value: float) -> str:
+    """保留最多两位小数并去掉末尾的0"""
+    return f"{round(value, 2):g}" if isinstance(value, float) else str(value)
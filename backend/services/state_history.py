@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from models.devices import (
+    Device, SensorDevice, LightDevice, ACDevice,
+    DeviceType, SensorType, Room, HomeState
+)
+
+if TYPE_CHECKING:
+    from services.home_simulator import HomeSimulator
+
+STATE_KEYFRAME_INTERVAL = float(os.getenv("STATE_KEYFRAME_INTERVAL", 3600))  # 秒，两个完整快照的最长间隔
+STATE_KEYFRAME_MAX_CHANGES = int(os.getenv("STATE_KEYFRAME_MAX_CHANGES", 5000))  # 两个快照之间最多的变更条数
+STATE_HISTORY_FLUSH_INTERVAL = float(os.getenv("STATE_HISTORY_FLUSH_INTERVAL", 1.0))  # 秒
+
+DEVICE_MODELS = {
+    DeviceType.LIGHT: LightDevice,
+    DeviceType.AC: ACDevice,
+    DeviceType.SENSOR: SensorDevice,
+}
+
+class StateHistory:
+    """基于变更日志的家居状态历史
+
+    设备事件以增量（只含变化字段）批量写入 device_changes，完整快照（关键帧）
+    只在启动、停止、设备增删、距上次快照超过 keyframe_interval 秒或累计
+    keyframe_max_changes 条变更时写入 home_states。
+    任意时刻的状态 = 该时刻之前最近的关键帧 + 其后的增量。
+    多进程部署时每个进程写入自己的增量，关键帧只由主进程写入：其他进程内存中的状态
+    可能还没同步到最新（启动时还可能是默认设备），写入的关键帧会覆盖之前的变更。
+    """
+
+    def __init__(
+        self,
+        home_simulator: "HomeSimulator",
+        keyframe_interval: float = STATE_KEYFRAME_INTERVAL,
+        keyframe_max_changes: int = STATE_KEYFRAME_MAX_CHANGES,
+        flush_interval: float = STATE_HISTORY_FLUSH_INTERVAL
+    ):
+        self.home_simulator = home_simulator
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_max_changes = keyframe_max_changes
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._changes_since_keyframe = 0
+        self._last_keyframe_time = 0.0
+        self._keyframe_registry_version = -1
+
+    async def start(self):
+        """订阅设备事件，写入初始关键帧并启动后台写入任务"""
+        if self._task is None:
+            # 历史记录不能丢事件，使用无界队列；其他进程的变更由该进程自己记录
+            self._queue = self.home_simulator.event_bus.subscribe(queue_size=0, local_only=True)
+            await self.write_keyframe()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务，写入剩余变更和最终关键帧"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            await self.flush()
+            await self.write_keyframe()
+            self.home_simulator.event_bus.unsubscribe(self._queue)
+            self._queue = None
+
+    async def _run(self):
+        """定期写入变更"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ 状态历史写入失败: {e}")
+
+    async def flush(self):
+        """将队列中的事件作为增量写入，必要时写入新的关键帧"""
+        async with self._flush_lock:
+            rows = []
+            while self._queue is not None and not self._queue.empty():
+                event = self._queue.get_nowait()
+                rows.append((
+                    event.timestamp.isoformat(),
+                    event.device_id,
+                    json.dumps(event.changes)
+                ))
+
+            if rows:
+                await self.home_simulator.database.save_device_changes(rows)
+                self._changes_since_keyframe += len(rows)
+
+            if not self.home_simulator.state_backend.is_primary:
+                return
+            if (self._changes_since_keyframe >= self.keyframe_max_changes
+                    or time.monotonic() - self._last_keyframe_time >= self.keyframe_interval
+                    or self.home_simulator.registry_version != self._keyframe_registry_version):
+                await self._write_keyframe_unlocked()
+
+    async def write_keyframe(self):
+        """立即写入当前状态的完整快照（只在主进程写入）"""
+        async with self._flush_lock:
+            if self.home_simulator.state_backend.is_primary:
+                await self._write_keyframe_unlocked()
+
+    async def _write_keyframe_unlocked(self):
+        await self.home_simulator._save_current_state()
+        self._changes_since_keyframe = 0
+        self._last_keyframe_time = time.monotonic()
+        self._keyframe_registry_version = self.home_simulator.registry_version
+
+    async def get_state_at(self, at: datetime) -> Optional[HomeState]:
+        """重建指定时刻的家居状态
+
+        Returns:
+            Optional[HomeState]: 该时刻之前没有任何快照时返回None
+        """
+        if self._queue is not None:
+            await self.flush()
+
+        until = at.isoformat()
+        keyframe = await self.home_simulator.database.get_latest_home_state(until)
+        if keyframe is None:
+            return None
+
+        devices: Dict[str, Dict[str, Any]] = {
+            data["id"]: data for data in json.loads(keyframe["devices_data"])
+        }
+        for change in await self.home_simulator.database.get_device_changes(keyframe["timestamp"], until):
+            data = devices.get(change["device_id"])
+            if data is not None:
+                data.update(json.loads(change["changes"]))
+                data["last_updated"] = change["timestamp"]
+
+        device_models = [self._device_from_dict(data) for data in devices.values()]
+        room_occupancy = {room: False for room in Room}
+        for device in device_models:
+            if isinstance(device, SensorDevice) and device.sensor_type == SensorType.MOTION and device.value == 1:
+                room_occupancy[device.room] = True
+
+        return HomeState(
+            devices=device_models,
+            timestamp=at,
+            room_occupancy=room_occupancy,
+            summary=self.home_simulator._generate_state_summary(room_occupancy)
+        )
+
+    @staticmethod
+    def _device_from_dict(data: Dict[str, Any]) -> Device:
+        """根据设备类型还原设备模型"""
+        model = DEVICE_MODELS.get(DeviceType(data["type"]), Device)
+        return model(**data)
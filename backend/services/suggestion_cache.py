@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from models.agent import AgentSuggestion
+from models.devices import HomeState
+
+SUGGESTION_CACHE_TTL = float(os.getenv("SUGGESTION_CACHE_TTL", 300))  # 秒
+SUGGESTION_CACHE_SIZE = int(os.getenv("SUGGESTION_CACHE_SIZE", 128))
+SUGGESTION_CACHE_PRECISION = int(os.getenv("SUGGESTION_CACHE_PRECISION", 0))  # 传感器数值保留的小数位
+
+class SuggestionCache:
+    """主动建议的响应缓存
+
+    以家居状态指纹为键缓存解析后的建议，带过期时间和LRU淘汰。
+    指纹只包含影响建议的字段：设备状态与属性（数值按精度取整）和房间占用，
+    不包含时间戳，因此同一状态重复分析时不再调用LLM，也不会重复执行同一条建议。
+    """
+
+    def __init__(
+        self,
+        ttl: float = SUGGESTION_CACHE_TTL,
+        max_size: int = SUGGESTION_CACHE_SIZE,
+        precision: int = SUGGESTION_CACHE_PRECISION
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.precision = precision
+        self._entries: "OrderedDict[str, Tuple[float, AgentSuggestion]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, home_state: HomeState) -> str:
+        """计算家居状态的规范化指纹"""
+        devices = [
+            [device.id, device.status.value, self._canonical(device.properties)]
+            for device in sorted(home_state.devices, key=lambda d: d.id)
+        ]
+        occupancy = sorted(room.value for room, occupied in home_state.room_occupancy.items() if occupied)
+        payload = json.dumps([devices, occupancy], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _canonical(self, value: Any) -> Any:
+        """浮点数按精度取整，使细微的传感器波动得到相同指纹"""
+        if isinstance(value, float):
+            rounded = round(value, self.precision)
+            return int(rounded) if self.precision <= 0 else rounded
+        if isinstance(value, dict):
+            return {key: self._canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._canonical(item) for item in value]
+        return value
+
+    def get(self, key: str) -> Optional[AgentSuggestion]:
+        """获取未过期的缓存建议"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, suggestion = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return suggestion
+
+    def put(self, key: str, suggestion: AgentSuggestion):
+        """缓存建议，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = (time.monotonic() + self.ttl, suggestion)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
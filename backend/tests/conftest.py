@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# 在导入后端模块之前配置环境：全局数据库放在临时目录，不启动模拟和LLM
+_TEST_DIR = tempfile.mkdtemp(prefix="active-hass-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'smart_home.db')}")
+os.environ.setdefault("HOME_DATA_DIR", os.path.join(_TEST_DIR, "homes"))
+os.environ.setdefault("LLM_PROVIDER", "synthetic")
+os.environ["SIMULATION_ENABLED"] = "False"
+os.environ["STATE_BACKEND"] = "memory"
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database.database import AsyncDatabase, Database
+from services.home_simulator import HomeSimulator
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def database(tmp_path):
+    """每个测试独立的数据库"""
+    db = Database(str(tmp_path / "test.db"))
+    db.init_tables()
+    async_database = AsyncDatabase(db, read_workers=1)
+    yield async_database
+    async_database.shutdown()
+    db.close()
+
+@pytest.fixture
+async def home(database):
+    """使用默认家庭设备的模拟器"""
+    simulator = HomeSimulator(database)
+    await simulator.initialize()
+    yield simulator
+    await simulator.stop()
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from models.devices import DeviceStatus
+from services.home_simulator import HomeSimulator
+
+pytestmark = pytest.mark.anyio
+
+async def test_restart_restores_last_state(database):
+    first = HomeSimulator(database)
+    await first.initialize()
+    await first.update_device("light_kitchen", DeviceStatus.ON, {"brightness": 15})
+    await first.stop()
+
+    second = HomeSimulator(database)
+    await second.initialize()
+    try:
+        assert second.devices["light_kitchen"].status == DeviceStatus.ON
+        assert second.devices["light_kitchen"].brightness == 15
+    finally:
+        await second.stop()
+
+async def test_reload_during_eviction_waits_for_flush(tmp_path):
+    from services.home_registry import HomeRegistry
+
+    registry = HomeRegistry(data_dir=str(tmp_path / "homes"), sweep_interval=3600)
+    await registry.start()
+    try:
+        home = await registry.get("guest")
+        await home.home_simulator.update_device("light_kitchen", DeviceStatus.ON, {"brightness": 33})
+
+        # 拖慢旧实例的最终落盘，让重新加载落在卸载过程中
+        history_stop = home.home_simulator.history.stop
+
+        async def slow_history_stop():
+            await asyncio.sleep(0.2)
+            await history_stop()
+
+        home.home_simulator.history.stop = slow_history_stop
+        evicting = asyncio.create_task(registry.evict("guest"))
+        await asyncio.sleep(0)
+        reloaded = await registry.get("guest")
+        assert await evicting
+        assert reloaded is not home
+        assert reloaded.home_simulator.devices["light_kitchen"].brightness == 33
+        assert registry.stats()["evicting"] == 0
+    finally:
+        await registry.close()
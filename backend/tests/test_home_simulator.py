@@ -0,0 +1,66 @@
+import pytest
+
+from models.devices import DeviceCommand, DeviceStatus, DeviceType, Room
+
+pytestmark = pytest.mark.anyio
+
+async def test_update_devices_atomic_rejects_whole_batch(home):
+    brightness = home.devices["light_living"].brightness
+    results = await home.update_devices({
+        "light_living": {"status": "off", "properties": {"brightness": 5}},
+        "missing_device": {"status": "on"},
+    })
+
+    assert [result["success"] for result in results] == [False, False]
+    assert results[1]["message"] == "设备不存在"
+    assert home.devices["light_living"].brightness == brightness
+
+async def test_update_devices_non_atomic_skips_invalid(home):
+    results = await home.update_devices({
+        "light_living": {"status": "off"},
+        "light_kitchen": {"status": "dimmed"},
+        "missing_device": {"status": "on"},
+    }, atomic=False)
+
+    assert [result["success"] for result in results] == [True, False, False]
+    assert home.devices["light_living"].status == DeviceStatus.OFF
+    stored = await home.database.get_device("light_living")
+    assert stored["status"] == "off"
+
+async def test_update_devices_ignores_unsupported_properties(home):
+    results = await home.update_devices({
+        "ac_bedroom": {"properties": {"temperature": 23, "brightness": 50}},
+    })
+
+    assert results[0]["success"]
+    assert "brightness" in results[0]["message"]
+    assert home.devices["ac_bedroom"].temperature == 23
+
+async def test_compile_commands_applies_properties_to_supporting_devices(home):
+    plan = home.compile_commands([
+        DeviceCommand(room=Room.BEDROOM, properties={"brightness": 30}),
+    ])
+    assert plan == {"light_bedroom": {"properties": {"brightness": 30}}}
+
+    plan = home.compile_commands([
+        DeviceCommand(type=DeviceType.LIGHT, status=DeviceStatus.OFF),
+        DeviceCommand(device_id="light_kitchen", status=DeviceStatus.ON),
+    ])
+    assert set(plan) == {device.id for device in home.get_devices_by_type(DeviceType.LIGHT)}
+    assert plan["light_kitchen"] == {"status": "on"}
+
+async def test_summary_etag_covers_whole_body(home):
+    summary = home.get_devices_summary()
+    etag = home.get_devices_summary_etag()
+    assert "version" not in summary
+
+    await home.update_device("light_living", DeviceStatus.OFF)
+    await home.update_device("light_living", DeviceStatus.ON)
+    await home.update_device("light_living", DeviceStatus.OFF)
+    await home.update_device("light_living", DeviceStatus.ON)
+    # 版本号变了但统计相同：响应体和ETag都不变
+    assert home.get_devices_summary() == summary
+    assert home.get_devices_summary_etag() == etag
+
+    await home.update_device("light_living", DeviceStatus.OFF if summary["by_room"]["living_room"]["on"] else DeviceStatus.ON)
+    assert home.get_devices_summary_etag() != etag
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from models.devices import AGENT_EVENT_SOURCE, DeviceStatus
+from services.proactive_monitor import ProactiveMonitor
+
+pytestmark = pytest.mark.anyio
+
+class RecordingAgent:
+    """只记录分析次数的智能体"""
+
+    def __init__(self):
+        self.analyzed = 0
+
+    def suggestion_cooldown_remaining(self) -> float:
+        return 0.0
+
+    async def analyze_home_state(self, home_state):
+        self.analyzed += 1
+
+async def wait_for_count(get_count, expected, timeout=1.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while get_count() < expected and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    return get_count()
+
+async def test_update_devices_tags_events_with_source(home):
+    queue = home.event_bus.subscribe(queue_size=0)
+    await home.update_devices({"light_living": {"status": "off"}, "light_kitchen": {"status": "on"}}, source="agent")
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+    home.event_bus.unsubscribe(queue)
+
+    assert events
+    assert {event.source for event in events} == {"agent"}
+
+async def test_agent_events_do_not_trigger_analysis(home):
+    agent = RecordingAgent()
+    monitor = ProactiveMonitor(agent, home, debounce=0.01, max_delay=0.05)
+    await monitor.start()
+    try:
+        await home.update_device("light_living", DeviceStatus.OFF, source=AGENT_EVENT_SOURCE)
+        await asyncio.sleep(0.1)
+        assert agent.analyzed == 0
+
+        await home.update_device("light_living", DeviceStatus.ON)
+        assert await wait_for_count(lambda: agent.analyzed, 1) == 1
+    finally:
+        await monitor.stop()
+
+async def test_non_numeric_sensor_value_does_not_stop_monitor(home):
+    agent = RecordingAgent()
+    monitor = ProactiveMonitor(agent, home, debounce=0.01, max_delay=0.05)
+    await monitor.start()
+    try:
+        await home.update_device("sensor_bedroom_temp", properties={"value": "on"})
+        assert await wait_for_count(lambda: agent.analyzed, 1) == 1
+
+        await home.update_device("sensor_bedroom_temp", properties={"value": 40.0})
+        assert await wait_for_count(lambda: agent.analyzed, 2) == 2
+        assert not monitor._task.done()
+    finally:
+        await monitor.stop()
@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.agent import AgentMessage, MessageRole
+from models.devices import DeviceStatus
+from services.retention import RetentionManager
+
+pytestmark = pytest.mark.anyio
+
+async def test_state_history_keeps_keyframe_before_cutoff(home):
+    await home.update_device("light_living", properties={"brightness": 10})
+    await home.history.flush()
+    await asyncio.sleep(0.01)
+    await home.history.write_keyframe()
+    keyframe_time = datetime.now()
+    await asyncio.sleep(0.01)
+    await home.update_device("light_living", properties={"brightness": 90})
+    await home.history.flush()
+    expected = await home.history.get_state_at(datetime.now())
+
+    retention = RetentionManager(home.database, state_history_days=30, message_days=0, sensor_raw_days=0)
+    moved = await retention.compact(now=keyframe_time + timedelta(days=30))
+
+    # 初始关键帧和第一次变更被归档，截止时间之前最近的关键帧保留
+    assert moved["home_states"] == 1
+    assert moved["device_changes"] == 1
+    archived = await home.database.read_archive("device_changes", (keyframe_time - timedelta(minutes=1)).isoformat(), keyframe_time.isoformat())
+    assert [row["device_id"] for row in archived] == ["light_living"]
+
+    state = await home.history.get_state_at(datetime.now())
+    assert [device.dict() for device in state.devices] == [device.dict() for device in expected.devices]
+
+async def test_sensor_readings_expire_but_rollups_remain(home):
+    old = datetime(2030, 1, 1, 8, 0)
+    for i, value in enumerate([20.0, 21.0, 22.0]):
+        await home.update_device("sensor_bedroom_temp", properties={"value": value}, timestamp=old + timedelta(seconds=i))
+    await home.sensor_history.flush()
+
+    retention = RetentionManager(home.database, sensor_raw_days=7, message_days=0, state_history_days=0, archive=False)
+    moved = await retention.compact(now=old + timedelta(days=8))
+    assert moved["sensor_readings"] >= 3
+
+    raw = await home.sensor_history.query("sensor_bedroom_temp", old, old + timedelta(minutes=1), step="raw")
+    assert raw["points"] == []
+    rollup = await home.sensor_history.query("sensor_bedroom_temp", old, old + timedelta(minutes=1), step="1m")
+    assert rollup["points"][0]["count"] == 3
+    assert await home.database.read_archive("sensor_readings", old.isoformat(), (old + timedelta(days=1)).isoformat()) == []
+
+async def test_old_messages_are_archived(database):
+    now = datetime(2030, 6, 1, 12, 0)
+    for content, age in [("旧消息", 40), ("新消息", 1)]:
+        await database.save_message(AgentMessage(
+            id=str(uuid.uuid4()), role=MessageRole.USER, content=content, timestamp=now - timedelta(days=age)
+        ))
+
+    retention = RetentionManager(database, message_days=30, state_history_days=0, sensor_raw_days=0)
+    assert await retention.compact(now=now) == {"agent_messages": 1}
+    assert [message["content"] for message in await database.get_recent_messages(10)] == ["新消息"]
+    assert [row["content"] for row in await database.read_archive("agent_messages", (now - timedelta(days=60)).isoformat(" "), now.isoformat(" "))] == ["旧消息"]
+
+async def test_zero_days_keeps_everything(database):
+    retention = RetentionManager(database, message_days=0, state_history_days=0, sensor_raw_days=0)
+    assert await retention.compact() == {}
+
+@pytest.mark.parametrize("table", ["agent_messages", "home_states", "device_changes", "sensor_readings"])
+def test_archive_batch_uses_time_index(tmp_path, table):
+    from database.database import ARCHIVE_TABLES, Database
+
+    db = Database(str(tmp_path / "plan.db"))
+    db.init_tables()
+    column = ARCHIVE_TABLES[table]
+    plan = " ".join(row["detail"] for row in db.get_connection().execute(
+        f"EXPLAIN QUERY PLAN SELECT rowid, * FROM {table} WHERE {column} < ? ORDER BY {column} LIMIT ?", ("", 1)
+    ))
+    db.close()
+    assert "USING INDEX" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from models.devices import ACDevice, DeviceStatus, HomeState, LightDevice, Room, SensorDevice, SensorType
+from services.rule_engine import RuleEngine
+
+def make_state(light_age, motion_age=None, motion_value=0):
+    """卧室里一盏开着的灯，可选一个人体传感器；age 为距上次更新的秒数"""
+    now = datetime.now()
+    devices = [
+        LightDevice(id="light_bedroom", name="卧室灯", type="light", room=Room.BEDROOM, status=DeviceStatus.ON,
+                    last_updated=now - timedelta(seconds=light_age), created_at=now),
+    ]
+    if motion_age is not None:
+        devices.append(SensorDevice(
+            id="sensor_bedroom_motion", name="卧室人体感应器", type="sensor", room=Room.BEDROOM, status=DeviceStatus.ON,
+            sensor_type=SensorType.MOTION, value=motion_value,
+            last_updated=now - timedelta(seconds=motion_age), created_at=now
+        ))
+    return HomeState(devices=devices, timestamp=now, room_occupancy={Room.BEDROOM: motion_value == 1}, summary="")
+
+def matched_rules(state):
+    return [rule.name for rule, _ in RuleEngine(unmatched="ignore").evaluate(state)]
+
+def test_empty_room_held_for_counts_from_vacancy():
+    # 灯刚调过亮度，但房间已经空了两分钟
+    assert matched_rules(make_state(light_age=5, motion_age=120)) == ["light_on_empty_room"]
+    # 灯开了很久，但人刚离开
+    assert matched_rules(make_state(light_age=3600, motion_age=10)) == []
+
+def test_occupied_room_does_not_match_empty_room_rules():
+    assert matched_rules(make_state(light_age=3600, motion_age=3600, motion_value=1)) == []
+
+def test_room_without_motion_sensor_uses_device_time():
+    assert matched_rules(make_state(light_age=120)) == ["light_on_empty_room"]
+    assert matched_rules(make_state(light_age=5)) == []
+
+def test_decide_without_llm_builds_suggestion():
+    engine = RuleEngine(unmatched="ignore")
+    needs_llm, suggestion = engine.decide(make_state(light_age=5, motion_age=120))
+    assert not needs_llm
+    assert suggestion.suggested_actions == {"light_bedroom": {"status": "off"}}
+
+def test_unmatched_state_skips_llm_by_default():
+    # 灯刚调过、人还在：没有规则命中
+    state = make_state(light_age=5, motion_age=5, motion_value=1)
+    assert RuleEngine().decide(state) == (False, None)
+    # 用户主动请求分析时交给LLM
+    assert RuleEngine().decide(state, unmatched="llm") == (True, None)
+    assert RuleEngine(unmatched="llm").decide(state) == (True, None)
+
+def make_hot_room(ac_status):
+    """有人且温度30度的卧室和一台空调"""
+    now = datetime.now()
+    devices = [
+        ACDevice(id="ac_bedroom", name="卧室空调", type="air_conditioner", room=Room.BEDROOM, status=ac_status,
+                 last_updated=now, created_at=now),
+        SensorDevice(id="sensor_bedroom_temp", name="卧室温度", type="sensor", room=Room.BEDROOM, status=DeviceStatus.ON,
+                     sensor_type=SensorType.TEMPERATURE, value=30, last_updated=now, created_at=now),
+    ]
+    return HomeState(devices=devices, timestamp=now, room_occupancy={Room.BEDROOM: True}, summary="")
+
+def test_rules_leave_devices_the_user_just_changed():
+    engine = RuleEngine(user_hold=1800)
+    state = make_hot_room(DeviceStatus.OFF)
+    assert [rule.name for rule, _ in engine.evaluate(state)] == ["hot_occupied_room"]
+
+    # 用户刚关掉空调：不再自动打开
+    just_now = {"ac_bedroom": state.timestamp - timedelta(seconds=30)}
+    assert engine.evaluate(state, just_now) == []
+    assert engine.decide(state, user_changes=just_now) == (False, None)
+    # 超过保持时间后恢复
+    long_ago = {"ac_bedroom": state.timestamp - timedelta(seconds=3600)}
+    assert [rule.name for rule, _ in engine.evaluate(state, long_ago)] == ["hot_occupied_room"]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SENSOR_ID = "sensor_bedroom_temp"
+
+async def record(home, start, values, interval=timedelta(seconds=20)):
+    """按固定间隔写入一组读数"""
+    for i, value in enumerate(values):
+        await home.update_device(SENSOR_ID, properties={"value": value}, timestamp=start + i * interval)
+
+async def test_query_raw_returns_readings_in_range(home):
+    start = datetime(2030, 1, 1, 8, 0)
+    await record(home, start, [20.0, 21.0, 22.0, 23.0])
+
+    result = await home.sensor_history.query(SENSOR_ID, start + timedelta(seconds=10), start + timedelta(seconds=45), step="raw")
+    assert result["step"] == "raw"
+    assert [point["value"] for point in result["points"]] == [21.0, 22.0]
+
+async def test_query_rollup_aggregates_buckets(home):
+    start = datetime(2030, 1, 1, 8, 0)
+    # 前三个读数在 08:00，后三个在 08:01
+    await record(home, start, [20.0, 22.0, 24.0, 30.0, 31.0, 32.0])
+
+    result = await home.sensor_history.query(SENSOR_ID, start + timedelta(seconds=30), start + timedelta(minutes=2), step="1m")
+    points = result["points"]
+    # 起点所在的时间桶也包含在内
+    assert [point["timestamp"] for point in points] == ["2030-01-01T08:00:00", "2030-01-01T08:01:00"]
+    assert (points[0]["min"], points[0]["max"], points[0]["avg"], points[0]["count"]) == (20.0, 24.0, 22.0, 3)
+    assert (points[1]["min"], points[1]["max"], points[1]["avg"], points[1]["count"]) == (30.0, 32.0, 31.0, 3)
+
+    hourly = await home.sensor_history.query(SENSOR_ID, start, start + timedelta(hours=1), step="1h")
+    assert len(hourly["points"]) == 1
+    assert hourly["points"][0]["count"] == 6
+
+async def test_query_picks_step_from_span(home):
+    now = datetime.now()
+    assert (await home.sensor_history.query(SENSOR_ID, now - timedelta(hours=1), now))["step"] == "1m"
+    assert (await home.sensor_history.query(SENSOR_ID, now - timedelta(days=2), now))["step"] == "1h"
+    assert (await home.sensor_history.query(SENSOR_ID, now - timedelta(days=60), now))["step"] == "1d"
+
+async def test_query_rejects_unknown_step(home):
+    now = datetime.now()
+    with pytest.raises(ValueError):
+        await home.sensor_history.query(SENSOR_ID, now - timedelta(hours=1), now, step="5m")
+
+async def test_restart_does_not_duplicate_readings(database):
+    from services.home_simulator import HomeSimulator
+
+    start = datetime.now()
+    first = HomeSimulator(database)
+    await first.initialize()
+    await first.update_device(SENSOR_ID, properties={"value": 21.5})
+    await first.stop()
+
+    second = HomeSimulator(database)
+    await second.initialize()
+    try:
+        result = await second.sensor_history.query(SENSOR_ID, start, datetime.now(), step="raw")
+        assert [point["value"] for point in result["points"]] == [21.5]
+    finally:
+        await second.stop()
+
+async def test_non_numeric_values_are_skipped(home):
+    start = datetime(2030, 1, 1, 8, 0)
+    await record(home, start, [20.0, "on", None, 22.0])
+
+    result = await home.sensor_history.query(SENSOR_ID, start, start + timedelta(minutes=1), step="raw")
+    assert [point["value"] for point in result["points"]] == [20.0, 22.0]
@@ -0,0 +1,70 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from models.devices import DeviceStatus, USER_EVENT_SOURCE
+
+pytestmark = pytest.mark.anyio
+
+async def test_only_primary_writes_default_devices(database):
+    from services.home_simulator import HomeSimulator
+    from services.state_backend import create_state_backend
+
+    def synced(simulator, worker_id):
+        simulator.state_backend = create_state_backend(simulator, "sqlite")
+        simulator.state_backend.worker_id = worker_id
+        return simulator
+
+    primary = synced(HomeSimulator(database), "primary")
+    await primary.state_backend.connect()
+    worker = synced(HomeSimulator(database), "worker")
+    await worker.initialize()
+    try:
+        assert primary.state_backend.is_primary
+        assert not worker.state_backend.is_primary
+        assert worker.devices
+        await worker.device_writer.flush()
+        assert await database.get_all_devices() == []
+        assert await database.get_latest_home_state(datetime.now().isoformat()) is None
+
+        await primary.initialize()
+        await primary.update_device("light_kitchen", DeviceStatus.ON, {"brightness": 33})
+        await primary.device_writer.flush()
+        await primary.history.flush()
+        await worker.history.flush()
+        stored = await database.get_device("light_kitchen")
+        assert json.loads(stored["properties"])["brightness"] == 33
+        restored = await primary.history.get_state_at(datetime.now())
+        assert next(d for d in restored.devices if d.id == "light_kitchen").brightness == 33
+    finally:
+        await worker.stop()
+        await primary.stop()
+
+async def test_user_changes_sync_with_source(database):
+    from services.home_simulator import HomeSimulator
+    from services.state_backend import create_state_backend
+
+    simulators = []
+    for worker_id in ("primary", "worker"):
+        simulator = HomeSimulator(database)
+        simulator.state_backend = create_state_backend(simulator, "sqlite")
+        simulator.state_backend.worker_id = worker_id
+        await simulator.initialize()
+        simulators.append(simulator)
+    primary, worker = simulators
+    try:
+        await primary.update_device("ac_bedroom", DeviceStatus.ON, source=USER_EVENT_SOURCE)
+        await primary.update_device("light_kitchen", DeviceStatus.ON)
+        assert set(primary.user_changes) == {"ac_bedroom"}
+
+        for _ in range(100):
+            if worker.get_device("light_kitchen").status == DeviceStatus.ON:
+                break
+            await asyncio.sleep(0.02)
+        assert worker.get_device("ac_bedroom").status == DeviceStatus.ON
+        assert set(worker.user_changes) == {"ac_bedroom"}
+    finally:
+        await worker.stop()
+        await primary.stop()
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.devices import DeviceStatus
+
+pytestmark = pytest.mark.anyio
+
+async def test_get_state_at_replays_changes_after_keyframe(home):
+    start = datetime.now()
+    await home.update_device("light_living", DeviceStatus.ON, {"brightness": 40}, timestamp=start + timedelta(seconds=1))
+    await home.update_device("light_living", DeviceStatus.OFF, timestamp=start + timedelta(seconds=3))
+
+    state = await home.history.get_state_at(start + timedelta(seconds=2))
+    light = next(device for device in state.devices if device.id == "light_living")
+    assert light.status == DeviceStatus.ON
+    assert light.brightness == 40
+    assert light.last_updated == start + timedelta(seconds=1)
+
+    state = await home.history.get_state_at(start + timedelta(seconds=4))
+    light = next(device for device in state.devices if device.id == "light_living")
+    assert light.status == DeviceStatus.OFF
+    assert light.brightness == 40
+
+async def test_get_state_at_derives_room_occupancy(home):
+    start = datetime.now()
+    await home.update_device("sensor_living_motion", properties={"value": 1}, timestamp=start + timedelta(seconds=1))
+
+    before = await home.history.get_state_at(start + timedelta(milliseconds=500))
+    after = await home.history.get_state_at(start + timedelta(seconds=2))
+    assert before.room_occupancy[home.devices["sensor_living_motion"].room] is False
+    assert after.room_occupancy[home.devices["sensor_living_motion"].room] is True
+
+async def test_get_state_at_before_first_keyframe(home):
+    assert await home.history.get_state_at(datetime.now() - timedelta(days=1)) is None
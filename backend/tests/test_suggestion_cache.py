@@ -0,0 +1,103 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.agent import AgentSuggestion
+from models.devices import DeviceStatus, HomeState, LightDevice, Room, SensorDevice, SensorType
+from services.agent_service import AgentService
+from services.llm_provider import LLMProvider
+from services.suggestion_cache import SuggestionCache
+
+def make_state(temperature=24.2, light_status=DeviceStatus.ON, occupied=True, timestamp=None):
+    timestamp = timestamp or datetime.now()
+    devices = [
+        LightDevice(id="light_bedroom", name="卧室灯", type="light", room=Room.BEDROOM, status=light_status,
+                    brightness=60, last_updated=timestamp, created_at=timestamp),
+        SensorDevice(id="sensor_bedroom_temp", name="卧室温度", type="sensor", room=Room.BEDROOM, status=DeviceStatus.ON,
+                     sensor_type=SensorType.TEMPERATURE, value=temperature, unit="°C",
+                     last_updated=timestamp, created_at=timestamp),
+    ]
+    return HomeState(devices=devices, timestamp=timestamp, room_occupancy={Room.BEDROOM: occupied}, summary="")
+
+def make_suggestion():
+    return AgentSuggestion(id=str(uuid.uuid4()), content="关灯", suggested_actions={}, reasoning="", timestamp=datetime.now())
+
+def test_fingerprint_ignores_timestamps_and_device_order():
+    cache = SuggestionCache()
+    state = make_state()
+    later = make_state(timestamp=datetime.now() + timedelta(hours=1))
+    later.devices.reverse()
+    assert cache.fingerprint(state) == cache.fingerprint(later)
+
+def test_fingerprint_rounds_sensor_values_to_precision():
+    cache = SuggestionCache(precision=0)
+    assert cache.fingerprint(make_state(temperature=24.2)) == cache.fingerprint(make_state(temperature=23.8))
+    assert cache.fingerprint(make_state(temperature=24.2)) != cache.fingerprint(make_state(temperature=25.2))
+
+    precise = SuggestionCache(precision=1)
+    assert precise.fingerprint(make_state(temperature=24.2)) != precise.fingerprint(make_state(temperature=23.8))
+
+def test_fingerprint_changes_with_status_and_occupancy():
+    cache = SuggestionCache()
+    base = cache.fingerprint(make_state())
+    assert cache.fingerprint(make_state(light_status=DeviceStatus.OFF)) != base
+    assert cache.fingerprint(make_state(occupied=False)) != base
+
+def test_get_expires_entries():
+    cache = SuggestionCache(ttl=0.01)
+    suggestion = make_suggestion()
+    cache.put("key", suggestion)
+    assert cache.get("key") is suggestion
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_put_evicts_least_recently_used():
+    cache = SuggestionCache(max_size=2)
+    for key in ("a", "b"):
+        cache.put(key, make_suggestion())
+    cache.get("a")
+    cache.put("c", make_suggestion())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+class FixedProvider(LLMProvider):
+    """总是给出同一条带操作的建议"""
+
+    name = "fixed"
+
+    async def complete(self, model, messages, temperature, max_tokens):
+        self.requests += 1
+        return '客厅灯调暗一点<action>{"light_living": {"properties": {"brightness": 20}}}</action>'
+
+    async def stream(self, model, messages, temperature, max_tokens):
+        yield await self.complete(model, messages, temperature, max_tokens)
+
+@pytest.mark.anyio
+async def test_cache_hit_returns_suggestion_without_replaying_actions(home):
+    provider = FixedProvider()
+    agent = AgentService(home, llm_provider=provider)
+    agent.rule_engine = None
+    brightness = home.devices["light_living"].brightness
+    try:
+        first = await agent.analyze_home_state(home.get_current_state())
+        assert not first.cached
+        assert home.devices["light_living"].brightness == 20
+        messages = len(agent.context.messages)
+
+        # 回到分析前的状态，再次分析得到同一个指纹
+        await home.update_device("light_living", properties={"brightness": brightness})
+        agent.last_suggestion_time = None
+        second = await agent.analyze_home_state(home.get_current_state())
+
+        assert second.cached
+        assert second.content == first.content
+        assert second.id != first.id
+        assert provider.requests == 1
+        assert home.devices["light_living"].brightness == brightness
+        assert len(agent.context.messages) == messages
+    finally:
+        await agent.close()
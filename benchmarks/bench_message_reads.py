@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+对话消息读取基准测试
+在临时数据库中写入不同数量的历史消息，测量 get_recent_messages 的耗时，
+验证在 agent_messages.timestamp 索引下读取最近消息的耗时与表大小无关；
+并测量一次归档（保留最近的部分消息）的耗时
+
+用法：
+    python benchmarks/bench_message_reads.py --archive
+    python benchmarks/bench_message_reads.py --sizes 10000 100000   # 快速运行（默认包含1000万条，约需1.5GB临时磁盘空间）
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from database.database import Database
+
+INSERT_BATCH_SIZE = 50000
+
+def fill_messages(database: Database, count: int, start: datetime):
+    """写入count条消息，每条间隔1秒，时间格式与sqlite3默认适配器一致"""
+    inserted = 0
+    while inserted < count:
+        batch = min(INSERT_BATCH_SIZE, count - inserted)
+        rows = [(
+            f"msg_{i}",
+            "user" if i % 2 == 0 else "assistant",
+            f"第{i}条消息：把客厅灯调到{i % 100}%",
+            (start + timedelta(seconds=i)).isoformat(" "),
+            None
+        ) for i in range(inserted, inserted + batch)]
+        with database.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO agent_messages (id, role, content, timestamp, metadata)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        inserted += batch
+
+def main():
+    parser = argparse.ArgumentParser(description="对话消息读取基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000], help="消息数量")
+    parser.add_argument("--limit", type=int, default=10, help="每次读取的最近消息数")
+    parser.add_argument("--repeat", type=int, default=200, help="读取的重复次数")
+    parser.add_argument("--archive", action="store_true", help="同时测量归档耗时（保留最近一半消息）")
+    args = parser.parse_args()
+
+    print("🧪 对话消息读取基准测试")
+    header = f"{'消息数':>10} {'写入耗时(s)':>12} {'读取耗时(ms)':>13} {'数据库大小(MB)':>15}"
+    if args.archive:
+        header += f" {'归档耗时(s)':>12} {'归档后读取(ms)':>15}"
+    print(header)
+
+    start = datetime(2024, 1, 1)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            database = Database(db_path)
+            database.init_tables()
+
+            begin = time.perf_counter()
+            fill_messages(database, size, start)
+            fill_seconds = time.perf_counter() - begin
+
+            database.get_recent_messages(args.limit)  # 预热
+            begin = time.perf_counter()
+            for _ in range(args.repeat):
+                database.get_recent_messages(args.limit)
+            read_ms = (time.perf_counter() - begin) / args.repeat * 1000
+
+            size_mb = sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path)) / 1024 / 1024
+            line = f"{size:>10} {fill_seconds:>12.2f} {read_ms:>13.3f} {size_mb:>15.1f}"
+
+            if args.archive:
+                cutoff = (start + timedelta(seconds=size // 2)).isoformat(" ")
+                begin = time.perf_counter()
+                database.archive_rows("agent_messages", cutoff)
+                archive_seconds = time.perf_counter() - begin
+
+                begin = time.perf_counter()
+                for _ in range(args.repeat):
+                    database.get_recent_messages(args.limit)
+                after_ms = (time.perf_counter() - begin) / args.repeat * 1000
+                line += f" {archive_seconds:>12.2f} {after_ms:>15.3f}"
+
+            print(line)
+            database.close()
+
+if __name__ == "__main__":
+    main()
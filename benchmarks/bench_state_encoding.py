@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+家居状态编码基准测试
+对比 full（原 str(home_state)）与 compact / minimal 编码在不同设备规模下的
+提示词token数、编码耗时，以及（可选）LLM调用延迟
+
+用法：
+    python benchmarks/bench_state_encoding.py
+    python benchmarks/bench_state_encoding.py --sizes 10 100 1000 --llm
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from models.devices import (
+    SensorDevice, LightDevice, ACDevice,
+    DeviceType, DeviceStatus, SensorType, Room, HomeState
+)
+from services.state_encoder import encode_home_state, STATE_VERBOSITY_LEVELS
+
+def build_home_state(device_count: int) -> HomeState:
+    """生成包含指定数量设备的家居状态（灯、空调、人体和温度传感器轮流分布在各房间）"""
+    now = datetime.now()
+    rooms = list(Room)
+    devices = []
+
+    for i in range(device_count):
+        room = rooms[i % len(rooms)]
+        common = {
+            "name": f"设备{i}",
+            "room": room,
+            "last_updated": now,
+            "created_at": now,
+        }
+        kind = i % 4
+        if kind == 0:
+            devices.append(LightDevice(
+                id=f"light_{i}", type=DeviceType.LIGHT,
+                status=DeviceStatus.ON if i % 3 else DeviceStatus.OFF,
+                brightness=(i * 7) % 100, **common
+            ))
+        elif kind == 1:
+            devices.append(ACDevice(
+                id=f"ac_{i}", type=DeviceType.AC,
+                status=DeviceStatus.ON if i % 2 else DeviceStatus.OFF,
+                temperature=24.0 + (i // 4) % 4, **common
+            ))
+        elif kind == 2:
+            devices.append(SensorDevice(
+                id=f"sensor_motion_{i}", type=DeviceType.SENSOR, status=DeviceStatus.ON,
+                sensor_type=SensorType.MOTION, value=(i // 4) % 2, unit="boolean", **common
+            ))
+        else:
+            devices.append(SensorDevice(
+                id=f"sensor_temp_{i}", type=DeviceType.SENSOR, status=DeviceStatus.ON,
+                sensor_type=SensorType.TEMPERATURE, value=20 + (i % 100) / 10, unit="°C", **common
+            ))
+
+    room_occupancy = {room: any(
+        isinstance(d, SensorDevice) and d.sensor_type == SensorType.MOTION and d.room == room and d.value == 1
+        for d in devices
+    ) for room in rooms}
+
+    return HomeState(devices=devices, timestamp=now, room_occupancy=room_occupancy, summary="")
+
+def count_tokens(text: str) -> int:
+    """统计token数：优先使用tiktoken，否则按中文1字1token、其他字符约4字符1token估算"""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except ImportError:
+        cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+        return cjk + (len(text) - cjk + 3) // 4
+
+async def measure_llm_latency(agent, state_description: str) -> float:
+    """调用一次LLM并返回耗时（秒），agent 在多次测量之间复用"""
+    from services.agent_service import SYSTEM_PROMPT
+
+    user_prompt = agent._build_analysis_user_prompt(state_description)
+    start = time.perf_counter()
+    await agent._call_llm_api(SYSTEM_PROMPT, user_prompt)
+    return time.perf_counter() - start
+
+async def main():
+    parser = argparse.ArgumentParser(description="家居状态编码基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="设备数量")
+    parser.add_argument("--repeat", type=int, default=20, help="编码耗时的重复次数")
+    parser.add_argument("--llm", action="store_true", help="同时测量LLM调用延迟（需要DASHSCOPE_API_KEY）")
+    args = parser.parse_args()
+
+    print("🧪 家居状态编码基准测试")
+    header = f"{'设备数':>6} {'编码':>8} {'字符数':>9} {'token数':>9} {'编码耗时(ms)':>13}"
+    if args.llm:
+        header += f" {'LLM延迟(s)':>11}"
+    print(header)
+
+    # 只创建一次智能体（LLM客户端和连接池），不计入LLM延迟
+    agent = None
+    if args.llm:
+        from services.agent_service import AgentService
+        agent = AgentService()
+    try:
+        for size in args.sizes:
+            home_state = build_home_state(size)
+            token_counts = []
+            for verbosity in STATE_VERBOSITY_LEVELS:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    description = encode_home_state(home_state, verbosity)
+                elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+                tokens = count_tokens(description)
+                token_counts.append(tokens)
+                line = f"{size:>6} {verbosity:>8} {len(description):>9} {tokens:>9} {elapsed_ms:>13.2f}"
+                if args.llm:
+                    latency = await measure_llm_latency(agent, description)
+                    line += f" {latency:>11.2f}"
+                print(line)
+
+            # 详细程度越低，提示词不能越长
+            assert token_counts == sorted(token_counts), f"{size}个设备时 minimal ≤ compact ≤ full 不成立: {token_counts}"
+    finally:
+        if agent is not None:
+            await agent.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
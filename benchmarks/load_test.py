@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+设备与智能体接口压测
+启动本地模拟LLM服务（mock_llm_server.py）和后端服务（临时数据库，可预置任意数量的
+设备），按不同并发数驱动 /api/devices/* 和 /api/agent/* 接口，报告吞吐量、
+各接口延迟分位数和数据库写入速率；可以保存结果并与基线比较，发现性能回退
+
+用法：
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenario devices --devices 1000 --concurrency 1 10 50 --duration 20
+    python benchmarks/load_test.py --workers 4 --state-backend sqlite --homes 10
+    python benchmarks/load_test.py --devices 0 --simulation benchmarks/sim_stress_home.json   # 压测期间模拟引擎持续产生传感器读数
+    python benchmarks/load_test.py --json result.json
+    python benchmarks/load_test.py --baseline result.json --max-regression 0.2   # 回退超过20%时退出码为1
+    python benchmarks/load_test.py --target http://localhost:8000 --db backend/smart_home.db   # 压测已运行的服务
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, '..', 'backend')
+
+# 添加backend目录到Python路径
+sys.path.insert(0, BACKEND_DIR)
+
+from database.database import Database
+from bench_state_encoding import build_home_state
+
+# 只追加写入的表，行数增量即写入量
+WRITE_TABLES = ["device_changes", "home_states", "sensor_readings", "agent_messages", "state_changes"]
+STARTUP_TIMEOUT = 60  # 秒
+
+# 场景 -> [(操作名, 权重)]
+SCENARIOS = {
+    "devices": [("list", 2), ("summary", 2), ("get", 3), ("update", 3), ("bulk", 1)],
+    "agent": [("interact", 3), ("interact_stream", 1), ("analyze", 1), ("agent_status", 1)],
+}
+SCENARIOS["mixed"] = SCENARIOS["devices"] + SCENARIOS["agent"]
+
+MESSAGES = ["客厅有点暗", "帮我把卧室空调调到24度", "现在家里什么状态？", "我要睡觉了", "关掉所有灯"]
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def seed_database(path: str, device_count: int):
+    """写入一个包含 device_count 个设备的关键帧，服务启动时从状态历史恢复这些设备"""
+    database = Database(path)
+    database.init_tables()
+    if device_count > 0:
+        database.save_home_state(build_home_state(device_count))
+    database.close()
+
+def count_rows(db_paths: List[str]) -> Dict[str, int]:
+    """统计所有数据库中各追加表的行数"""
+    totals = {table: 0 for table in WRITE_TABLES}
+    for path in db_paths:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        try:
+            for table in WRITE_TABLES:
+                try:
+                    totals[table] += conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                except sqlite3.OperationalError:
+                    pass  # 旧数据库没有该表
+        finally:
+            conn.close()
+    return totals
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, float]:
+    """延迟列表（秒）汇总为毫秒分位数"""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput": round(len(values) / duration, 1),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p90_ms": round(percentile(values, 90) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+class LoadRunner:
+    """按场景权重发送请求并记录每个接口的延迟"""
+
+    def __init__(self, client: httpx.AsyncClient, scenario: str, prefixes: List[str], devices: Dict[str, List[Dict[str, Any]]]):
+        self.client = client
+        self.operations, weights = zip(*SCENARIOS[scenario])
+        self.weights = list(weights)
+        self.prefixes = prefixes
+        self.devices = devices
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def run(self, concurrency: int, duration: float):
+        self.latencies = {name: [] for name in self.operations}
+        self.errors = {name: 0 for name in self.operations}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(self._worker(i, deadline) for i in range(concurrency)))
+
+    async def _worker(self, index: int, deadline: float):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(self.operations, self.weights)[0]
+            prefix = rng.choice(self.prefixes)
+            start = time.perf_counter()
+            try:
+                ok = await getattr(self, f"_op_{operation}")(rng, prefix)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                self.latencies[operation].append(time.perf_counter() - start)
+            else:
+                self.errors[operation] += 1
+
+    async def _get(self, url: str) -> bool:
+        response = await self.client.get(url)
+        return response.status_code < 400
+
+    async def _op_list(self, rng: random.Random, prefix: str) -> bool:
+        return await self._get(f"{prefix}/devices/")
+
+    async def _op_summary(self, rng: random.Random, prefix: str) -> bool:
+        return await self._get(f"{prefix}/devices/status/summary")
+
+    async def _op_get(self, rng: random.Random, prefix: str) -> bool:
+        device = rng.choice(self.devices[prefix])
+        return await self._get(f"{prefix}/devices/{device['id']}")
+
+    async def _op_update(self, rng: random.Random, prefix: str) -> bool:
+        device = rng.choice(self.devices[prefix])
+        if device["type"] == "light":
+            body = {"status": rng.choice(["on", "off"]), "properties": {"brightness": rng.randint(0, 100)}}
+        elif device["type"] == "air_conditioner":
+            body = {"properties": {"temperature": rng.randint(18, 30)}}
+        elif device.get("sensor_type") == "motion":
+            body = {"properties": {"value": rng.randint(0, 1)}}
+        else:
+            body = {"properties": {"value": round(rng.uniform(15, 35), 1)}}
+        response = await self.client.put(f"{prefix}/devices/{device['id']}", json=body)
+        return response.status_code < 400
+
+    async def _op_bulk(self, rng: random.Random, prefix: str) -> bool:
+        room = rng.choice(self.devices[prefix])["room"]
+        body = {"commands": [{"room": room, "type": "light", "status": rng.choice(["on", "off"])}], "atomic": False}
+        response = await self.client.post(f"{prefix}/devices/bulk", json=body)
+        return response.status_code < 400
+
+    async def _op_interact(self, rng: random.Random, prefix: str) -> bool:
+        response = await self.client.post(f"{prefix}/agent/interact", json={"message": rng.choice(MESSAGES)})
+        return response.status_code < 400
+
+    async def _op_interact_stream(self, rng: random.Random, prefix: str) -> bool:
+        async with self.client.stream("POST", f"{prefix}/agent/interact/stream", params={"message": rng.choice(MESSAGES)}) as response:
+            async for _ in response.aiter_bytes():
+                pass
+            return response.status_code < 400
+
+    async def _op_analyze(self, rng: random.Random, prefix: str) -> bool:
+        response = await self.client.post(f"{prefix}/agent/analyze")
+        return response.status_code < 400
+
+    async def _op_agent_status(self, rng: random.Random, prefix: str) -> bool:
+        return await self._get(f"{prefix}/agent/status")
+
+def start_process(args: List[str], env: Dict[str, str], cwd: str, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(args, env=env, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+
+def stop_process(process: subprocess.Popen):
+    """先请求正常退出（服务会把缓冲中的数据落盘），超时后强制结束"""
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+async def wait_ready(client: httpx.AsyncClient, url: str, process: Optional[subprocess.Popen], log_path: Optional[str]):
+    """等待服务可以响应"""
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"服务启动失败，日志: {log_path}")
+        try:
+            if (await client.get(url)).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务启动超时，日志: {log_path}")
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[str]:
+    """与基线比较相同并发数的总吞吐量和p99延迟"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {level["concurrency"]: level for level in json.load(f)["levels"]}
+
+    regressions = []
+    for level in results:
+        base = baseline.get(level["concurrency"])
+        if base is None:
+            continue
+        current, previous = level["overall"], base["overall"]
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (1 - max_regression):
+            regressions.append(f"并发{level['concurrency']}: 吞吐量 {previous['throughput']} -> {current['throughput']} req/s")
+        if previous["p99_ms"] and current["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+            regressions.append(f"并发{level['concurrency']}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+def print_level(level: Dict[str, Any]):
+    overall = level["overall"]
+    print(f"\n📊 并发 {level['concurrency']}：{overall['requests']} 次请求，{overall['errors']} 次失败，"
+          f"{overall['throughput']} req/s，p50 {overall['p50_ms']} ms，p99 {overall['p99_ms']} ms")
+    print(f"{'接口':>16} {'请求数':>8} {'失败':>6} {'req/s':>8} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}")
+    for name, stats in level["endpoints"].items():
+        print(f"{name:>16} {stats['requests']:>8} {stats['errors']:>6} {stats['throughput']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p90_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}")
+    if level["db_writes"]:
+        writes = "，".join(f"{table} {rate}" for table, rate in level["db_writes"].items() if rate)
+        print(f"💾 数据库写入（行/秒）：{writes or '无'}")
+    if level.get("llm_requests") is not None:
+        print(f"🤖 LLM请求：{level['llm_requests']} 次")
+
+async def run(args) -> List[Dict[str, Any]]:
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        llm_url = None
+        db_pattern = [args.db] if args.db else []
+        try:
+            if args.target:
+                base_url = args.target.rstrip("/")
+                backend_log = None
+            else:
+                # 模拟LLM服务
+                llm_port = free_port()
+                llm_url = f"http://127.0.0.1:{llm_port}"
+                llm_log = os.path.join(tmp, "mock_llm.log")
+                processes.append(start_process([
+                    sys.executable, os.path.join(BENCHMARKS_DIR, "mock_llm_server.py"),
+                    "--port", str(llm_port), "--latency", str(args.llm_latency),
+                    "--tokens-per-second", str(args.llm_tps)
+                ], dict(os.environ), BENCHMARKS_DIR, llm_log))
+
+                # 预置设备的数据库
+                main_db = os.path.join(tmp, "main.db")
+                homes_dir = os.path.join(tmp, "homes")
+                os.makedirs(homes_dir)
+                seed_database(main_db, args.devices)
+                for i in range(1, args.homes):
+                    seed_database(os.path.join(homes_dir, f"bench-{i}.db"), args.devices)
+                db_pattern = [main_db, os.path.join(homes_dir, "*.db")]
+
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                backend_log = os.path.join(tmp, "backend.log")
+                env = dict(os.environ,
+                           DASHSCOPE_API_KEY="mock",
+                           DASHSCOPE_BASE_URL=f"{llm_url}/v1",
+                           DASHSCOPE_MODEL="mock-model",
+                           DATABASE_URL=f"sqlite:///{main_db}",
+                           HOME_DATA_DIR=homes_dir,
+                           HOST="127.0.0.1",
+                           PORT=str(port),
+                           DEBUG="False",
+                           WORKERS=str(args.workers),
+                           STATE_BACKEND=args.state_backend)
+                if args.simulation:
+                    env.update(SIMULATION_ENABLED="True", SIMULATION_CONFIG=os.path.abspath(args.simulation))
+                processes.append(start_process([sys.executable, "app.py"], env, BACKEND_DIR, backend_log))
+
+            limits = httpx.Limits(max_connections=max(args.concurrency) + 10, max_keepalive_connections=max(args.concurrency) + 10)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+                await wait_ready(client, "/api/status", processes[-1] if processes else None, backend_log)
+                if llm_url:
+                    await wait_ready(client, f"{llm_url}/stats", processes[0], llm_log)
+
+                # 第一个家庭使用不带家庭ID的接口，其余家庭使用 /api/{home_id}
+                prefixes = ["/api"] + [f"/api/bench-{i}" for i in range(1, args.homes)]
+                devices = {}
+                for prefix in prefixes:
+                    devices[prefix] = (await client.get(f"{prefix}/devices/")).json()
+                print(f"🏠 {len(prefixes)} 个家庭，每个家庭 {len(devices['/api'])} 个设备；场景 {args.scenario}，每级 {args.duration} 秒")
+
+                runner = LoadRunner(client, args.scenario, prefixes, devices)
+                results = []
+                for concurrency in args.concurrency:
+                    db_paths = [path for pattern in db_pattern for path in glob.glob(pattern)]
+                    rows_before = count_rows(db_paths) if db_paths else {}
+                    llm_before = (await client.get(f"{llm_url}/stats")).json()["requests"] if llm_url else None
+
+                    start = time.perf_counter()
+                    await runner.run(concurrency, args.duration)
+                    elapsed = time.perf_counter() - start
+                    # 等待写回缓冲和变更日志落盘后再统计写入量
+                    await asyncio.sleep(args.flush_wait)
+
+                    rows_after = count_rows(db_paths) if db_paths else {}
+                    llm_after = (await client.get(f"{llm_url}/stats")).json()["requests"] if llm_url else None
+                    all_latencies = [value for values in runner.latencies.values() for value in values]
+                    level = {
+                        "concurrency": concurrency,
+                        "duration": round(elapsed, 2),
+                        "overall": summarize(all_latencies, sum(runner.errors.values()), elapsed),
+                        "endpoints": {
+                            name: summarize(runner.latencies[name], runner.errors[name], elapsed)
+                            for name in runner.operations
+                        },
+                        "db_writes": {
+                            table: round((rows_after[table] - rows_before[table]) / elapsed, 1)
+                            for table in rows_before
+                        },
+                        "llm_requests": llm_after - llm_before if llm_url else None,
+                    }
+                    print_level(level)
+                    results.append(level)
+                return results
+        finally:
+            for process in reversed(processes):
+                stop_process(process)
+
+def main():
+    parser = argparse.ArgumentParser(description="设备与智能体接口压测")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed", help="请求组合")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50], help="并发数，依次压测")
+    parser.add_argument("--duration", type=float, default=10, help="秒，每个并发级别的压测时长")
+    parser.add_argument("--devices", type=int, default=100, help="每个家庭预置的设备数，0表示使用默认设备")
+    parser.add_argument("--homes", type=int, default=1, help="家庭数，请求均匀分布到各家庭")
+    parser.add_argument("--workers", type=int, default=1, help="后端工作进程数")
+    parser.add_argument("--state-backend", default="memory", help="多进程状态后端：memory / sqlite / redis")
+    parser.add_argument("--simulation", help="开启模拟引擎并使用该家庭定义（配合 --devices 0 按定义创建设备）")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="秒，模拟LLM首个token的延迟")
+    parser.add_argument("--llm-tps", type=float, default=0, help="模拟LLM输出速度，0表示不限速")
+    parser.add_argument("--flush-wait", type=float, default=2.0, help="秒，每级结束后等待数据落盘的时间")
+    parser.add_argument("--target", help="压测已运行的服务（不启动模拟LLM和后端，不预置设备）")
+    parser.add_argument("--db", help="配合 --target 统计写入速率的数据库文件")
+    parser.add_argument("--json", help="把结果保存为JSON文件")
+    parser.add_argument("--baseline", help="与之前保存的JSON结果比较")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的吞吐量下降/p99上升比例")
+    args = parser.parse_args()
+
+    print("🧪 设备与智能体接口压测")
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.json}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\n❌ 性能回退：")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ 与基线相比没有超过阈值的回退")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+本地模拟LLM服务
+实现OpenAI兼容的 /v1/chat/completions（流式和非流式），按配置的首字延迟和
+输出速度返回固定回复，供压测时替代DashScope；回复中带一个操作块，
+使智能体接口走完整的操作执行路径
+
+用法：
+    python benchmarks/mock_llm_server.py --port 9100 --latency 0.3 --tokens-per-second 50
+    # 后端使用：DASHSCOPE_API_KEY=mock DASHSCOPE_BASE_URL=http://127.0.0.1:9100/v1
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_REPLY = '好的，客厅现在没人，已经帮你把客厅灯关掉了。<action>{"light_living": {"status": "off"}}</action>'
+
+def create_app(latency: float, tokens_per_second: float, reply: str = DEFAULT_REPLY) -> FastAPI:
+    """创建模拟服务
+
+    Args:
+        latency: 秒，收到请求到返回第一个token的延迟
+        tokens_per_second: 流式输出速度（每个字符算一个token），0表示不限速
+        reply: 固定回复内容
+    """
+    app = FastAPI(title="Mock LLM")
+    app.state.requests = 0
+
+    def completion_id() -> str:
+        return f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    async def stream_chunks(model: str):
+        chunk_id = completion_id()
+        created = int(time.time())
+        interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+        for i in range(0, len(reply), 4):
+            chunk = {
+                "id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": reply[i:i + 4]}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if interval:
+                await asyncio.sleep(interval * 4)
+        final = {
+            "id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "mock")
+        await asyncio.sleep(latency)
+
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(model), media_type="text/event-stream")
+
+        if tokens_per_second > 0:
+            await asyncio.sleep(len(reply) / tokens_per_second)
+        prompt_tokens = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        return {
+            "id": completion_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply), "total_tokens": prompt_tokens + len(reply)}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.3, help="秒，首个token的延迟")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="输出速度，0表示不限速")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency, args.tokens_per_second), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from "react"
+import { useState, useEffect, useCallback } from "react"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
@@ -8,7 +8,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Switch } from "@/components/ui/switch"
 import { Badge } from "@/components/ui/badge"
 import { Plus, Clock, Zap, Trash2, Settings, Play, Pause } from "lucide-react"
-import { Device } from "@/lib/api"
+import { apiService, Automation, AutomationRequest, Device } from "@/lib/api"
 
 interface AutomationRule {
   id: string
@@ -33,33 +33,20 @@ interface AutomationPanelProps {
 }
 
 export function AutomationPanel({ devices }: AutomationPanelProps) {
-  const [rules, setRules] = useState<AutomationRule[]>([
-    {
-      id: "rule1",
-      name: "晚上自动开灯",
-      enabled: true,
-      trigger: { type: "time", value: "19:00" },
-      action: { deviceId: "light1", action: "turn_on", value: "80" },
-      lastExecuted: "2025-01-14 19:00:00",
-      executionCount: 15,
-    },
-    {
-      id: "rule2",
-      name: "离家安全模式",
-      enabled: true,
-      trigger: { type: "sensor", value: "door_sensor", condition: "closed_for_30min" },
-      action: { deviceId: "all_lights", action: "turn_off" },
-      executionCount: 8,
-    },
-    {
-      id: "rule3",
-      name: "温度自动调节",
-      enabled: false,
-      trigger: { type: "sensor", value: "temperature", condition: ">28" },
-      action: { deviceId: "ac1", action: "turn_on", value: "24" },
-      executionCount: 3,
-    },
-  ])
+  const [automations, setAutomations] = useState<Automation[]>([])
+  const rules = automations.map(toRule)
+
+  const loadAutomations = useCallback(async () => {
+    try {
+      setAutomations(await apiService.getAutomations())
+    } catch (err) {
+      console.error('Failed to load automations:', err)
+    }
+  }, [])
+
+  useEffect(() => {
+    loadAutomations()
+  }, [loadAutomations])
 
   const [isCreating, setIsCreating] = useState(false)
   const [newRule, setNewRule] = useState<Partial<AutomationRule>>({
@@ -117,31 +104,26 @@ export function AutomationPanel({ devices }: AutomationPanelProps) {
     }
   }
 
-  const toggleRule = (ruleId: string) => {
-    setRules(prev => prev.map(rule => 
-      rule.id === ruleId ? { ...rule, enabled: !rule.enabled } : rule
-    ))
+  const toggleRule = async (ruleId: string) => {
+    const automation = automations.find(a => a.id === ruleId)
+    if (!automation) return
+    const { id, last_executed, execution_count, ...request } = automation
+    const updated = await apiService.updateAutomation(id, { ...request, enabled: !automation.enabled })
+    setAutomations(prev => prev.map(a => a.id === ruleId ? updated : a))
   }
 
-  const deleteRule = (ruleId: string) => {
-    setRules(prev => prev.filter(rule => rule.id !== ruleId))
+  const deleteRule = async (ruleId: string) => {
+    await apiService.deleteAutomation(ruleId)
+    setAutomations(prev => prev.filter(a => a.id !== ruleId))
   }
 
-  const handleCreateRule = () => {
+  const handleCreateRule = async () => {
     if (!newRule.name || !newRule.trigger?.value || !newRule.action?.deviceId) {
       return
     }
 
-    const rule: AutomationRule = {
-      id: `rule_${Date.now()}`,
-      name: newRule.name,
-      enabled: newRule.enabled || true,
-      trigger: newRule.trigger as AutomationRule['trigger'],
-      action: newRule.action as AutomationRule['action'],
-      executionCount: 0,
-    }
-
-    setRules(prev => [...prev, rule])
+    const created = await apiService.createAutomation(toRequest(newRule))
+    setAutomations(prev => [...prev, created])
     setNewRule({
       name: "",
       enabled: true,
@@ -240,7 +222,11 @@ export function AutomationPanel({ devices }: AutomationPanelProps) {
                         ...prev,
                         trigger: { ...prev.trigger!, value: e.target.value }
                       }))}
-                      placeholder={newRule.trigger?.type === "time" ? "19:00" : "条件值"}
+                      placeholder={
+                        newRule.trigger?.type === "time" ? "19:00"
+                          : newRule.trigger?.type === "sensor" ? "sensor_bedroom_temp>28 或 sensor_living_motion"
+                          : "light_living:on"
+                      }
                     />
                   </div>
                 </div>
@@ -283,7 +269,6 @@ export function AutomationPanel({ devices }: AutomationPanelProps) {
                       <SelectContent>
                         <SelectItem value="turn_on">开启</SelectItem>
                         <SelectItem value="turn_off">关闭</SelectItem>
-                        <SelectItem value="toggle">切换</SelectItem>
                       </SelectContent>
                     </Select>
                   </div>
@@ -415,3 +400,71 @@ export function AutomationPanel({ devices }: AutomationPanelProps) {
     </div>
   )
 }
+
+// 后端规则 -> 面板展示
+function toRule(automation: Automation): AutomationRule {
+  const { trigger } = automation
+  const [deviceId, config = {}] = Object.entries(automation.actions)[0] || ["", {}]
+  let ruleTrigger: AutomationRule["trigger"]
+  switch (trigger.type) {
+    case "time":
+      ruleTrigger = { type: "time", value: trigger.at || "" }
+      break
+    case "device_status":
+      ruleTrigger = { type: "device", value: trigger.device_id || "", condition: trigger.status }
+      break
+    case "sensor_above":
+    case "sensor_below":
+      ruleTrigger = {
+        type: "sensor",
+        value: trigger.device_id || "",
+        condition: `${trigger.type === "sensor_above" ? ">" : "<"}${trigger.threshold}`,
+      }
+      break
+    default:
+      ruleTrigger = { type: "sensor", value: trigger.device_id || "", condition: trigger.type }
+  }
+
+  const properties = config.properties || {}
+  const value = properties.brightness ?? properties.temperature
+  return {
+    id: automation.id,
+    name: automation.name,
+    enabled: automation.enabled,
+    trigger: ruleTrigger,
+    action: {
+      deviceId: deviceId === "scene" ? `场景 ${config}` : deviceId,
+      action: config.status === "off" ? "turn_off" : "turn_on",
+      value: value !== undefined ? String(value) : undefined,
+    },
+    lastExecuted: automation.last_executed,
+    executionCount: automation.execution_count,
+  }
+}
+
+// 面板表单 -> 后端规则
+function toRequest(rule: Partial<AutomationRule>): AutomationRequest {
+  const value = rule.trigger!.value.trim()
+  let trigger: AutomationRequest["trigger"]
+  if (rule.trigger!.type === "time") {
+    trigger = { type: "time", at: value }
+  } else if (rule.trigger!.type === "device") {
+    // 格式：设备ID:on / 设备ID:off
+    const [deviceId, status = "on"] = value.split(":")
+    trigger = { type: "device_status", device_id: deviceId, status: status as "on" | "off" }
+  } else {
+    // 格式：传感器ID>阈值 / 传感器ID<阈值；只有ID时为人体感应检测到人
+    const match = value.match(/^(\S+?)\s*([<>])\s*(-?\d+(?:\.\d+)?)$/)
+    trigger = match
+      ? { type: match[2] === ">" ? "sensor_above" : "sensor_below", device_id: match[1], threshold: Number(match[3]) }
+      : { type: "motion_start", device_id: value }
+  }
+
+  const config: Record<string, any> = { status: rule.action!.action === "turn_off" ? "off" : "on" }
+  return {
+    name: rule.name!,
+    enabled: rule.enabled ?? true,
+    trigger,
+    actions: { [rule.action!.deviceId]: config },
+  }
+}
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import { apiService, AgentMessage, UserInteraction, AgentResponse } from '@/lib/api';
+import { apiService, AgentMessage, UserInteraction } from '@/lib/api';
 
 export function useAgent() {
   const [messages, setMessages] = useState<AgentMessage[]>([]);
@@ -32,18 +32,33 @@ export function useAgent() {
     // 立即添加用户消息到界面
     setMessages(prev => [...prev, userMessage]);
 
+    // 先插入空的AI消息，随流式响应逐段填充
+    const agentMessageId = (Date.now() + 1).toString();
+    setMessages(prev => [...prev, {
+      id: agentMessageId,
+      role: 'agent',
+      content: '',
+      timestamp: new Date().toISOString(),
+    }]);
+
+    const updateAgentMessage = (update: (msg: AgentMessage) => AgentMessage) => {
+      setMessages(prev => prev.map(msg => (msg.id === agentMessageId ? update(msg) : msg)));
+    };
+
     try {
       setLoading(true);
       setError(null);
 
       const interaction: UserInteraction = { message, context };
-      const response = await apiService.interactWithAgent(interaction);
-      console.log(response)
-
-      // 添加AI响应
-      const agentMessage: AgentMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'agent',
+      const response = await apiService.streamInteractWithAgent(interaction, (event) => {
+        if (event.type === 'token') {
+          updateAgentMessage(msg => ({ ...msg, content: msg.content + event.content }));
+        }
+      });
+
+      // 用完整响应替换流式拼接的内容
+      updateAgentMessage(msg => ({
+        ...msg,
         content: response.message,
         timestamp: response.timestamp,
         metadata: {
@@ -51,23 +66,19 @@ export function useAgent() {
           actions_taken: response.actions_taken,
           needs_user_confirmation: response.needs_user_confirmation,
         },
-      };
-
-      setMessages(prev => [...prev, agentMessage]);
+      }));
       return response;
 
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : '发送消息失败';
       setError(errorMessage);
       
-      // 添加错误消息
-      const errorAgentMessage: AgentMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'agent',
+      // 用错误消息替换未完成的回复
+      updateAgentMessage(msg => ({
+        ...msg,
         content: `抱歉，我遇到了一些问题：${errorMessage}`,
         timestamp: new Date().toISOString(),
-      };
-      setMessages(prev => [...prev, errorAgentMessage]);
+      }));
       
       throw err;
     } finally {
@@ -83,9 +83,22 @@ export function useDevices() {
     return { total, online, offline, unknown };
   }, [devices]);
 
-  // 初始加载
+  // 初始加载，之后通过推送保持同步
   useEffect(() => {
     loadDevices();
+    return apiService.subscribeDeviceEvents((message) => {
+      if (message.type === 'snapshot') {
+        setDevices(message.devices);
+      } else if (message.type === 'changes') {
+        const changes = new Map(message.events.map(event => [event.device_id, event]));
+        setDevices(prev =>
+          prev.map(device => {
+            const event = changes.get(device.id);
+            return event ? { ...device, ...event.changes, last_updated: event.timestamp } : device;
+          })
+        );
+      }
+    });
   }, [loadDevices]);
 
   return {
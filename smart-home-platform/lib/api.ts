@@ -22,6 +22,52 @@ export interface DeviceResponse {
   device?: Device;
 }
 
+export interface DeviceCommand extends DeviceUpdateRequest {
+  device_id?: string;
+  room?: Device['room'];
+  type?: Device['type'];
+}
+
+export interface DeviceCommandResult {
+  device_id: string;
+  success: boolean;
+  message: string;
+  action: DeviceUpdateRequest;
+}
+
+export interface BulkDeviceUpdateResponse {
+  success: boolean;
+  message: string;
+  results: DeviceCommandResult[];
+}
+
+export interface Scene {
+  name: string;
+  description: string;
+  commands: DeviceCommand[];
+}
+
+export interface AutomationTrigger {
+  type: 'sensor_above' | 'sensor_below' | 'motion_start' | 'motion_stop' | 'device_status' | 'time';
+  device_id?: string;
+  threshold?: number;
+  status?: 'on' | 'off' | 'unknown';
+  at?: string;
+}
+
+export interface AutomationRequest {
+  name: string;
+  enabled: boolean;
+  trigger: AutomationTrigger;
+  actions: Record<string, any>;
+}
+
+export interface Automation extends AutomationRequest {
+  id: string;
+  last_executed?: string;
+  execution_count: number;
+}
+
 export interface AgentMessage {
   id: string;
   role: 'user' | 'agent' | 'system';
@@ -43,6 +89,26 @@ export interface AgentResponse {
   timestamp: string;
 }
 
+export type AgentStreamEvent =
+  | { type: 'token'; content: string }
+  | { type: 'action'; results: any[] }
+  | { type: 'done'; response: AgentResponse }
+  | { type: 'error'; detail: string };
+
+export interface DeviceEvent {
+  device_id: string;
+  type: Device['type'];
+  room: Device['room'];
+  changes: Record<string, any>;
+  previous: Record<string, any>;
+  timestamp: string;
+}
+
+export type DeviceStreamMessage =
+  | { type: 'snapshot'; devices: Device[]; resync: boolean }
+  | { type: 'changes'; events: DeviceEvent[] }
+  | { type: 'ping' };
+
 export interface SystemStatus {
   status: string;
   devices_count: number;
@@ -107,10 +173,83 @@ class ApiService {
     });
   }
 
+  async bulkUpdateDevices(commands: DeviceCommand[], atomic: boolean = true): Promise<BulkDeviceUpdateResponse> {
+    return this.request<BulkDeviceUpdateResponse>('/api/devices/bulk', {
+      method: 'POST',
+      body: JSON.stringify({ commands, atomic }),
+    });
+  }
+
   async getDevicesByRoom(room: string): Promise<Device[]> {
     return this.request<Device[]>(`/api/devices/room/${room}`);
   }
 
+  // 订阅设备状态推送（SSE），返回取消订阅函数；断线后EventSource会自动重连并重新收到快照
+  subscribeDeviceEvents(
+    onMessage: (message: DeviceStreamMessage) => void,
+    rooms: string[] = [],
+  ): () => void {
+    const query = rooms.map(room => `room=${encodeURIComponent(room)}`).join('&');
+    const source = new EventSource(`${API_BASE_URL}/api/devices/events${query ? `?${query}` : ''}`);
+    source.onmessage = (event) => onMessage(JSON.parse(event.data) as DeviceStreamMessage);
+    return () => source.close();
+  }
+
+  // 场景相关API
+  async getScenes(): Promise<Scene[]> {
+    return this.request<Scene[]>('/api/scenes/');
+  }
+
+  async saveScene(scene: Scene): Promise<Scene> {
+    return this.request<Scene>(`/api/scenes/${encodeURIComponent(scene.name)}`, {
+      method: 'PUT',
+      body: JSON.stringify(scene),
+    });
+  }
+
+  async deleteScene(name: string): Promise<any> {
+    return this.request(`/api/scenes/${encodeURIComponent(name)}`, {
+      method: 'DELETE',
+    });
+  }
+
+  async activateScene(name: string): Promise<BulkDeviceUpdateResponse> {
+    return this.request<BulkDeviceUpdateResponse>(`/api/scenes/${encodeURIComponent(name)}/activate`, {
+      method: 'POST',
+    });
+  }
+
+  // 自动化规则相关API
+  async getAutomations(): Promise<Automation[]> {
+    return this.request<Automation[]>('/api/automations/');
+  }
+
+  async createAutomation(automation: AutomationRequest): Promise<Automation> {
+    return this.request<Automation>('/api/automations/', {
+      method: 'POST',
+      body: JSON.stringify(automation),
+    });
+  }
+
+  async updateAutomation(id: string, automation: AutomationRequest): Promise<Automation> {
+    return this.request<Automation>(`/api/automations/${id}`, {
+      method: 'PUT',
+      body: JSON.stringify(automation),
+    });
+  }
+
+  async deleteAutomation(id: string): Promise<any> {
+    return this.request(`/api/automations/${id}`, {
+      method: 'DELETE',
+    });
+  }
+
+  async runAutomation(id: string): Promise<any> {
+    return this.request(`/api/automations/${id}/run`, {
+      method: 'POST',
+    });
+  }
+
   // AI助手相关API
   async interactWithAgent(interaction: UserInteraction): Promise<AgentResponse> {
     return this.request<AgentResponse>('/api/agent/interact', {
@@ -119,6 +258,53 @@ class ApiService {
     });
   }
 
+  // 流式交互：通过SSE逐段接收回复，返回最终的完整响应
+  async streamInteractWithAgent(
+    interaction: UserInteraction,
+    onEvent: (event: AgentStreamEvent) => void,
+  ): Promise<AgentResponse> {
+    const response = await fetch(`${API_BASE_URL}/api/agent/interact/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(interaction),
+    });
+
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({ detail: '请求失败' }));
+      throw new Error(errorData.detail || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalResponse: AgentResponse | null = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE事件以空行分隔
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary >= 0) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        if (!raw.startsWith('data: ')) continue;
+        const event = JSON.parse(raw.slice(6)) as AgentStreamEvent;
+        if (event.type === 'error') throw new Error(event.detail);
+        if (event.type === 'done') finalResponse = event.response;
+        onEvent(event);
+      }
+    }
+
+    if (!finalResponse) {
+      throw new Error('流式响应意外中断');
+    }
+    return finalResponse;
+  }
+
   async getAgentStatus(): Promise<any> {
     return this.request('/api/agent/status');
   }